@@ -7,6 +7,7 @@ import sys
 import json
 import time
 import base64
+import asyncio
 from pathlib import Path
 
 import gradio as gr
@@ -26,6 +27,15 @@ from modules.longcat_module import get_longcat_module, LongCatVideoModule
 from modules.song_module import get_song_module, SongGenerationModule, AUTO_PROMPT_TYPES, GENERATION_TYPES
 from modules.avatar_module import get_avatar_module, AvatarModule
 from modules.rag_module import create_rag_interface, get_rag_js_logic
+from modules.storage_manager import get_storage_manager
+from modules.catalog import get_catalog
+from modules.stream_proxy import register_stream_routes
+from modules.media_server import register_media_routes, media_url
+from modules.media_components import ResultVideo, ResultAudio, public_url
+from modules.cold_storage import get_cold_storage
+from modules.job_store import get_job_store, FINISHED as JOB_FINISHED
+from config import STREAM_RESULTS, PUBLIC_BASE_URL, GRADIO_QUEUE_MAX_SIZE, GRADIO_DEFAULT_CONCURRENCY
+from config import JOB_RESUME_ON_START, JOB_RECONNECT_INTERVAL, JOB_RECONNECT_TIMEOUT, JOB_STORE_RETENTION_DAYS
 
 
 # ==================== 自定义 CSS 样式 ====================
@@ -1419,18 +1429,44 @@ footer {
 
 def create_result_info(config, success=True):
     """创建结果信息"""
+    # 任务 ID 可在「重新连接任务」中查看进度和结果
+    job_line = f"\n- 任务 ID: `{config['job_id']}`" if config.get("job_id") else ""
     if success and config.get("success"):
-        return f"""
+        if config.get("coalesced"):
+            return f"""
 ## ✅ 生成成功！
 
-- 输出文件: `{config.get('output_path', 'N/A')}`
+- 输出文件: `{config.get('output_path', 'N/A')}`{job_line}
+- 结果来源: 与正在进行的相同请求合并，共用同一次生成结果
 - 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}
+"""
+        if config.get("cached"):
+            return f"""
+## ⚡ 生成成功 (cached)
+
+- 输出文件: `{config.get('output_path', 'N/A')}`{job_line}
+- 结果来源: 参数与输入文件与之前某次生成完全相同，直接复用缓存结果，未占用 GPU
+- 返回时间: {time.strftime('%Y-%m-%d %H:%M:%S')}
+"""
+        streaming = "\n- 播放方式: 边下边看，结果仍在后台保存到本地" if config.get("stream_url") else ""
+        return f"""
+## ✅ 生成成功！
+
+- 输出文件: `{config.get('output_path', 'N/A')}`{job_line}
+- 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}{streaming}
+"""
+    elif config.get("rejected"):
+        return f"""
+## ⏳ 任务未受理
+
+{config.get('error')}
 """
     elif config.get("error"):
         return f"""
 ## ❌ 生成失败
 
 错误信息: {config.get('error')}
+{job_line}
 
 {config.get('note', '')}
 """
@@ -1446,11 +1482,37 @@ def create_result_info(config, success=True):
 ```
 """
 
+def pin_session_output(output_path, request=None):
+    """结果仍显示在该会话的界面上，存储淘汰时跳过 (会话关闭或超时后释放)"""
+    session = getattr(request, "session_hash", None)
+    get_storage_manager().pin(output_path, owner=session)
+
+
+# 边下边看需要把直通地址直接交给浏览器，只有配置了 PUBLIC_BASE_URL 时开启
+STREAM_TO_BROWSER = STREAM_RESULTS and bool(PUBLIC_BASE_URL)
+
+
+def result_media(output_path, config):
+    """结果组件要显示的内容：边下边看时是直通地址，否则是媒体路由地址 (均为 PUBLIC_BASE_URL 下的绝对地址，
+    由 ResultVideo / ResultAudio 原样交给浏览器)；未配置 PUBLIC_BASE_URL 时是本地文件"""
+    if config.get("success") and config.get("stream_url"):
+        url = public_url(config["stream_url"])
+        if url:
+            return url
+    if output_path and os.path.exists(output_path):
+        return public_url(media_url(output_path)) or output_path
+    return None
+
+
+def release_session_outputs(request: gr.Request):
+    """会话关闭时释放其持有的输出文件"""
+    get_storage_manager().release(request.session_hash)
+
 # ==================== LongCat-Video 功能函数 ====================
 
-def longcat_text_to_video(prompt, negative_prompt, height, width, num_frames,
+async def longcat_text_to_video(prompt, negative_prompt, height, width, num_frames,
                           num_inference_steps, guidance_scale, seed, use_distill,
-                          progress=gr.Progress()):
+                          request: gr.Request = None, progress=gr.Progress()):
     """文本生成视频 - 真正的模型推理"""
     progress(0, desc="初始化...")
     
@@ -1463,7 +1525,7 @@ def longcat_text_to_video(prompt, negative_prompt, height, width, num_frames,
         def progress_wrapper(value, desc=""):
             progress(value, desc=desc)
         
-        output_path, config = module.text_to_video(
+        output_path, config = await module.text_to_video_async(
             prompt=prompt,
             negative_prompt=negative_prompt,
             height=int(height),
@@ -1473,15 +1535,18 @@ def longcat_text_to_video(prompt, negative_prompt, height, width, num_frames,
             guidance_scale=float(guidance_scale),
             seed=int(seed),
             use_distill=use_distill,
-            progress_callback=progress_wrapper
+            progress_callback=progress_wrapper,
+            stream=STREAM_TO_BROWSER
         )
         
         progress(1.0, desc="完成!")
         
         # 返回实际生成的视频文件
-        if output_path and os.path.exists(output_path):
+        media = result_media(output_path, config)
+        if media:
+            pin_session_output(output_path, request)
             result_info = create_result_info(config, success=True)
-            return output_path, result_info
+            return media, result_info
         else:
             result_info = create_result_info(config, success=False)
             return None, result_info
@@ -1491,9 +1556,9 @@ def longcat_text_to_video(prompt, negative_prompt, height, width, num_frames,
         traceback.print_exc()
         return None, f"❌ 错误: {str(e)}"
 
-def longcat_image_to_video(image, prompt, negative_prompt, resolution, num_frames,
+async def longcat_image_to_video(image, prompt, negative_prompt, resolution, num_frames,
                            num_inference_steps, guidance_scale, seed, use_distill,
-                           progress=gr.Progress()):
+                           request: gr.Request = None, progress=gr.Progress()):
     """图片生成视频 - 真正的模型推理"""
     progress(0, desc="初始化...")
     
@@ -1506,7 +1571,7 @@ def longcat_image_to_video(image, prompt, negative_prompt, resolution, num_frame
         def progress_wrapper(value, desc=""):
             progress(value, desc=desc)
         
-        output_path, config = module.image_to_video(
+        output_path, config = await module.image_to_video_async(
             image_path=image,
             prompt=prompt,
             negative_prompt=negative_prompt,
@@ -1516,14 +1581,17 @@ def longcat_image_to_video(image, prompt, negative_prompt, resolution, num_frame
             guidance_scale=float(guidance_scale),
             seed=int(seed),
             use_distill=use_distill,
-            progress_callback=progress_wrapper
+            progress_callback=progress_wrapper,
+            stream=STREAM_TO_BROWSER
         )
         
         progress(1.0, desc="完成!")
         
-        if output_path and os.path.exists(output_path):
+        media = result_media(output_path, config)
+        if media:
+            pin_session_output(output_path, request)
             result_info = create_result_info(config, success=True)
-            return output_path, result_info
+            return media, result_info
         else:
             result_info = create_result_info(config, success=False)
             return None, result_info
@@ -1533,10 +1601,10 @@ def longcat_image_to_video(image, prompt, negative_prompt, resolution, num_frame
         traceback.print_exc()
         return None, f"❌ 错误: {str(e)}"
 
-def longcat_audio_to_video(audio, image, prompt, resolution, num_frames,
+async def longcat_audio_to_video(audio, image, prompt, resolution, num_frames,
                            num_inference_steps, text_guidance, audio_guidance,
                            seed, num_segments, stage,
-                           progress=gr.Progress()):
+                           request: gr.Request = None, progress=gr.Progress()):
     """音频驱动数字人视频生成"""
     progress(0, desc="初始化...")
     
@@ -1552,7 +1620,7 @@ def longcat_audio_to_video(audio, image, prompt, resolution, num_frames,
         def progress_wrapper(value, desc=""):
             progress(value, desc=desc)
         
-        output_path, config = module.single_avatar(
+        output_path, config = await module.single_avatar_async(
             audio_path=audio,
             image_path=image,
             prompt=prompt,
@@ -1563,14 +1631,17 @@ def longcat_audio_to_video(audio, image, prompt, resolution, num_frames,
             audio_guidance_scale=float(audio_guidance),
             seed=int(seed),
             num_segments=int(num_segments),
-            progress_callback=progress_wrapper
+            progress_callback=progress_wrapper,
+            stream=STREAM_TO_BROWSER
         )
         
         progress(1.0, desc="完成!")
         
-        if output_path and os.path.exists(output_path):
+        media = result_media(output_path, config)
+        if media:
+            pin_session_output(output_path, request)
             result_info = create_result_info(config, success=True)
-            return output_path, result_info
+            return media, result_info
         else:
             result_info = create_result_info(config, success=False)
             return None, result_info
@@ -1582,9 +1653,9 @@ def longcat_audio_to_video(audio, image, prompt, resolution, num_frames,
 
 # ==================== SongGeneration 功能函数 ====================
 
-def song_generate(lyrics, description, prompt_audio, auto_style, gen_type,
+async def song_generate(lyrics, description, prompt_audio, auto_style, gen_type,
                   max_duration, cfg_coef, temperature, top_k, top_p, low_mem,
-                  progress=gr.Progress()):
+                  request: gr.Request = None, progress=gr.Progress()):
     """生成歌曲 - 真正的模型推理"""
     progress(0, desc="初始化...")
     
@@ -1613,7 +1684,7 @@ def song_generate(lyrics, description, prompt_audio, auto_style, gen_type,
             # 文本描述可以和其他选项一起使用
             desc = description.strip()
         
-        output_path, config = module.generate_song(
+        output_path, config = await module.generate_song_async(
             lyrics=lyrics,
             description=desc,
             prompt_audio_path=prompt_audio_path,
@@ -1625,15 +1696,18 @@ def song_generate(lyrics, description, prompt_audio, auto_style, gen_type,
             top_k=int(top_k),
             top_p=float(top_p),
             low_mem=low_mem,
-            progress_callback=progress_wrapper
+            progress_callback=progress_wrapper,
+            stream=STREAM_TO_BROWSER
         )
         
         progress(1.0, desc="完成!")
         
         # 返回实际生成的音频文件
-        if output_path and os.path.exists(output_path):
+        media = result_media(output_path, config)
+        if media:
+            pin_session_output(output_path, request)
             result_info = create_result_info(config, success=True)
-            return output_path, result_info
+            return media, result_info
         else:
             result_info = create_result_info(config, success=False)
             return None, result_info
@@ -1659,10 +1733,10 @@ def song_load_example():
 
 # ==================== Avatar 功能函数 ====================
 
-def avatar_single_generate(audio, image, prompt, stage_1, resolution, 
+async def avatar_single_generate(audio, image, prompt, stage_1, resolution, 
                            num_inference_steps, text_guidance, audio_guidance,
                            seed, num_segments, ref_img_index, mask_frame_range,
-                           progress=gr.Progress()):
+                           request: gr.Request = None, progress=gr.Progress()):
     """单人说话视频生成"""
     progress(0, desc="初始化...")
     
@@ -1678,7 +1752,7 @@ def avatar_single_generate(audio, image, prompt, stage_1, resolution,
         def progress_wrapper(value, desc=""):
             progress(value, desc=desc)
         
-        output_path, config = module.single_avatar(
+        output_path, config = await module.single_avatar_async(
             audio_path=audio,
             image_path=image,
             prompt=prompt,
@@ -1691,14 +1765,17 @@ def avatar_single_generate(audio, image, prompt, stage_1, resolution,
             num_segments=int(num_segments),
             ref_img_index=int(ref_img_index),
             mask_frame_range=int(mask_frame_range),
-            progress_callback=progress_wrapper
+            progress_callback=progress_wrapper,
+            stream=STREAM_TO_BROWSER
         )
         
         progress(1.0, desc="完成!")
         
-        if output_path and os.path.exists(output_path):
+        media = result_media(output_path, config)
+        if media:
+            pin_session_output(output_path, request)
             result_info = create_result_info(config, success=True)
-            return output_path, result_info
+            return media, result_info
         else:
             result_info = create_result_info(config, success=False)
             return None, result_info
@@ -1709,10 +1786,11 @@ def avatar_single_generate(audio, image, prompt, stage_1, resolution,
         return None, f"❌ 错误: {str(e)}"
 
 
-def avatar_multi_generate(image, audio1, audio2, prompt, audio_type, resolution,
+async def avatar_multi_generate(image, audio1, audio2, prompt, audio_type, resolution,
                           num_inference_steps, text_guidance, audio_guidance,
                           seed, num_segments, ref_img_index, mask_frame_range,
-                          bbox1_str, bbox2_str, progress=gr.Progress()):
+                          bbox1_str, bbox2_str, request: gr.Request = None,
+                          progress=gr.Progress()):
     """双人对话视频生成"""
     progress(0, desc="初始化...")
     
@@ -1736,7 +1814,7 @@ def avatar_multi_generate(image, audio1, audio2, prompt, audio_type, resolution,
         if bbox2_str and bbox2_str.strip():
             bbox2 = [int(x.strip()) for x in bbox2_str.split(',')]
         
-        output_path, config = module.multi_avatar(
+        output_path, config = await module.multi_avatar_async(
             image_path=image,
             audio1_path=audio1,
             audio2_path=audio2,
@@ -1752,14 +1830,17 @@ def avatar_multi_generate(image, audio1, audio2, prompt, audio_type, resolution,
             mask_frame_range=int(mask_frame_range),
             bbox1=bbox1,
             bbox2=bbox2,
-            progress_callback=progress_wrapper
+            progress_callback=progress_wrapper,
+            stream=STREAM_TO_BROWSER
         )
         
         progress(1.0, desc="完成!")
         
-        if output_path and os.path.exists(output_path):
+        media = result_media(output_path, config)
+        if media:
+            pin_session_output(output_path, request)
             result_info = create_result_info(config, success=True)
-            return output_path, result_info
+            return media, result_info
         else:
             result_info = create_result_info(config, success=False)
             return None, result_info
@@ -1769,6 +1850,172 @@ def avatar_multi_generate(image, audio1, audio2, prompt, audio_type, resolution,
         traceback.print_exc()
         return None, f"❌ 错误: {str(e)}"
 
+# ==================== 历史作品画廊 ====================
+
+# 画廊类型筛选: 显示名称 -> 生成记录中的 job_type
+GALLERY_TYPES = {
+    "全部": None,
+    "文本生成视频": "text_to_video",
+    "图片生成视频": "image_to_video",
+    "歌曲生成": "song_generation",
+    "单人演唱视频": "single_avatar",
+    "双人对唱视频": "multi_avatar",
+}
+GALLERY_TYPE_NAMES = {job_type: name for name, job_type in GALLERY_TYPES.items() if job_type}
+GALLERY_COLUMNS = ["ID", "类型", "时间", "提示词", "大小", "耗时", "来源"]
+GALLERY_STATUS_NAMES = {"generated": "生成", "cached": "缓存", "coalesced": "合并"}
+
+
+def gallery_query(type_label, query, cursors):
+    """按游标栈 cursors 的最后一个游标取一页 (键集分页)
+
+    返回 (表格行, 页码信息, 游标栈, 下一页游标, 本页记录 ID 列表)。
+    """
+    items, next_cursor = get_catalog().page(GALLERY_TYPES.get(type_label), query, cursors[-1])
+    rows = []
+    for item in items:
+        prompt = (item["prompt"] or "").replace("\n", " ")
+        rows.append([
+            item["id"],
+            GALLERY_TYPE_NAMES.get(item["job_type"], item["job_type"]),
+            time.strftime("%Y-%m-%d %H:%M", time.localtime(item["created_at"])),
+            prompt[:40] + ("…" if len(prompt) > 40 else ""),
+            f"{(item['size'] or 0) / 1048576:.1f} MB",
+            f"{item['duration'] or 0:.1f} s",
+            GALLERY_STATUS_NAMES.get(item["status"], item["status"]),
+        ])
+    info = f"第 {len(cursors)} 页 · 本页 {len(items)} 个作品" + ("" if next_cursor else " · 已到最后一页")
+    return rows, info, cursors, next_cursor, [item["id"] for item in items]
+
+
+def gallery_search(type_label, query):
+    """筛选条件变化：回到第一页"""
+    return gallery_query(type_label, query, [None])
+
+
+def gallery_next_page(type_label, query, cursors, next_cursor):
+    if next_cursor is None:
+        return gallery_query(type_label, query, cursors)
+    return gallery_query(type_label, query, cursors + [next_cursor])
+
+
+def gallery_prev_page(type_label, query, cursors):
+    return gallery_query(type_label, query, cursors[:-1] or [None])
+
+
+def gallery_select(record_ids, evt: gr.SelectData, request: gr.Request = None):
+    """选中一条记录：预览输出文件并显示完整生成配置"""
+    row = evt.index[0] if isinstance(evt.index, (list, tuple)) else evt.index
+    if row is None or row >= len(record_ids):
+        return gr.update(), gr.update(), ""
+    item = get_catalog().get(record_ids[row])
+    path = item and item["output_path"]
+    # 已转入冷存储的作品在这里取回
+    if not path or not get_cold_storage().ensure_local(path):
+        return gr.update(value=None, visible=True), gr.update(value=None, visible=False), "❌ 输出文件已被清理"
+
+    get_storage_manager().record_access(path)
+    pin_session_output(path, request)
+    timings = " · ".join(f"{phase} {seconds:.1f}s" for phase, seconds in item["timings"].items())
+    info = f"""
+### #{item['id']} {GALLERY_TYPE_NAMES.get(item['job_type'], item['job_type'])}
+
+- 生成时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(item['created_at']))}
+- 输出文件: `{path}` ({(item['size'] or 0) / 1048576:.1f} MB)
+- 总耗时: {item['duration'] or 0:.1f} s{f' ({timings})' if timings else ''}
+- 种子: {item['seed']}
+
+```json
+{json.dumps(item['config'], ensure_ascii=False, indent=2)}
+```
+"""
+    is_audio = Path(path).suffix.lower() in (".wav", ".mp3", ".flac")
+    # 经媒体路由播放，浏览器按 Range 拖动、按 ETag 复用缓存，不经过 Gradio 的文件复制
+    media = public_url(media_url(path)) or path
+    return (
+        gr.update(value=None if is_audio else media, visible=not is_audio),
+        gr.update(value=media if is_audio else None, visible=is_audio),
+        info,
+    )
+
+# ==================== 任务查询 / 重新连接 ====================
+
+JOB_STATUS_NAMES = {
+    "queued": "排队中",
+    "running": "执行中",
+    "submitted": "生成中",
+    "done": "已完成",
+    "failed": "失败",
+    "cancelled": "已取消",
+}
+
+
+def job_list_info(items):
+    """最近任务列表 (Markdown 表格)"""
+    if not items:
+        return "暂无任务记录"
+    lines = ["| 任务 ID | 类型 | 状态 | 登记时间 |", "| --- | --- | --- | --- |"]
+    for item in items:
+        lines.append(
+            f"| `{item['job_id']}` | {GALLERY_TYPE_NAMES.get(item['job_type'], item['job_type'])} "
+            f"| {JOB_STATUS_NAMES.get(item['status'], item['status'])} "
+            f"| {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(item['created_at']))} |"
+        )
+    return "### 最近的任务\n\n" + "\n".join(lines)
+
+
+async def job_reconnect(job_id, request: gr.Request = None, progress=gr.Progress()):
+    """按任务 ID 重新连接任务 (页面刷新或 WebUI 重启后)：等待任务结束并显示结果；ID 留空时列出最近的任务"""
+    store = get_job_store()
+    job_id = (job_id or "").strip().upper()
+    if not job_id:
+        return gr.update(), gr.update(), job_list_info(await asyncio.to_thread(store.recent))
+
+    item = await asyncio.to_thread(store.get, job_id)
+    deadline = time.time() + JOB_RECONNECT_TIMEOUT
+    while item is not None and item["status"] not in JOB_FINISHED:
+        if time.time() > deadline:
+            return gr.update(), gr.update(), (
+                f"⏳ 任务 `{job_id}` 仍未结束 ({JOB_STATUS_NAMES.get(item['status'], item['status'])})，"
+                f"已停止等待，任务继续在后台执行，稍后可用同一 ID 再次查看"
+            )
+        value, desc = item["progress"] or (0.05, JOB_STATUS_NAMES.get(item["status"], item["status"]))
+        progress(value, desc=desc)
+        await asyncio.sleep(JOB_RECONNECT_INTERVAL)
+        item = await asyncio.to_thread(store.get, job_id)
+    if item is None:
+        return gr.update(), gr.update(), (
+            f"❌ 未找到任务 `{job_id}` (结束超过 {JOB_STORE_RETENTION_DAYS} 天的任务已清理，可在上方检索历史作品)"
+        )
+
+    config = item["config"]
+    config.setdefault("job_id", job_id)
+    # 任务已结束，结果完整在本地，不再使用边下边看的直通地址
+    config.pop("stream_url", None)
+    path = item["output_path"]
+    if not path or not await asyncio.to_thread(get_cold_storage().ensure_local, path):
+        config.setdefault("error", item["error"] or "输出文件已被清理")
+        return gr.update(value=None, visible=True), gr.update(value=None, visible=False), \
+            create_result_info(config, success=False)
+
+    pin_session_output(path, request)
+    is_audio = Path(path).suffix.lower() in (".wav", ".mp3", ".flac")
+    media = result_media(path, config)
+    return (
+        gr.update(value=None if is_audio else media, visible=not is_audio),
+        gr.update(value=media if is_audio else None, visible=is_audio),
+        create_result_info(config, success=True),
+    )
+
+
+def resume_unfinished_jobs():
+    """继续上次运行时未完成的任务 (见 modules/job_store.py)"""
+    get_job_store().prune()
+    for module in (get_longcat_module(), get_song_module(), get_avatar_module()):
+        count = module.resume_jobs()
+        if count:
+            print(f"[jobs] {module.queue_name}: 继续 {count} 个未完成的任务")
+
 # ==================== 创建 Gradio 界面 ====================
 
 def create_app():
@@ -1926,6 +2173,9 @@ def create_app():
                     """)
                     avatar_enter_btn = gr.Button("🎼 进入有声视频生成", variant="primary", size="lg", elem_id="avatar-enter-btn")
 
+            with gr.Row():
+                gallery_enter_btn = gr.Button("📚 历史作品画廊", size="lg", elem_id="gallery-enter-btn")
+
             # 页脚信息
             gr.HTML("""
             <div style="text-align: center; padding: 40px 20px; margin-top: 60px;">
@@ -2001,17 +2251,22 @@ def create_app():
                                     t2v_distill = gr.Checkbox(label="使用蒸馏模式 (更快)", value=False)
                                 
                                 t2v_btn = gr.Button("🎬 生成视频", variant="primary", size="lg")
+                                t2v_stop_btn = gr.Button("⏹ 停止", size="sm")
                             
                             with gr.Column(scale=1):
-                                t2v_output_video = gr.Video(label="生成结果", elem_id="t2v-output")
+                                t2v_output_video = ResultVideo(label="生成结果", elem_id="t2v-output")
                                 t2v_output_info = gr.Markdown(label="生成信息")
                         
-                        t2v_btn.click(
+                        t2v_event = t2v_btn.click(
                             fn=longcat_text_to_video,
                             inputs=[t2v_prompt, t2v_negative, t2v_height, t2v_width, 
                                    t2v_frames, t2v_steps, t2v_guidance, t2v_seed, t2v_distill],
-                            outputs=[t2v_output_video, t2v_output_info]
+                            outputs=[t2v_output_video, t2v_output_info],
+                            # 并发由模块层的准入队列按后端容量控制 (见 modules/admission.py)，排队位置显示在进度条上
+                            concurrency_limit=None
                         )
+                        # 停止 / 关闭页面会取消生成函数：释放排队名额并通知后端停止生成 (见 api_base._cancel_backend_job_async)
+                        t2v_stop_btn.click(fn=None, cancels=[t2v_event])
                     
                     # 图片生成视频
                     with gr.TabItem("🖼️ 图片生成视频", id="i2v"):
@@ -2042,17 +2297,20 @@ def create_app():
                                     i2v_distill = gr.Checkbox(label="使用蒸馏模式", value=False)
                                 
                                 i2v_btn = gr.Button("🎬 生成视频", variant="primary", size="lg")
+                                i2v_stop_btn = gr.Button("⏹ 停止", size="sm")
                             
                             with gr.Column(scale=1):
-                                i2v_output_video = gr.Video(label="生成结果", elem_id="i2v-output")
+                                i2v_output_video = ResultVideo(label="生成结果", elem_id="i2v-output")
                                 i2v_output_info = gr.Markdown(label="生成信息")
                         
-                        i2v_btn.click(
+                        i2v_event = i2v_btn.click(
                             fn=longcat_image_to_video,
                             inputs=[i2v_image, i2v_prompt, i2v_negative, i2v_resolution,
                                    i2v_frames, i2v_steps, i2v_guidance, i2v_seed, i2v_distill],
-                            outputs=[i2v_output_video, i2v_output_info]
+                            outputs=[i2v_output_video, i2v_output_info],
+                            concurrency_limit=None
                         )
+                        i2v_stop_btn.click(fn=None, cancels=[i2v_event])
 
                 # ==================== 歌曲生成页面 ====================
         with gr.Column(visible=False, elem_id="song-page") as song_page:
@@ -2153,13 +2411,14 @@ def create_app():
                     gr.HTML("""<div style="color: #00f5ff; font-weight: 600; font-size: 1rem; margin-bottom: 8px;">🎵 生成</div>""")
                     
                     song_btn = gr.Button("🎵 生成音乐", variant="primary", size="lg", elem_id="generate-song-btn")
+                    song_stop_btn = gr.Button("⏹ 停止", size="sm")
                     
                     with gr.Row():
                         song_load_example_btn = gr.Button("📋 示例", size="sm")
                         song_format_btn = gr.Button("✨ 格式化", size="sm")
                     
                     gr.HTML("""<div style="color: #00f5ff; font-weight: 600; font-size: 0.95rem; margin: 15px 0 8px 0;">🔊 结果</div>""")
-                    song_output_audio = gr.Audio(label="生成的音乐", show_label=False)
+                    song_output_audio = ResultAudio(label="生成的音乐", show_label=False)
                     
                     song_output_info = gr.Markdown(value="等待生成...", elem_id="song-output-info")
                 
@@ -2176,13 +2435,15 @@ def create_app():
                 outputs=[song_lyrics]
             )
             
-            song_btn.click(
+            song_event = song_btn.click(
                 fn=song_generate,
                 inputs=[song_lyrics, song_description, song_prompt_audio, song_auto_style,
                        song_gen_type, song_max_duration, song_cfg, song_temp,
                        song_top_k, song_top_p, song_low_mem],
-                outputs=[song_output_audio, song_output_info]
+                outputs=[song_output_audio, song_output_info],
+                concurrency_limit=None
             )
+            song_stop_btn.click(fn=None, cancels=[song_event])
         
         # ==================== Avatar 页面 ====================
         with gr.Column(visible=False, elem_id="avatar-page") as avatar_page:
@@ -2253,9 +2514,10 @@ def create_app():
                                     single_mask_range = gr.Slider(1, 10, value=3, step=1, label="遮罩帧范围")
                             
                             single_btn = gr.Button("🎼生成单人视频", variant="primary", size="lg")
+                            single_stop_btn = gr.Button("⏹ 停止", size="sm")
                         
                         with gr.Column(scale=1):
-                            single_output_video = gr.Video(label="生成结果")
+                            single_output_video = ResultVideo(label="生成结果")
                             single_output_info = gr.Markdown(label="生成信息")
                 
                 # 双人对话视频
@@ -2312,92 +2574,179 @@ def create_app():
                                     multi_bbox2 = gr.Textbox(label="Person2 区域", placeholder="50,720,820,1300")
                             
                             multi_btn = gr.Button("🎼 生成双人视频", variant="primary", size="lg")
+                            multi_stop_btn = gr.Button("⏹ 停止", size="sm")
                         
                         with gr.Column(scale=1):
-                            multi_output_video = gr.Video(label="生成结果")
+                            multi_output_video = ResultVideo(label="生成结果")
                             multi_output_info = gr.Markdown(label="生成信息")
             
             # Avatar 按钮事件绑定
-            single_btn.click(
+            single_event = single_btn.click(
                 fn=avatar_single_generate,
                 inputs=[single_audio, single_image, single_prompt, single_stage,
                        single_resolution, single_steps, single_text_cfg, single_audio_cfg,
                        single_seed, single_segments, single_ref_idx, single_mask_range],
-                outputs=[single_output_video, single_output_info]
+                outputs=[single_output_video, single_output_info],
+                concurrency_limit=None
             )
+            single_stop_btn.click(fn=None, cancels=[single_event])
             
-            multi_btn.click(
+            multi_event = multi_btn.click(
                 fn=avatar_multi_generate,
                 inputs=[multi_image, multi_audio1, multi_audio2, multi_prompt,
                        multi_audio_type, multi_resolution, multi_steps, multi_text_cfg,
                        multi_audio_cfg, multi_seed, multi_segments, multi_ref_idx,
                        multi_mask_range, multi_bbox1, multi_bbox2],
-                outputs=[multi_output_video, multi_output_info]
+                outputs=[multi_output_video, multi_output_info],
+                concurrency_limit=None
             )
+            multi_stop_btn.click(fn=None, cancels=[multi_event])
             
+        # ==================== 历史作品画廊页面 ====================
+        with gr.Column(visible=False, elem_id="gallery-page") as gallery_page:
+            with gr.Column(elem_id="gallery-header-container"):
+                gr.HTML("""
+                <div style="display: flex; align-items: center; justify-content: space-between; padding: 20px 30px;
+                background: linear-gradient(135deg, rgba(139, 92, 246, 0.15) 0%, rgba(0, 245, 255, 0.1) 100%);
+                border-radius: 16px; margin-bottom: 25px; border: 1px solid rgba(139, 92, 246, 0.3); box-shadow: 0 10px 30px rgba(0,0,0,0.2);">
+                    <div style="display: flex; align-items: center; gap: 20px;">
+                        <span style="font-size: 2.2rem;">📚</span>
+                        <div>
+                            <h1 style="font-family: 'Orbitron', sans-serif; font-size: 1.8rem; color: #8b5cf6; letter-spacing: 0.05em; margin: 0; font-weight: 800;">
+                                历史作品画廊
+                            </h1>
+                            <p style="color: rgba(255,255,255,0.5); font-size: 0.9rem; margin: 5px 0 0 0; letter-spacing: 0.1em;">
+                                Generation History
+                            </p>
+                        </div>
+                    </div>
+                </div>
+                """)
+                gallery_back_btn = gr.Button("↩️ 返回主页", size="sm", elem_id="gallery-back-btn-styled")
+
+            # 键集分页状态: 已访问页的起始游标栈、下一页游标、本页记录 ID
+            gallery_cursors = gr.State([None])
+            gallery_next_cursor = gr.State(None)
+            gallery_ids = gr.State([])
+
+            # 按任务 ID 重新连接：页面刷新或 WebUI 重启后取回仍在生成 / 已经完成的结果
+            with gr.Row():
+                job_id_box = gr.Textbox(label="任务 ID", placeholder="留空查看最近的任务", scale=4)
+                job_reconnect_btn = gr.Button("🔗 重新连接任务", scale=1)
+
+            with gr.Row():
+                with gr.Column(scale=3):
+                    with gr.Row():
+                        gallery_type = gr.Dropdown(list(GALLERY_TYPES), value="全部", label="类型")
+                        gallery_keyword = gr.Textbox(label="提示词检索", placeholder="输入提示词 / 歌词关键字...")
+                        gallery_search_btn = gr.Button("🔍 检索", variant="primary")
+                    gallery_table = gr.Dataframe(headers=GALLERY_COLUMNS, interactive=False, wrap=True)
+                    with gr.Row():
+                        gallery_prev_btn = gr.Button("⬅️ 上一页", size="sm")
+                        gallery_page_info = gr.Markdown()
+                        gallery_next_btn = gr.Button("下一页 ➡️", size="sm")
+                with gr.Column(scale=2):
+                    gallery_video = ResultVideo(label="作品预览")
+                    gallery_audio = ResultAudio(label="作品预览", visible=False)
+                    gallery_info = gr.Markdown()
+
+            gallery_outputs = [gallery_table, gallery_page_info, gallery_cursors, gallery_next_cursor, gallery_ids]
+            gallery_search_btn.click(fn=gallery_search, inputs=[gallery_type, gallery_keyword], outputs=gallery_outputs)
+            gallery_keyword.submit(fn=gallery_search, inputs=[gallery_type, gallery_keyword], outputs=gallery_outputs)
+            gallery_type.change(fn=gallery_search, inputs=[gallery_type, gallery_keyword], outputs=gallery_outputs)
+            gallery_next_btn.click(
+                fn=gallery_next_page,
+                inputs=[gallery_type, gallery_keyword, gallery_cursors, gallery_next_cursor],
+                outputs=gallery_outputs
+            )
+            gallery_prev_btn.click(
+                fn=gallery_prev_page,
+                inputs=[gallery_type, gallery_keyword, gallery_cursors],
+                outputs=gallery_outputs
+            )
+            gallery_table.select(
+                fn=gallery_select,
+                inputs=[gallery_ids],
+                outputs=[gallery_video, gallery_audio, gallery_info]
+            )
+            # 等待任务结束期间不占用默认并发名额
+            job_reconnect_btn.click(
+                fn=job_reconnect,
+                inputs=[job_id_box],
+                outputs=[gallery_video, gallery_audio, gallery_info],
+                concurrency_limit=None
+            )
+
         # ==================== 页面导航逻辑 ====================
         
-        def show_video_page():
+        def show_page(page):
             return {
-                home_page: gr.update(visible=False),
-                video_page: gr.update(visible=True),
-                song_page: gr.update(visible=False),
-                avatar_page: gr.update(visible=False)
+                home_page: gr.update(visible=page == "home"),
+                video_page: gr.update(visible=page == "video"),
+                song_page: gr.update(visible=page == "song"),
+                avatar_page: gr.update(visible=page == "avatar"),
+                gallery_page: gr.update(visible=page == "gallery")
             }
+
+        def show_video_page():
+            return show_page("video")
         
         def show_song_page():
-            return {
-                home_page: gr.update(visible=False),
-                video_page: gr.update(visible=False),
-                song_page: gr.update(visible=True),
-                avatar_page: gr.update(visible=False)
-            }
+            return show_page("song")
         
         def show_avatar_page():
-            return {
-                home_page: gr.update(visible=False),
-                video_page: gr.update(visible=False),
-                song_page: gr.update(visible=False),
-                avatar_page: gr.update(visible=True)
-            }
+            return show_page("avatar")
         
         def show_home_page():
-            return {
-                home_page: gr.update(visible=True),
-                video_page: gr.update(visible=False),
-                song_page: gr.update(visible=False),
-                avatar_page: gr.update(visible=False)
-            }
+            return show_page("home")
+        
+        def show_gallery_page():
+            return show_page("gallery")
         
         # 绑定导航事件
         video_enter_btn.click(
             fn=show_video_page,
-            outputs=[home_page, video_page, song_page, avatar_page]
+            outputs=[home_page, video_page, song_page, avatar_page, gallery_page]
         )
         
         song_enter_btn.click(
             fn=show_song_page,
-            outputs=[home_page, video_page, song_page, avatar_page]
+            outputs=[home_page, video_page, song_page, avatar_page, gallery_page]
         )
         
         avatar_enter_btn.click(
             fn=show_avatar_page,
-            outputs=[home_page, video_page, song_page, avatar_page]
+            outputs=[home_page, video_page, song_page, avatar_page, gallery_page]
         )
         
         video_back_btn.click(
             fn=show_home_page,
-            outputs=[home_page, video_page, song_page, avatar_page]
+            outputs=[home_page, video_page, song_page, avatar_page, gallery_page]
         )
         
         song_back_btn.click(
             fn=show_home_page,
-            outputs=[home_page, video_page, song_page, avatar_page]
+            outputs=[home_page, video_page, song_page, avatar_page, gallery_page]
         )
         
         avatar_back_btn.click(
             fn=show_home_page,
-            outputs=[home_page, video_page, song_page, avatar_page]
+            outputs=[home_page, video_page, song_page, avatar_page, gallery_page]
+        )
+        
+        # 进入画廊时加载第一页
+        gallery_enter_btn.click(
+            fn=show_gallery_page,
+            outputs=[home_page, video_page, song_page, avatar_page, gallery_page]
+        ).then(
+            fn=gallery_search,
+            inputs=[gallery_type, gallery_keyword],
+            outputs=gallery_outputs
+        )
+        
+        gallery_back_btn.click(
+            fn=show_home_page,
+            outputs=[home_page, video_page, song_page, avatar_page, gallery_page]
         )
         
         # ==================== 原关于标签页内容（已移除，改为主页展示）====================
@@ -2491,6 +2840,10 @@ def create_app():
         </div>
         """)
 
+        # 会话关闭时释放其 pin 住的输出文件 (旧版 Gradio 没有 unload，依赖 STORAGE_PIN_TTL 过期)
+        if hasattr(app, "unload"):
+            app.unload(release_session_outputs)
+
     return app
 
 
@@ -2502,7 +2855,11 @@ if __name__ == "__main__":
     # 这样能保证 Gradio 的沙箱校验字符串与请求字符串完全一致 
     abs_webui_dir = Path(WEBUI_DIR).resolve().as_posix() 
     
-    app.queue().launch(
+    # 事件队列有上限；生成事件的并发由各后端的准入队列控制，AI 助手对话使用独立并发组
+    app.queue(
+        max_size=GRADIO_QUEUE_MAX_SIZE,
+        default_concurrency_limit=GRADIO_DEFAULT_CONCURRENCY
+    ).launch(
         server_name="0.0.0.0",
         server_port=7860,
         share=False,
@@ -2511,6 +2868,16 @@ if __name__ == "__main__":
         # 授权访问整个项目目录及其子目录 
         allowed_paths=[abs_webui_dir],
         js=get_rag_js_logic(),
-        css=get_custom_css()
+        css=get_custom_css(),
+        # 启动后还要注册直通和媒体路由，再阻塞主线程
+        prevent_thread_lock=True
     )
+    # 边下边看的结果地址 /stream/<job_id> (见 modules/stream_proxy.py)
+    register_stream_routes(app.server_app)
+    # 生成结果和知识库媒体 /media/<根名>/<相对路径> (见 modules/media_server.py)
+    register_media_routes(app.server_app)
+    # 上次运行 (如发布前) 未完成的任务：已提交的重新连接后端任务，其余重新执行
+    if JOB_RESUME_ON_START:
+        resume_unfinished_jobs()
+    app.block_thread()
 
@@ -31,6 +31,144 @@ for dir_path in [OUTPUT_DIR, VIDEO_OUTPUT_DIR, SONG_OUTPUT_DIR, AVATAR_OUTPUT_DI
 SERVER_HOST = "0.0.0.0"
 SERVER_PORT = 7860
 SHARE = False
+# 浏览器访问 WebUI 的外部地址 (如 https://maestro.example.com 或 http://127.0.0.1:7860)。
+# 结果地址 (边下边看 /stream、媒体路由 /media) 按它拼成绝对地址直接交给浏览器，不信任请求头里的主机名；
+# 为空时结果经 Gradio 的文件服务 (/file=) 提供，边下边看关闭
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "").rstrip("/")
+
+# 后端 HTTP 连接池配置 (WebUI -> LongCat / Song / Avatar 服务)
+HTTP_POOL_CONNECTIONS = 4      # 每个后端缓存的主机连接池数量
+HTTP_POOL_MAXSIZE = 16         # 每个连接池保持的 keep-alive 连接数
+HTTP_POOL_BLOCK = False        # 连接池耗尽时是否阻塞等待
+HTTP_CONNECT_TIMEOUT = 5       # 建立连接超时 (秒)
+HTTP_RETRY_TOTAL = 3           # 连接建立失败的重试次数 (读超时 / 5xx 由下载续传、轮询和提交重试处理)
+HTTP_RETRY_BACKOFF = 0.5       # 重试退避系数 (秒)
+HTTP_RETRY_STATUS = (502, 503, 504)   # 视为后端暂时不可用、可以重试的状态码
+DOWNLOAD_CHUNK_SIZE = 64 * 1024    # 结果下载分块大小 (字节)，也是断线时最多丢弃重下的字节数
+DOWNLOAD_MAX_ATTEMPTS = 5          # 结果下载最多尝试次数 (断点续传)
+DOWNLOAD_RETRY_BACKOFF = 1.0       # 下载重试初始退避 (秒)，之后指数增长并加随机抖动
+DOWNLOAD_RETRY_MAX_BACKOFF = 30.0  # 下载重试最大退避 (秒)
+UPLOAD_CHUNK_SIZE = 256 * 1024     # 参考图片 / 音频上传分块大小 (字节)
+UPLOAD_DEDUP_ENABLED = True        # 后端支持 blobs 时按内容哈希引用输入文件，已上传过的不再重复上传
+
+# 后端健康监控 (后台线程定期探测 /health，生成请求读取缓存)
+HEALTH_CHECK_INTERVAL = 10         # 探测间隔 (秒)
+HEALTH_MAX_STALENESS = 30          # 缓存最长可用时间 (秒)，超过则同步探测
+HEALTH_PROBE_TIMEOUT = 5           # 单次探测超时 (秒)
+
+# 任务协议 (后端 /health 的 capabilities 含 "jobs" 时使用：提交 -> 轮询 -> 下载)
+JOB_SUBMIT_TIMEOUT = 120           # 提交任务 (含上传) 的读超时 (秒)
+JOB_LONG_POLL_WAIT = 20            # 长轮询时服务端最多挂起的时间 (秒)
+JOB_POLL_INTERVAL = 1.0            # 服务端不支持长轮询时的初始轮询间隔 (秒)
+JOB_POLL_MAX_INTERVAL = 10.0       # 轮询间隔上限 (秒)
+JOB_POLL_MAX_ERRORS = 10           # 连续轮询失败多少次后放弃
+JOB_EVENTS_READ_TIMEOUT = 60       # 进度事件流 (SSE) 无数据多久视为中断 (秒)，中断后改为轮询
+JOB_CANCEL_TIMEOUT = 10            # 取消后端任务请求的超时 (秒)
+
+# 生成结果缓存 (参数规范化哈希 + 输入文件内容哈希 -> 结果文件)
+RESULT_CACHE_ENABLED = True        # 关闭后每次都提交到后端重新生成
+RESULT_CACHE_DIR = OUTPUT_DIR / "cache"
+
+# 输出目录容量管理 (后台线程按配额淘汰最久未用 / 最少使用的文件)
+STORAGE_QUOTAS = {                 # 各输出子目录的字节配额，None 表示不限制
+    "videos": 20 * 1024 ** 3,
+    "songs": 5 * 1024 ** 3,
+    "avatar": 20 * 1024 ** 3,
+    "cache": 20 * 1024 ** 3,
+}
+STORAGE_EVICTION_POLICY = "lru"    # lru: 最久未访问优先淘汰 / lfu: 访问次数最少优先淘汰
+STORAGE_EVICT_TARGET = 0.9         # 超出配额时淘汰到配额的该比例，避免反复触发
+STORAGE_SCAN_INTERVAL = 10         # 后台扫描批次间隔 (秒)
+STORAGE_SCAN_BATCH = 2000          # 每批最多检查的文件数，限制单次扫描开销
+STORAGE_PIN_TTL = 6 * 3600         # 会话引用的输出文件保护时长 (秒)，会话关闭时提前释放
+STORAGE_TEMP_MAX_AGE = 24 * 3600   # 超过该时长 (秒) 未修改的临时文件 (.part) 视为崩溃遗留，扫描时删除
+
+# 冷存储分层: 超过 COLD_TIER_AFTER_DAYS 天未访问的输出移到冷存储，原位置只留存根 (<文件名>.cold)，访问时自动取回
+COLD_TIER = os.getenv("COLD_TIER", "none")  # none: 关闭 (默认) / archive: 本地归档目录 / s3: S3 兼容对象存储
+COLD_TIER_AFTER_DAYS = 30          # 多少天未访问的输出转入冷存储
+COLD_TIER_BATCH = 20               # 后台每批最多转冷的文件数
+COLD_TIER_MIN_SIZE = 64 * 1024     # 小于该大小 (字节) 的文件不转冷
+COLD_TIMEOUT = 300                 # 上传 / 取回冷存储对象的读超时 (秒)
+COLD_ARCHIVE_DIR = Path(os.getenv("COLD_ARCHIVE_DIR", OUTPUT_DIR / "cold"))  # 归档目录，可放在大容量慢盘上
+COLD_ARCHIVE_LEVEL = 6             # 归档 gzip 压缩级别
+COLD_ARCHIVE_STORED = (            # 已压缩 (或 gzip 几乎压不动) 的媒体以级别 0 存入归档，不白白消耗 CPU
+    ".mp4", ".webm", ".mov", ".mkv", ".mp3", ".wav", ".flac", ".m4a", ".ogg", ".png", ".jpg", ".jpeg", ".webp",
+)
+COLD_S3_ENDPOINT = os.getenv("COLD_S3_ENDPOINT", "http://127.0.0.1:9000")  # S3 / MinIO / 本地替身服务地址
+COLD_S3_BUCKET = os.getenv("COLD_S3_BUCKET", "maestro-outputs")
+COLD_S3_PREFIX = os.getenv("COLD_S3_PREFIX", "outputs/")
+COLD_S3_REGION = os.getenv("COLD_S3_REGION", "us-east-1")
+COLD_S3_ACCESS_KEY = os.getenv("COLD_S3_ACCESS_KEY", "")  # 为空时不签名 (本地替身服务)
+COLD_S3_SECRET_KEY = os.getenv("COLD_S3_SECRET_KEY", "")
+
+# 相同输出去重: 内容完全相同的文件改为硬链接 (或 reflink) 到同一份数据，引用计数记录在 DEDUP_DB
+DEDUP_ENABLED = True
+DEDUP_DB = OUTPUT_DIR / ".dedup.db"
+DEDUP_MIN_SIZE = 64 * 1024         # 小于该大小 (字节) 的文件 (元数据等) 不去重
+DEDUP_PASS_BATCH = 50              # 后台去重每批最多计算哈希的文件数
+
+# 输出文件布局: outputs/<子目录>/<ab>/<cd>/<前缀>_<ULID>.<扩展名>，分片深度 0 表示不分片
+OUTPUT_SHARD_DEPTH = 2             # 哈希前缀分片层数，每层 256 个子目录，百万级文件时单目录仍只有几十个文件
+
+# 准入控制: 每个后端组同时执行的任务数 = 每个端点的推理并发能力 × 端点数，其余任务排队，排队数有上限
+BACKEND_CONCURRENCY = {            # 每个端点能同时执行的推理任务数 (单卡服务一般为 1)
+    "longcat": 1,
+    "song": 1,
+    "avatar": 1,
+}
+QUEUE_MAX_WAITING = {              # 每组最多排队的任务数，超出时直接拒绝新任务
+    "longcat": 8,
+    "song": 16,
+    "avatar": 8,
+}
+QUEUE_DEFAULT_DURATION = {         # 还没有完成过任务时，估算等待时间用的单个任务耗时 (秒)
+    "longcat": 600,
+    "song": 180,
+    "avatar": 900,
+}
+QUEUE_STATUS_INTERVAL = 2          # 排队位置 / 预计等待时间的刷新间隔 (秒)
+AFFINITY_BATCH_MAX = 4             # Avatar: 其他模型有任务等待时，同一端点最多连续执行多少个同模型任务 (防饥饿)
+AFFINITY_MAX_WAIT = 900            # Avatar: 等待超过该时长 (秒) 的任务优先执行，不再为减少模型切换而让路
+GRADIO_QUEUE_MAX_SIZE = 64         # Gradio 事件队列总上限，超出时界面提示队列已满
+GRADIO_DEFAULT_CONCURRENCY = 8     # 导航、画廊、示例等轻量事件的默认并发数
+RAG_CONCURRENCY = 4                # AI 助手对话的并发数 (独立并发组，不会排在生成任务后面)
+
+# 结果直通 (边下边看): 生成完成后立即返回 /stream/<job_id>，浏览器在 WebUI 下载结果的同时开始播放
+STREAM_RESULTS = True              # 关闭后等结果完整下载到本地再返回
+STREAM_ROUTE = "/stream"           # 直通地址前缀
+STREAM_PASSTHROUGH_GAP = 8 * 1024 * 1024  # 请求位置超出下载进度多少字节时直接向后端发 Range 请求
+STREAM_READ_TIMEOUT = 120          # 读者等待下一块数据的超时 (秒)
+
+# 媒体路由: 生成结果和知识库媒体经 {MEDIA_ROUTE}/<根名>/<相对路径> 提供 (强 ETag、Range、长缓存、零拷贝发送)
+MEDIA_ROUTE = "/media"
+MEDIA_ROOTS = {                    # 根名 -> 目录；不包含 outputs 根目录本身，生成记录数据库等不会被访问到
+    "videos": VIDEO_OUTPUT_DIR,
+    "songs": SONG_OUTPUT_DIR,
+    "avatar": AVATAR_OUTPUT_DIR,
+    "cache": RESULT_CACHE_DIR,
+    "static": BASE_DIR / "static",
+}
+MEDIA_IMMUTABLE_ROOTS = ("videos", "songs", "avatar", "cache")  # 文件按任务 ID / 内容哈希命名、写入后不再变化的根
+MEDIA_EXTENSIONS = (".mp4", ".webm", ".wav", ".mp3", ".flac", ".ogg", ".png", ".jpg", ".jpeg", ".webp", ".gif")
+MEDIA_MAX_AGE = 365 * 24 * 3600    # immutable 资源的浏览器缓存时间 (秒)
+
+# 生成记录目录 (SQLite，记录每次生成的配置、输入哈希、输出文件和耗时，供画廊浏览)
+CATALOG_DB = OUTPUT_DIR / "catalog.db"
+GALLERY_PAGE_SIZE = 12             # 画廊每页显示的作品数
+
+# 任务库 (SQLite，记录未完成任务的请求、状态和后端任务 ID，WebUI 重启后继续执行或重新连接)
+JOB_STORE_DB = OUTPUT_DIR / "jobs.db"
+JOB_RESUME_ON_START = True         # 启动时继续上次未完成的任务 (已提交的重新连接，未提交的重新执行)
+JOB_STORE_RETENTION_DAYS = 7       # 已结束的任务在任务库中保留的天数 (生成记录见 CATALOG_DB，不受影响)
+JOB_RECONNECT_INTERVAL = 2         # 按任务 ID 重新连接时刷新状态的间隔 (秒)
+JOB_RECONNECT_TIMEOUT = 3600       # 按任务 ID 重新连接时最多等待的时间 (秒)，超时只结束本次等待，任务继续执行
+
+# 熔断与重试 (每个后端端点一个熔断器)
+BREAKER_FAILURE_THRESHOLD = 5      # 连续失败多少次后熔断，不再向该端点分配任务
+BREAKER_RECOVERY_TIMEOUT = 30      # 熔断后多久放行一个试探任务 (秒)
+SUBMIT_MAX_ATTEMPTS = 4            # 提交生成请求最多尝试次数 (仅在可安全重发时重试)
+SUBMIT_RETRY_BACKOFF = 1.0         # 提交重试初始退避 (秒)，指数增长并加随机抖动
+SUBMIT_RETRY_MAX_BACKOFF = 20.0    # 提交重试最大退避 (秒)
 
 # 模型配置
 DEFAULT_VIDEO_PARAMS = {
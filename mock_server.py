@@ -0,0 +1,453 @@
+"""
+Maestro 后端替身服务 (仅用于测试)
+模拟 LongCat-Video / SongGeneration / Avatar 的 HTTP API，不需要 GPU 和模型权重。
+只依赖标准库。
+
+除了阻塞式生成接口 (POST /text_to_video 等)，还实现了任务协议 (capabilities 含 "jobs"):
+    POST /jobs/<生成接口>        提交任务，返回 {"job_id": ...}
+    GET  /jobs/<job_id>?wait=N  查询状态，wait > 0 时长轮询直到状态变化
+                                 status: queued / running / succeeded / failed
+                                 succeeded 时 result 与阻塞接口的返回相同
+    GET  /jobs/<job_id>/events  进度事件流 (SSE，capabilities 含 "events")，每个事件是一份任务状态:
+                                 stage (step / decode / mux)、step/total_steps、
+                                 segment/total_segments、progress (0~1)
+    POST /jobs/<job_id>/cancel  取消任务 (capabilities 含 "cancel")，推理在下一步停止，状态变为 cancelled；
+                                 任务已结束时返回 409
+提交任务时带相同 Idempotency-Key 请求头的重复请求返回同一个 job_id (capabilities 含 "idempotency")。
+输入文件去重 (capabilities 含 "blobs"):
+    HEAD /blobs/<sha256>        200 表示服务端已有该内容，404 表示需要上传
+    PUT  /blobs/<sha256>        上传文件原始内容，服务端校验 sha256
+    生成 / 提交请求的 multipart 表单可以用 blobs 字段 (JSON: {字段名: {sha256, filename}}) 引用已上传的文件。
+--fail-rate 可以让生成 / 提交请求按比例返回 503，用于测试 WebUI 的重试和熔断。
+
+用法:
+    python mock_server.py --kind video  --port 8001
+    python mock_server.py --kind song   --port 8002
+    python mock_server.py --kind avatar --port 8003
+"""
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 各类后端的生成接口及输出扩展名
+GENERATE_ENDPOINTS = {
+    "video": {"/text_to_video": ".mp4", "/image_to_video": ".mp4"},
+    "song": {"/generate": ".wav"},
+    "avatar": {"/single_avatar": ".mp4", "/multi_avatar": ".mp4"},
+}
+
+
+class JobCancelled(Exception):
+    """任务在推理过程中被取消"""
+
+
+class MockBackend:
+    """替身后端的共享状态"""
+
+    def __init__(self, kind, delay=2.0, output_size=2 * 1024 * 1024, jobs=True, events=True,
+                 fail_rate=0.0, blobs=True, cancel=True):
+        self.kind = kind
+        self.capabilities = []
+        if jobs:
+            self.capabilities += ["jobs", "idempotency"]
+            if events:
+                self.capabilities.append("events")
+            if cancel:
+                self.capabilities.append("cancel")
+        if blobs:
+            self.capabilities.append("blobs")
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.output_size = output_size
+        self.output_dir = tempfile.mkdtemp(prefix=f"maestro_mock_{kind}_")
+        self.blob_dir = os.path.join(self.output_dir, "blobs")
+        os.makedirs(self.blob_dir)
+        self.model_type = "single" if kind == "avatar" else None
+        self.lock = threading.Lock()
+        self.active = 0
+        self.cancelled = 0
+        self.jobs = {}
+        self.idempotency_keys = {}
+        self.jobs_changed = threading.Condition()
+
+    def health(self):
+        info = {
+            "status": "ok",
+            "kind": self.kind,
+            "load": self.active,
+            "cancelled": self.cancelled,
+            "capabilities": self.capabilities,
+        }
+        if self.model_type:
+            info["model_type"] = self.model_type
+        return info
+
+    def render(self, endpoint, params, job=None):
+        """模拟一次推理：分步等待 delay 秒后写出一个确定性的输出文件"""
+        with self.lock:
+            self.active += 1
+        try:
+            steps = 10
+            segments = int(params.get("num_segments") or 1)
+            total = steps * segments + 2
+            done = 0
+            for segment in range(1, segments + 1):
+                for step in range(1, steps + 1):
+                    time.sleep(self.delay / total)
+                    if job is not None and job["status"] == "cancelled":
+                        raise JobCancelled()
+                    done += 1
+                    if job is not None:
+                        self.update_job(job["job_id"], status="running", stage="step",
+                                        step=step, total_steps=steps,
+                                        segment=segment, total_segments=segments,
+                                        progress=done / total,
+                                        message=f"step {step}/{steps}")
+            # 解码、封装阶段
+            for stage in ("decode", "mux"):
+                time.sleep(self.delay / total)
+                done += 1
+                if job is not None:
+                    self.update_job(job["job_id"], stage=stage, progress=done / total, message=stage)
+        finally:
+            with self.lock:
+                self.active -= 1
+
+        ext = GENERATE_ENDPOINTS[self.kind][endpoint]
+        filename = f"{endpoint.strip('/')}_{uuid.uuid4().hex[:12]}{ext}"
+        seed = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).digest()
+        block = (seed * (65536 // len(seed) + 1))[:65536]
+        path = os.path.join(self.output_dir, filename)
+        hasher = hashlib.sha256()
+        with open(path, "wb") as f:
+            remaining = self.output_size
+            while remaining > 0:
+                chunk = block[:min(remaining, len(block))]
+                f.write(chunk)
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        return {
+            "success": True,
+            "filename": filename,
+            "size": self.output_size,
+            "sha256": hasher.hexdigest(),
+        }
+
+    # ==================== 任务协议 ====================
+
+    def submit_job(self, endpoint, params, idempotency_key=None):
+        """提交异步任务，后台线程执行推理；相同 idempotency_key 的重复提交返回已有任务"""
+        job_id = uuid.uuid4().hex
+        with self.jobs_changed:
+            if idempotency_key in self.idempotency_keys:
+                return self.idempotency_keys[idempotency_key]
+            if idempotency_key:
+                self.idempotency_keys[idempotency_key] = job_id
+            self.jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "progress": 0.0,
+                "message": "queued",
+                "result": None,
+                "error": None,
+                "version": 0,
+            }
+
+        def run():
+            try:
+                result = self.render(endpoint, params, job=self.jobs[job_id])
+                self.update_job(job_id, status="succeeded", progress=1.0, message="done", result=result)
+            except JobCancelled:
+                print(f"[mock:{self.kind}] 任务 {job_id} 已取消，停止推理")
+            except Exception as e:
+                self.update_job(job_id, status="failed", error=str(e))
+
+        threading.Thread(target=run, daemon=True).start()
+        return job_id
+
+    def update_job(self, job_id, **fields):
+        with self.jobs_changed:
+            job = self.jobs[job_id]
+            if job["status"] == "cancelled":
+                return  # 取消后推理线程的进度更新不再生效
+            job.update(fields)
+            job["version"] += 1
+            self.jobs_changed.notify_all()
+
+    def cancel_job(self, job_id):
+        """取消任务，返回取消后的状态；任务不存在时返回 None"""
+        with self.jobs_changed:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job["status"] in ("queued", "running"):
+                job.update(status="cancelled", error="cancelled by client", message="cancelled")
+                job["version"] += 1
+                self.cancelled += 1
+                self.jobs_changed.notify_all()
+            return job["status"]
+
+    def job_status(self, job_id, wait=0.0, since=None):
+        """读取任务状态；wait > 0 时长轮询，直到状态相对 since 版本变化或超时
+
+        返回 (状态, 版本号)，任务不存在时返回 (None, None)。
+        """
+        deadline = time.time() + wait
+        with self.jobs_changed:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None, None
+            version = job["version"] if since is None else since
+            while job["status"] in ("queued", "running") and job["version"] == version:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.jobs_changed.wait(remaining)
+            return {k: v for k, v in job.items() if k != "version"}, job["version"]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    backend = None
+
+    def log_message(self, format, *args):
+        print(f"[mock:{self.backend.kind}] {self.address_string()} {format % args}")
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = b""
+        while len(body) < length:
+            chunk = self.rfile.read(min(65536, length - len(body)))
+            if not chunk:
+                break
+            body += chunk
+        return body
+
+    def _request_params(self, body):
+        """JSON 请求直接解析；multipart 请求引用 blobs 时解析表单字段，否则只记录请求体摘要
+
+        引用了服务端不存在的 blob 时抛出 LookupError。
+        """
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("application/json"):
+            return json.loads(body or b"{}")
+        if "blobs" in self.backend.capabilities and content_type.startswith("multipart/form-data"):
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+            )
+            fields = {
+                part.get_param("name", header="content-disposition"): part.get_content()
+                for part in message.iter_parts() if not part.get_filename()
+            }
+            if "blobs" in fields:
+                for ref in json.loads(fields["blobs"]).values():
+                    if not os.path.isfile(self._blob_path(ref["sha256"])):
+                        raise LookupError(ref["sha256"])
+                return fields
+        return {"body_sha256": hashlib.sha256(body).hexdigest()}
+
+    def _blob_path(self, digest):
+        if not re.fullmatch(r"[0-9a-f]{64}", digest):
+            return os.path.join(self.backend.blob_dir, "invalid")
+        return os.path.join(self.backend.blob_dir, digest)
+
+    def do_HEAD(self):
+        if self.path.startswith("/blobs/") and "blobs" in self.backend.capabilities:
+            exists = os.path.isfile(self._blob_path(self.path[len("/blobs/"):]))
+            self.send_response(200 if exists else 404)
+        else:
+            self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_PUT(self):
+        """接收 blob：边读边计算 sha256，与地址中的哈希一致才保存"""
+        if not (self.path.startswith("/blobs/") and "blobs" in self.backend.capabilities):
+            self._read_body()
+            self._send_json({"error": "not found"}, 404)
+            return
+        digest = self.path[len("/blobs/"):]
+        path = self._blob_path(digest)
+        length = int(self.headers.get("Content-Length") or 0)
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.backend.blob_dir, suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            remaining = length
+            while remaining > 0:
+                chunk = self.rfile.read(min(65536, remaining))
+                if not chunk:
+                    break
+                f.write(chunk)
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        if hasher.hexdigest() != digest:
+            os.remove(tmp_path)
+            self._send_json({"error": "sha256 mismatch"}, 400)
+            return
+        os.replace(tmp_path, path)
+        self._send_json({"sha256": digest, "size": length}, 201)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/health":
+            self._send_json(self.backend.health())
+        elif url.path.startswith("/download/"):
+            self._send_file(url.path[len("/download/"):])
+        elif (url.path.startswith("/jobs/") and url.path.endswith("/events")
+              and "events" in self.backend.capabilities):
+            self._send_events(url.path[len("/jobs/"):-len("/events")])
+        elif url.path.startswith("/jobs/") and "jobs" in self.backend.capabilities:
+            wait = min(float(query.get("wait", ["0"])[0]), 60.0)
+            status, _ = self.backend.job_status(url.path[len("/jobs/"):], wait=wait)
+            if status is None:
+                self._send_json({"error": "job not found"}, 404)
+            else:
+                self._send_json(status)
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = self._read_body()
+        endpoints = GENERATE_ENDPOINTS[self.backend.kind]
+        if (self.path.startswith("/jobs/") and self.path.endswith("/cancel")
+                and "cancel" in self.backend.capabilities):
+            job_id = self.path[len("/jobs/"):-len("/cancel")]
+            status = self.backend.cancel_job(job_id)
+            if status is None:
+                self._send_json({"error": "job not found"}, 404)
+            else:
+                self._send_json({"job_id": job_id, "status": status}, 200 if status == "cancelled" else 409)
+            return
+        if self.path != "/load_model" and random.random() < self.backend.fail_rate:
+            self._send_json({"error": "overloaded"}, 503)
+            return
+        try:
+            params = self._request_params(body) if self.path != "/load_model" else None
+        except LookupError as e:
+            self._send_json({"error": f"blob not found: {e}"}, 400)
+            return
+        if self.path in endpoints:
+            self._send_json(self.backend.render(self.path, params))
+        elif (self.path.startswith("/jobs/") and "jobs" in self.backend.capabilities
+              and self.path[len("/jobs"):] in endpoints):
+            job_id = self.backend.submit_job(self.path[len("/jobs"):], params,
+                                             self.headers.get("Idempotency-Key"))
+            self._send_json({"job_id": job_id}, 202)
+        elif self.path == "/load_model" and self.backend.kind == "avatar":
+            time.sleep(self.backend.delay)
+            self.backend.model_type = json.loads(body).get("model_type")
+            self._send_json({"success": True, "model_type": self.backend.model_type})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _send_events(self, job_id):
+        """以 SSE (chunked) 推送任务状态，任务结束后关闭；空闲时发送心跳注释"""
+        status, version = self.backend.job_status(job_id)
+        if status is None:
+            self._send_json({"error": "job not found"}, 404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_chunk(data):
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        last_version = None
+        while True:
+            if version != last_version:
+                payload = json.dumps(status, ensure_ascii=False)
+                write_chunk(f"data: {payload}\n\n".encode("utf-8"))
+                last_version = version
+            else:
+                write_chunk(b": ping\n\n")
+            if status["status"] not in ("queued", "running"):
+                break
+            status, version = self.backend.job_status(job_id, wait=15, since=version)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_file(self, filename):
+        path = os.path.join(self.backend.output_dir, os.path.basename(filename))
+        if not os.path.isfile(path):
+            self._send_json({"error": "not found"}, 404)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), size - 1)
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(65536, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maestro 后端替身服务")
+    parser.add_argument("--kind", choices=sorted(GENERATE_ENDPOINTS), default="video")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=2.0, help="模拟推理耗时 (秒)")
+    parser.add_argument("--output-size", type=int, default=2 * 1024 * 1024, help="模拟输出文件大小 (字节)")
+    parser.add_argument("--no-jobs", action="store_true", help="不提供任务协议，只支持阻塞式生成接口")
+    parser.add_argument("--no-events", action="store_true", help="不提供进度事件流，只能轮询任务状态")
+    parser.add_argument("--no-blobs", action="store_true", help="不支持按内容哈希引用输入文件，每次都随请求上传")
+    parser.add_argument("--no-cancel", action="store_true", help="不提供取消任务接口")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="生成 / 提交请求返回 503 的比例 (0~1)")
+    args = parser.parse_args()
+
+    MockHandler.backend = MockBackend(args.kind, delay=args.delay, output_size=args.output_size,
+                                      jobs=not args.no_jobs, events=not args.no_events,
+                                      fail_rate=args.fail_rate, blobs=not args.no_blobs,
+                                      cancel=not args.no_cancel)
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    print(f"Mock {args.kind} backend on http://{args.host}:{args.port} (outputs: {MockHandler.backend.output_dir})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
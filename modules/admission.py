@@ -0,0 +1,197 @@
+"""
+准入控制
+每个后端组 (LongCat / Song / Avatar) 一个有界 FIFO 队列：同时执行的任务数等于各端点真实的推理并发能力之和
+(BACKEND_CONCURRENCY × 端点数)，其余任务排队等待；排队数达到 QUEUE_MAX_WAITING 时新任务直接被拒绝，
+而不是在后端堆积。
+
+排队期间每 QUEUE_STATUS_INTERVAL 秒通过进度回调报告排队位置和预计等待时间
+(按该组最近任务耗时的指数滑动平均估算)。等待中的任务被取消时立即移出队列。
+同步路径 (线程) 和 asyncio 路径共用同一个队列。
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+
+from config import BACKEND_CONCURRENCY, QUEUE_MAX_WAITING, QUEUE_STATUS_INTERVAL, QUEUE_DEFAULT_DURATION
+
+# 任务耗时滑动平均的权重
+_EWMA_ALPHA = 0.3
+
+
+class QueueFullError(Exception):
+    """排队任务数已达上限，拒绝新任务"""
+
+
+class _Ticket:
+    """一个排队中的任务：被放行时唤醒 (线程 Event 或 asyncio Future)"""
+
+    def __init__(self, loop=None, model_type=None):
+        self.model_type = model_type
+        self.enqueued_at = time.time()
+        self.granted = False
+        self.lane = None         # 放行时分配的执行位置 (AffinityQueue 中为端点地址)
+        self.event = threading.Event()
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+
+    def grant(self, lane=None):
+        self.granted = True
+        self.lane = lane
+        self.event.set()
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_set_future, self.future)
+
+
+def _set_future(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def format_wait(seconds):
+    """预计等待时间的显示文字"""
+    if seconds < 60:
+        return f"{int(seconds) + 1} 秒"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes} 分 {seconds} 秒" if minutes < 60 else f"{minutes // 60} 小时 {minutes % 60} 分"
+
+
+class AdmissionQueue:
+    """一个后端组的并发上限与等待队列 (线程安全)
+
+    子类通过 _dispatch() (在持有锁时调用) 决定放行哪些等待者以及分配到哪个执行位置。
+    """
+
+    def __init__(self, name, capacity, max_waiting=None, default_duration=None):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.max_waiting = QUEUE_MAX_WAITING.get(name, 8) if max_waiting is None else max_waiting
+        self.avg_duration = default_duration or QUEUE_DEFAULT_DURATION.get(name, 300)
+        self.running = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    # ==================== 排队 / 放行 ====================
+
+    def _enqueue(self, loop=None, model_type=None):
+        """加入队列并尝试放行，返回排队凭证 (可能已被放行)；队列已满时抛出 QueueFullError"""
+        with self._lock:
+            if len(self._waiters) >= self.max_waiting:
+                self._rejected += 1
+                raise QueueFullError(
+                    f"当前排队任务已满 ({len(self._waiters)} 个任务等待、{self.running} 个正在生成)，请稍后再试"
+                )
+            ticket = _Ticket(loop, model_type)
+            self._waiters.append(ticket)
+            self._dispatch()
+            return ticket
+
+    def _dispatch(self):
+        """先到先得：有空闲名额就放行队首"""
+        while self._waiters and self.running < self.capacity:
+            self.running += 1
+            self._waiters.popleft().grant()
+
+    def _free(self, lane):
+        """释放一个执行名额 (持有锁时调用)"""
+        self.running -= 1
+
+    def release(self, duration=None, lane=None):
+        """任务结束 (duration 为执行耗时，用于估算等待时间；lane 为 acquire 的返回值)，放行后续等待者"""
+        with self._lock:
+            if duration is not None:
+                self.avg_duration += _EWMA_ALPHA * (duration - self.avg_duration)
+            self._free(lane)
+            self._dispatch()
+
+    def _abandon(self, ticket):
+        """等待中的任务被取消：移出队列；名额已交给它时转交下一个"""
+        with self._lock:
+            if not ticket.granted:
+                self._waiters.remove(ticket)
+                self._dispatch()
+                return
+        self.release(lane=ticket.lane)
+
+    def _poke(self):
+        """定时重新调度 (等待时间相关的放行条件，见 AffinityQueue)"""
+        with self._lock:
+            self._dispatch()
+
+    def position(self, ticket):
+        """排队位置 (从 1 开始) 和预计等待秒数"""
+        with self._lock:
+            try:
+                index = self._waiters.index(ticket)
+            except ValueError:
+                return 0, 0.0
+            return index + 1, math.ceil((index + 1) / self.capacity) * self.avg_duration
+
+    def _report(self, ticket, progress_callback):
+        if not progress_callback:
+            return
+        position, eta = self.position(ticket)
+        if position:
+            progress_callback(0.05, f"排队中: 第 {position} 位，预计 {format_wait(eta)}后开始")
+
+    def acquire(self, progress_callback=None, model_type=None):
+        """占用一个执行名额 (同步路径)，排队期间报告位置，返回分配的执行位置；任务结束后必须调用 release()"""
+        ticket = self._enqueue(model_type=model_type)
+        try:
+            self._report(ticket, progress_callback)
+            while not ticket.event.wait(QUEUE_STATUS_INTERVAL):
+                self._poke()
+                self._report(ticket, progress_callback)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        return ticket.lane
+
+    async def acquire_async(self, progress_callback=None, model_type=None):
+        """占用一个执行名额 (asyncio 路径)；等待中被取消时立即移出队列"""
+        ticket = self._enqueue(asyncio.get_running_loop(), model_type)
+        try:
+            self._report(ticket, progress_callback)
+            while not ticket.granted:
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket.future), QUEUE_STATUS_INTERVAL)
+                except asyncio.TimeoutError:
+                    self._poke()
+                    self._report(ticket, progress_callback)
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        return ticket.lane
+
+    def stats(self):
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "running": self.running,
+                "waiting": len(self._waiters),
+                "max_waiting": self.max_waiting,
+                "rejected": self._rejected,
+                "avg_duration": round(self.avg_duration, 1),
+            }
+
+
+# 全局实例: 组名 -> AdmissionQueue
+admission_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_admission_queue(name, endpoints=1, create=None):
+    """获取后端组的准入队列；默认容量为每个端点的并发能力 × 端点数，create 用于创建其他调度策略的队列"""
+    with _queues_lock:
+        queue = admission_queues.get(name)
+        if queue is None:
+            queue = create() if create else AdmissionQueue(name, BACKEND_CONCURRENCY.get(name, 1) * endpoints)
+            admission_queues[name] = queue
+        return queue
+
+
+def get_admission_stats():
+    with _queues_lock:
+        return {name: queue.stats() for name, queue in admission_queues.items()}
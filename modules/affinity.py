@@ -0,0 +1,136 @@
+"""
+模型亲和调度 (Avatar)
+单人 / 双人数字人需要不同的模型，后端每次切换 (/load_model) 要几分钟。先到先得时交替到达的请求
+会让后端反复切换，因此 Avatar 的准入队列按端点分成若干执行位置 (lane)，每个位置记住当前加载的模型：
+位置空出时优先放行与它当前模型相同的任务，把同一模型的任务成批执行完再切换。
+
+防饥饿:
+    其他模型有任务等待时，同一位置最多连续执行 AFFINITY_BATCH_MAX 个同模型任务；
+    等待超过 AFFINITY_MAX_WAIT 秒的任务优先执行。
+多端点时，另一个端点已经加载 (或固定, 见 endpoint_pool 的 model=X) 某模型时，该模型的任务等那个端点，
+不让空闲端点切换模型 (同样受 AFFINITY_MAX_WAIT 约束)。
+
+每个端点可以同时执行多个任务时 (BACKEND_CONCURRENCY > 1)，只在位置上没有任务执行时切换模型。
+排空、不健康或熔断中的端点不分配任务；没有任何端点能接收的任务直接放行，由端点池返回不可用的错误，
+不在队列里无限等待。调度时只读取健康监控的缓存快照 (不探测、不加健康监控的锁)。
+"""
+import time
+
+from config import BACKEND_CONCURRENCY, AFFINITY_BATCH_MAX, AFFINITY_MAX_WAIT
+from modules.admission import AdmissionQueue
+
+
+class _Lane:
+    """一个端点上的执行位置"""
+
+    def __init__(self, endpoint, capacity):
+        self.endpoint = endpoint
+        self.capacity = capacity
+        self.running = 0
+        self.model = None    # 当前 (即将) 加载的模型，None 表示未知
+        self.batch = 0       # 当前模型已连续放行的任务数
+
+
+class AffinityQueue(AdmissionQueue):
+    """按模型类型成批放行的准入队列"""
+
+    def __init__(self, name, pool, max_waiting=None, default_duration=None):
+        per_endpoint = BACKEND_CONCURRENCY.get(name, 1)
+        super().__init__(name, per_endpoint * len(pool.endpoints), max_waiting, default_duration)
+        self.pool = pool
+        self.lanes = {endpoint.url: _Lane(endpoint, per_endpoint) for endpoint in pool.endpoints}
+        self._switches = 0
+
+    def _dispatch(self):
+        progress = True
+        while progress and self._waiters:
+            progress = False
+            for lane in self.lanes.values():
+                if lane.running >= lane.capacity or not self._usable(lane):
+                    continue
+                ticket = self._pick(lane)
+                if ticket is None:
+                    continue
+                self._waiters.remove(ticket)
+                lane.running += 1
+                self.running += 1
+                if ticket.model_type != lane.model:
+                    if lane.model is not None:
+                        self._switches += 1
+                    lane.model, lane.batch = ticket.model_type, 0
+                # 只在其他模型的任务等待时累计本批长度
+                contended = any(
+                    other.model_type != ticket.model_type and self.pool.serves(lane.endpoint, other.model_type)
+                    for other in self._waiters
+                )
+                lane.batch = lane.batch + 1 if contended else 0
+                ticket.grant(lane.endpoint.url)
+                progress = True
+        for ticket in list(self._waiters):
+            if not any(self._usable(lane) and self.pool.serves(lane.endpoint, ticket.model_type)
+                       for lane in self.lanes.values()):
+                # 没有端点能接收：不分配位置直接放行，由端点池返回不可用的错误
+                self._waiters.remove(ticket)
+                self.running += 1
+                ticket.grant(None)
+
+    @staticmethod
+    def _usable(lane):
+        """位置所在端点能接收新任务：未排空、未熔断，且最近一次健康探测成功 (还没探测过时视为可用)"""
+        endpoint = lane.endpoint
+        if endpoint.drain or not endpoint.breaker.can_attempt():
+            return False
+        snapshot = endpoint.health.cached()
+        return snapshot is None or snapshot["available"]
+
+    def _lane_model(self, lane):
+        """位置当前的模型：未知时读取端点健康监控的缓存快照"""
+        if lane.model is None:
+            snapshot = lane.endpoint.health.cached()
+            lane.model = snapshot["model_type"] if snapshot else None
+        return lane.model
+
+    def _pick(self, lane):
+        """为空出的位置选择下一个任务；没有合适的任务时返回 None (位置暂时空闲)"""
+        eligible = [ticket for ticket in self._waiters if self.pool.serves(lane.endpoint, ticket.model_type)]
+        if not eligible:
+            return None
+        now = time.time()
+        current = self._lane_model(lane)
+        oldest = eligible[0]
+        same = next((ticket for ticket in eligible if ticket.model_type == current), None)
+        overdue = now - oldest.enqueued_at >= AFFINITY_MAX_WAIT
+
+        if same is not None:
+            # 成批执行同一模型，直到其他模型的任务等太久或本批达到上限
+            if oldest is same or not (overdue or lane.batch >= AFFINITY_BATCH_MAX):
+                return same
+            # 轮到其他模型：等本位置上的任务执行完再切换
+            return oldest if lane.running == 0 else None
+
+        # 需要切换模型：不在执行中的任务下面切换；只切到没有其他端点在处理的模型，除非任务已经等太久
+        if lane.running:
+            return None
+        held = {
+            self._lane_model(other) for other in self.lanes.values()
+            if other is not lane and self._usable(other)
+        }
+        for ticket in eligible:
+            if ticket.model_type not in held or now - ticket.enqueued_at >= AFFINITY_MAX_WAIT:
+                return ticket
+        return None
+
+    def _free(self, lane):
+        self.running -= 1
+        if lane in self.lanes:
+            self.lanes[lane].running -= 1
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats["switches"] = self._switches
+            stats["lanes"] = {
+                url: {"model": lane.model, "running": lane.running, "batch": lane.batch}
+                for url, lane in self.lanes.items()
+            }
+        return stats
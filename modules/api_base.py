@@ -0,0 +1,1145 @@
+"""
+HTTP API 模块基类
+LongCat-Video / SongGeneration / Avatar 三个模块共用的生成流程：
+查结果缓存 -> 合并进行中的相同请求 -> 选择端点 (见 endpoint_pool) -> (切换模型) -> 发送生成请求 (阻塞接口，或提交任务后订阅进度 / 轮询) -> 下载结果。
+同一份任务描述 (job) 既可以走同步路径，也可以走 asyncio 路径。
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import httpx
+import requests
+from urllib3.exceptions import NewConnectionError
+
+from config import (
+    HTTP_CONNECT_TIMEOUT, HTTP_RETRY_STATUS, JOB_SUBMIT_TIMEOUT, JOB_LONG_POLL_WAIT,
+    JOB_POLL_INTERVAL, JOB_POLL_MAX_INTERVAL, JOB_POLL_MAX_ERRORS,
+    JOB_EVENTS_READ_TIMEOUT, JOB_CANCEL_TIMEOUT, SUBMIT_MAX_ATTEMPTS, SUBMIT_RETRY_BACKOFF,
+    SUBMIT_RETRY_MAX_BACKOFF, UPLOAD_DEDUP_ENABLED,
+)
+from modules.admission import QueueFullError, get_admission_queue
+from modules.catalog import get_catalog
+from modules.endpoint_pool import EndpointPool
+from modules.file_utils import file_digest
+from modules.http_client import DownloadError
+from modules.job_ids import new_job_id, shard_dir
+from modules.job_store import get_job_store
+from modules.resilience import BackendUnavailableError, retry_call, retry_call_async
+from modules.multipart import MultipartEncoder, FileStream, scaled_progress
+from modules.result_cache import get_result_cache
+from modules.singleflight import get_singleflight
+from modules.storage_manager import get_storage_manager
+from modules.dedup import get_dedup_index
+from modules.stream_proxy import get_stream_registry
+
+# 输出根目录
+OUTPUT_ROOT = Path(__file__).parent.parent / "outputs"
+
+
+class JobTimeoutError(Exception):
+    """任务在 job["timeout"] 内没有完成"""
+
+
+class _Cancelled(Exception):
+    """并行的准备步骤中另一步已经失败，本步骤提前结束"""
+
+
+# 计入熔断器的失败：连接失败、超时、后端过载和下载失败 (生成本身报错不计入)
+_BACKEND_FAILURES = (
+    requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+    httpx.TransportError, BackendUnavailableError, DownloadError, ConnectionError,
+)
+_TIMEOUTS = (requests.exceptions.Timeout, httpx.TimeoutException, JobTimeoutError)
+
+
+def _never_sent(error):
+    """请求没有到达后端 (连接被拒绝 / 连接超时)"""
+    if isinstance(error, (requests.exceptions.ConnectTimeout, httpx.ConnectError, httpx.ConnectTimeout)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], "reason", None), NewConnectionError)
+    return False
+
+
+def _submit_retryable(error, idempotent):
+    """提交失败后能否安全重发
+
+    请求没有到达后端、或后端明确拒绝 (503) 时总是可以重发；后端支持 Idempotency-Key 去重时
+    (capabilities 含 "idempotency")，连接中断、读超时和 502 / 504 也可以重发，不会重复创建任务。
+    """
+    if _never_sent(error):
+        return True
+    if isinstance(error, BackendUnavailableError):
+        return idempotent or error.status_code == 503
+    if idempotent:
+        return isinstance(error, (requests.exceptions.ConnectionError,
+                                  requests.exceptions.Timeout, httpx.TransportError))
+    return False
+
+
+def _cancellable(report, cancel):
+    """上传进度回调：每发送一块数据检查一次取消标志"""
+    if cancel is None:
+        return report
+
+    def on_chunk(sent, total):
+        if cancel.is_set():
+            raise _Cancelled()
+        if report:
+            report(sent, total)
+    return on_chunk
+
+
+def _split_span(files, span):
+    """把上传进度区间 span 依次分给每个输入文件，返回 [(字段名, 路径, 子区间)] (多个文件时进度条不回退)"""
+    files = [(name, path) for name, path in files.items() if path is not None]
+    start, end = span
+    step = (end - start) / max(1, len(files))
+    return [(name, path, (start + step * i, start + step * (i + 1))) for i, (name, path) in enumerate(files)]
+
+
+@contextmanager
+def _timed(job, phase):
+    """记录一个阶段的耗时到 job["timings"] (秒)，写入生成记录"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        job.setdefault("timings", {})[phase] = round(time.perf_counter() - started, 3)
+
+
+def describe_job_progress(status):
+    """把后端上报的进度 (阶段、步数、片段) 转换为进度条文字"""
+    stage = status.get("stage") or status.get("status")
+    if stage == "queued":
+        return "排队中..."
+    if stage == "decode":
+        return "解码中..."
+    if stage == "mux":
+        return "合成视频中..."
+    if status.get("step") is not None and status.get("total_steps"):
+        desc = f"推理中 step {status['step']}/{status['total_steps']}"
+        if (status.get("total_segments") or 1) > 1:
+            desc += f" · 片段 {status.get('segment', 1)}/{status['total_segments']}"
+        return desc
+    return f"生成中... {status.get('message') or ''}".strip()
+
+
+def report_job_progress(status, progress_callback=None):
+    """把后端推理进度 (0~1) 映射到 progress_callback 的 [0.3, 0.8] 区间"""
+    if not progress_callback:
+        return
+    fraction = min(max(float(status.get("progress") or 0.0), 0.0), 1.0)
+    progress_callback(0.3 + 0.5 * fraction, describe_job_progress(status))
+
+
+class _SSEParser:
+    """server-sent events 解析：逐行喂入，一个事件结束时返回其 JSON 数据"""
+
+    def __init__(self):
+        self._data = []
+
+    def feed(self, line):
+        if line.startswith(":"):
+            return None  # 注释 / 心跳
+        if line.startswith("data:"):
+            self._data.append(line[5:].lstrip())
+            return None
+        if line == "" and self._data:
+            data, self._data = "\n".join(self._data), []
+            try:
+                return json.loads(data)
+            except ValueError:
+                return None
+        return None
+
+
+class _JobPoller:
+    """任务轮询状态：截止时间、退避间隔和连续失败计数 (同步 / asyncio 共用)"""
+
+    def __init__(self, job):
+        self.deadline = time.time() + job["timeout"] if job["timeout"] else None
+        self.interval = JOB_POLL_INTERVAL
+        self.errors = 0
+        self.last_state = None
+
+    def check_deadline(self):
+        if self.deadline and time.time() > self.deadline:
+            raise JobTimeoutError("请求超时，生成时间过长")
+
+    def on_error(self):
+        """轮询请求失败：超过 JOB_POLL_MAX_ERRORS 次放弃，否则返回退避时间"""
+        self.errors += 1
+        if self.errors >= JOB_POLL_MAX_ERRORS:
+            raise ConnectionError(f"任务状态查询连续失败 {self.errors} 次")
+        delay = self.interval
+        self.interval = min(self.interval * 2, JOB_POLL_MAX_INTERVAL)
+        return delay
+
+    def on_status(self, status, progress_callback=None):
+        """处理一次状态响应；任务结束时返回生成结果，否则返回 None"""
+        self.errors = 0
+        if status is None:
+            return {"success": False, "error": "后端任务不存在 (服务可能已重启)"}
+
+        state = status.get("status")
+        if state == "succeeded":
+            return status.get("result") or {"success": False, "error": "任务结果为空"}
+        if state in ("failed", "cancelled"):
+            return {"success": False, "error": status.get("error") or "生成失败"}
+
+        report_job_progress(status, progress_callback)
+
+        # 状态有变化时恢复初始轮询间隔
+        key = (state, status.get("progress"))
+        if key != self.last_state:
+            self.interval = JOB_POLL_INTERVAL
+        self.last_state = key
+        return None
+
+    def next_delay(self, elapsed):
+        """下一次轮询前的等待：服务端已挂起请求 (长轮询超时返回) 时立即再查，否则按间隔退避"""
+        if elapsed >= JOB_LONG_POLL_WAIT / 2:
+            return 0
+        delay = self.interval
+        self.interval = min(self.interval * 2, JOB_POLL_MAX_INTERVAL)
+        return delay
+
+
+def _check_blob_upload(status_code):
+    """检查输入文件上传 (PUT /blobs/<sha256>) 的响应状态"""
+    if status_code in HTTP_RETRY_STATUS:
+        raise BackendUnavailableError(status_code)
+    if status_code >= 400:
+        raise RuntimeError(f"输入文件上传失败 (HTTP {status_code})")
+
+
+def _check_model_switch(status_code):
+    """检查 /load_model 的响应状态"""
+    if status_code in HTTP_RETRY_STATUS:
+        raise BackendUnavailableError(status_code)
+    if status_code >= 400:
+        raise RuntimeError(f"切换模型失败 (HTTP {status_code})")
+
+
+class ApiModuleBase:
+    """HTTP API 模块基类
+
+    子类把每个生成功能描述为 (config, job)：config 是返回给界面的配置信息，
+    job 描述如何调用后端:
+        endpoint: 生成接口路径
+        json: JSON 请求体；或 fields + files: multipart 表单字段和文件路径
+        timeout: 生成请求读超时 (秒)，None 表示不限制
+        download_timeout: 结果下载读超时 (秒)
+        output_path: 本地输出文件路径 (由 _new_output 分配)
+        job_id: 任务 ID (ULID)，写入生成记录和返回的 config
+        model_type: (可选) 需要的后端模型类型，与后端当前模型不一致时先调用 /load_model
+            (后端支持 blobs 时与输入文件上传并行，见 _prepare)
+        cacheable: (可选) False 表示结果不进入结果缓存
+        coalesce: (可选) False 表示不与进行中的相同请求合并
+        switch_desc / request_desc / upload_desc: (可选) 进度提示文字
+    后端 capabilities 含 "blobs" 时，files 中的文件按 sha256 引用 (见 _upload_blobs)，后端已有的不再上传。
+    执行时写回 job["request_key"] (规范化请求哈希)、job["cache_key"] (结果缓存键)、job["backend_url"] (分配到的端点)、job["idempotency_key"] (提交去重键)、
+    job["backend_job_id"] (后端任务 ID) 和 job["timings"] (各阶段耗时)；结束后写入生成记录 (见 catalog.py)。
+    任务状态同时写入任务库 (见 job_store.py)，WebUI 重启后由 resume_jobs() 继续未完成的任务。
+    """
+
+    # 服务不可用时的提示，子类覆盖
+    service_error = "服务未启动"
+    # 准入队列的组名 (见 admission.py)，子类覆盖
+    queue_name = "default"
+
+    def __init__(self, api_url, output_subdir):
+        # api_url 可以是单个地址，也可以是逗号分隔的多个端点 (见 modules/endpoint_pool.py)
+        self.api_url = api_url
+        self.pool = EndpointPool(api_url)
+        self.admission = self._admission_queue()
+        self.cache = get_result_cache()
+        self.flights = get_singleflight()
+        self.storage = get_storage_manager()
+        self.dedup = get_dedup_index()
+        self.catalog = get_catalog()
+        self.jobs = get_job_store()
+        self.streams = get_stream_registry()
+        self.output_dir = OUTPUT_ROOT / output_subdir
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+    def _admission_queue(self):
+        """该模块的准入队列 (先到先得)，子类可以换成其他调度策略"""
+        return get_admission_queue(self.queue_name, len(self.pool.endpoints))
+
+    def _new_output(self, prefix, suffix):
+        """分配任务 ID 和输出路径: output_dir/<ab>/<cd>/<prefix>_<ULID><suffix>，返回 (job_id, 路径)
+
+        结果通过临时文件原子落盘 (见 http_client)，读者不会看到写了一半的文件。
+        """
+        job_id = new_job_id()
+        return job_id, shard_dir(self.output_dir, job_id) / f"{prefix}_{job_id}{suffix}"
+
+    def pool_stats(self):
+        """各端点的路由状态和连接池统计"""
+        stats = []
+        for endpoint, item in zip(self.pool.endpoints, self.pool.stats()):
+            item["sync"] = endpoint.transport.pool_stats()
+            item["async"] = endpoint.async_transport.pool_stats()
+            stats.append(item)
+        return stats
+
+    def _unavailable_error(self):
+        """没有可分配端点时的提示"""
+        wait = self.pool.breaker_wait()
+        if wait is not None:
+            return f"后端连续请求失败，已暂停分配任务，约 {int(wait) + 1} 秒后自动恢复"
+        return self.service_error
+
+    # ==================== 同步路径 ====================
+
+    def _execute(self, job, config, progress_callback=None):
+        """同步执行生成任务并写入生成记录，返回 (output_path, config)"""
+        job.setdefault("idempotency_key", uuid.uuid4().hex)
+        self.jobs.create(self.queue_name, job, config)
+        if progress_callback:
+            progress_callback(0.01, f"任务已登记 (ID: {job['job_id']})")
+        return self._run_job(job, config, self._execute_job, progress_callback)
+
+    def _run_job(self, job, config, run, progress_callback=None):
+        """执行 run(job, config, progress_callback)，结果写入任务库和生成记录"""
+        started = time.time()
+        try:
+            output_path, config = run(job, config, self.jobs.track(job["job_id"], progress_callback))
+        except Exception as e:
+            self.jobs.finish(job["job_id"], None, dict(config, error=str(e)))
+            raise
+        config["job_id"] = job.get("job_id")
+        self.jobs.finish(job["job_id"], output_path, config)
+        self._catalog_record(job, config, output_path, time.time() - started)
+        return output_path, config
+
+    # ==================== 重启后继续 ====================
+
+    def resume_jobs(self):
+        """在后台继续上次运行时未完成的任务，返回任务数
+
+        已拿到后端任务 ID 的任务重新连接 (不重新提交)，其余任务按保存的请求重新执行。
+        """
+        pending = self.jobs.unfinished(self.queue_name)
+        for item in pending:
+            threading.Thread(
+                target=self._resume, args=(item,), name=f"resume-{item['job_id']}", daemon=True
+            ).start()
+        return len(pending)
+
+    def _resume(self, item):
+        job, config = item["request"], item["config"]
+        job.update(output_path=Path(job["output_path"]),
+                   backend_url=item["backend_url"], backend_job_id=item["backend_job_id"])
+        try:
+            self._run_job(job, config, self._resume_job)
+        except Exception as e:
+            print(f"[{self.queue_name}] 继续任务 {job['job_id']} 失败: {e}")
+
+    def _resume_job(self, job, config, progress_callback=None):
+        if job.get("backend_job_id") and job.get("backend_url"):
+            print(f"[{self.queue_name}] 重新连接后端任务 {job['backend_job_id']} ({job['backend_url']})")
+            return self._reattach(job, config, progress_callback)
+        missing = [path for path in (job.get("files") or {}).values() if path and not os.path.exists(path)]
+        if missing:
+            config["error"] = "WebUI 重启后输入文件已不存在，无法重新执行，请重新提交"
+            return None, config
+        print(f"[{self.queue_name}] 重新执行任务 {job['job_id']}")
+        return self._execute_job(job, config, progress_callback)
+
+    def _reattach(self, job, config, progress_callback=None):
+        """连接已提交的后端任务 (重启前提交的，或中断的合并任务执行者提交的)：等待结束、下载结果并写入缓存
+        (已在后端执行，不再经过准入队列)"""
+        backend = self.pool.attach(job["backend_url"], job.get("model_type"))
+        if backend is None:
+            config["error"] = f"任务所在的后端 {job['backend_url']} 已不在端点列表中"
+            return None, config
+        try:
+            if progress_callback:
+                progress_callback(0.3, "重新连接后端任务...")
+            capabilities = backend.health.snapshot()["capabilities"]
+            result = self._await_backend_job(backend, job, capabilities, progress_callback)
+            output_path, config = self._download_result(backend, job, config, result, progress_callback)
+        except Exception as e:
+            output_path, config = self._fail(backend, e, config)
+        finally:
+            self.pool.release(backend)
+        if output_path:
+            self._cache_store(job, output_path, config)
+        return output_path, config
+
+    def _execute_job(self, job, config, progress_callback=None):
+        """查缓存 -> 合并相同请求 -> 生成"""
+        with _timed(job, "lookup"):
+            cached = self._cache_lookup(job)
+        if cached is not None:
+            return self._finish_cached(cached, config, progress_callback)
+
+        while True:
+            flight, leader = self.flights.join(self._flight_key(job), progress_callback)
+            if leader:
+                break
+            try:
+                result = flight.wait()
+            finally:
+                flight.depart(progress_callback)
+            if not result[1].get("interrupted"):
+                return self._follow(result, config)
+            # 执行者中途取消 / 异常退出：重新加入，由第一个重试的等待者接手 (见 _take_over)
+            self._take_over(job, result[1])
+        try:
+            if job.get("backend_job_id"):
+                self.jobs.update(job["job_id"], "submitted",
+                                 backend_url=job["backend_url"], backend_job_id=job["backend_job_id"])
+                output_path, config = self._reattach(job, config, flight.report if flight else progress_callback)
+            else:
+                output_path, config = self._generate(job, config, flight.report if flight else progress_callback)
+            if flight:
+                flight.resolve(output_path, config)
+            return output_path, config
+        finally:
+            self._leave_flight(flight, job)
+
+    @staticmethod
+    def _take_over(job, interrupted):
+        """接手中断的合并任务：执行者已提交到后端时等待同一个后端任务 (不重新提交、不重复占用 GPU)，
+        否则沿用执行者的提交去重键重新执行"""
+        if interrupted.get("idempotency_key"):
+            job["idempotency_key"] = interrupted["idempotency_key"]
+        if interrupted.get("backend_job_id") and interrupted.get("backend_url"):
+            job["backend_url"] = interrupted["backend_url"]
+            job["backend_job_id"] = interrupted["backend_job_id"]
+
+    def _leave_flight(self, flight, job):
+        """执行者结束：已提交的后端任务交给接手的等待者"""
+        self.flights.leave(flight, job.get("idempotency_key"), job.get("backend_url"), job.get("backend_job_id"))
+
+    def _generate(self, job, config, progress_callback=None):
+        """排队等待执行名额后生成；队列已满时直接返回拒绝信息"""
+        try:
+            with _timed(job, "queue"):
+                lane = self.admission.acquire(progress_callback, job.get("model_type"))
+        except QueueFullError as e:
+            config["error"] = str(e)
+            config["rejected"] = True
+            return None, config
+        # 调度器指定了端点 (见 affinity.py) 时优先使用
+        job["preferred_endpoint"] = lane
+        started = time.time()
+        try:
+            return self._generate_on_pool(job, config, progress_callback)
+        finally:
+            self.admission.release(time.time() - started, lane)
+
+    def _generate_on_pool(self, job, config, progress_callback=None):
+        """选择端点执行生成任务并写入缓存"""
+        if progress_callback:
+            progress_callback(0.1, "检查服务状态...")
+
+        backend, snapshot, probe = self.pool.acquire(job.get("model_type"), job.get("preferred_endpoint"))
+        if backend is None:
+            config["error"] = self._unavailable_error()
+            return None, config
+        job["backend_url"] = backend.url
+        self.jobs.update(job["job_id"], "running", backend_url=backend.url)
+        try:
+            output_path, config = self._execute_on(backend, snapshot, job, config, progress_callback)
+        finally:
+            self.pool.release(backend, probe)
+        if output_path:
+            self._cache_store(job, output_path, config)
+        return output_path, config
+
+    def _execute_on(self, backend, snapshot, job, config, progress_callback=None):
+        """在选定的端点上执行任务 (结果也从同一端点下载)"""
+        try:
+            uploaded = self._prepare(backend, job, snapshot, progress_callback)
+
+            if progress_callback:
+                progress_callback(0.2, job.get("request_desc", "发送生成请求..."))
+
+            result = self._submit(backend, job, snapshot, progress_callback, uploaded)
+            return self._download_result(backend, job, config, result, progress_callback)
+
+        except Exception as e:
+            return self._fail(backend, e, config)
+
+    def _download_result(self, backend, job, config, result, progress_callback=None):
+        """从生成任务的端点下载结果"""
+        if progress_callback:
+            progress_callback(0.8, "下载生成结果...")
+
+        downloaded = False
+        if result.get("success") and result.get("filename"):
+            with _timed(job, "download"):
+                downloaded = backend.transport.download(
+                    f"/download/{result['filename']}",
+                    job["output_path"],
+                    timeout=job.get("download_timeout", 120),
+                    expected_size=result.get("size"),
+                    expected_sha256=result.get("sha256")
+                )
+        # 只有结果完整取回才说明端点正常；生成失败、下载被拒 (4xx) 不算成功
+        if downloaded:
+            backend.breaker.record_success()
+            return self._finish(job, config, progress_callback)
+
+        config["error"] = result.get("error") or ("下载生成结果失败" if result.get("success") else "生成失败")
+        return None, config
+
+    def _prepare(self, backend, job, snapshot, progress_callback=None):
+        """发送生成请求前的准备：需要切换模型且后端支持 blobs 时，/load_model 与输入文件的哈希 + 上传并行执行，
+        两者都完成后才发送生成请求。返回已上传文件的表单字段 (没有提前上传时为 None)
+
+        任一步失败时取消另一步并抛出异常。同步路径中已经发出的 /load_model 请求无法中断，只是不再等待它。
+        """
+        if not self._needs_model_switch(job, snapshot):
+            return None
+        if not self._uploads_blobs(job, snapshot):
+            self._switch_model(backend, job, progress_callback)
+            return None
+
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="load-model")
+        # 切换模型的进度先于上传报告 (上传占 [0.15, 0.2]，进度条不回退)
+        if progress_callback:
+            progress_callback(0.15, job.get("switch_desc", "切换模型..."))
+        switching = executor.submit(self._switch_model, backend, job)
+        switching.add_done_callback(lambda future: future.exception() and cancel.set())
+        try:
+            with _timed(job, "upload"):
+                uploaded = self._upload_blobs(backend, job, progress_callback, cancel, span=(0.15, 0.2))
+            switching.result()
+            return uploaded
+        except _Cancelled:
+            switching.result()  # 抛出切换模型的异常
+            raise
+        finally:
+            executor.shutdown(wait=False)
+
+    def _switch_model(self, backend, job, progress_callback=None):
+        """调用 /load_model 切换后端模型；读超时视为仍在加载 (与原先一样继续)，其他失败抛出异常"""
+        if progress_callback:
+            progress_callback(0.15, job.get("switch_desc", "切换模型..."))
+        try:
+            with _timed(job, "switch"):
+                resp = backend.transport.post("/load_model", json={"model_type": job["model_type"]}, timeout=300)
+            _check_model_switch(resp.status_code)
+        except requests.exceptions.ReadTimeout:
+            print(f"[{self.queue_name}] {backend.url} 切换模型超时，继续发送请求")
+        finally:
+            # 模型类型已变化，刷新健康缓存
+            backend.health.invalidate()
+
+    def _submit(self, backend, job, snapshot, progress_callback=None, uploaded=None):
+        """发送生成请求，返回后端 JSON 结果
+
+        后端支持任务协议时提交任务后轮询结果 (生成期间不占用连接)，否则调用阻塞式生成接口。
+        uploaded 为准备阶段已上传文件的表单字段 (见 _prepare)。
+        阶段耗时：submit (上传 + 提交)、inference (排队 + 推理；阻塞接口时包含上传)。
+        """
+        capabilities = snapshot["capabilities"]
+        if "jobs" in capabilities:
+            with _timed(job, "submit"):
+                submitted = self._post_generate(
+                    backend, job, "/jobs" + job["endpoint"], JOB_SUBMIT_TIMEOUT, capabilities, progress_callback,
+                    uploaded
+                )
+            if not submitted.get("job_id"):
+                return submitted
+            job["backend_job_id"] = submitted["job_id"]
+            self.jobs.update(job["job_id"], "submitted", backend_job_id=submitted["job_id"])
+            return self._await_backend_job(backend, job, capabilities, progress_callback)
+        with _timed(job, "inference"):
+            return self._post_generate(
+                backend, job, job["endpoint"], job["timeout"], capabilities, progress_callback, uploaded
+            )
+
+    def _await_backend_job(self, backend, job, capabilities, progress_callback=None):
+        """等待后端任务 job["backend_job_id"] 结束 (优先订阅进度事件流)，返回生成结果"""
+        with _timed(job, "inference"):
+            if "events" in capabilities:
+                outcome = self._stream_job_events(backend, job, progress_callback)
+                if outcome is not None:
+                    return outcome
+            return self._wait_job(backend, job, progress_callback)
+
+    def _post_generate(self, backend, job, endpoint, timeout, capabilities=(), progress_callback=None,
+                       uploaded=None):
+        """POST 生成请求体 (JSON 或流式 multipart)，可安全重发时按抖动退避重试
+
+        后端支持 blobs 时输入文件按内容哈希引用，只上传后端还没有的文件 (uploaded 不为 None 时已经上传过)。
+        """
+        headers = {"Idempotency-Key": job.setdefault("idempotency_key", uuid.uuid4().hex)}
+        idempotent = "idempotency" in capabilities
+
+        def send():
+            if job.get("files") is not None:
+                fields, files = job.get("fields"), job["files"]
+                if uploaded is not None:
+                    fields, files = uploaded, None
+                elif UPLOAD_DEDUP_ENABLED and "blobs" in capabilities:
+                    fields, files = self._upload_blobs(backend, job, progress_callback), None
+                # 流式上传，句柄在请求结束或异常时自动释放；重发时重新读取文件
+                with MultipartEncoder(
+                    fields, files,
+                    progress_callback=scaled_progress(
+                        progress_callback, 0.2, 0.3, job.get("upload_desc", "上传文件")) if files else None
+                ) as body:
+                    resp = backend.transport.post(
+                        endpoint, data=body, headers={**headers, **body.headers}, timeout=timeout
+                    )
+            else:
+                resp = backend.transport.post(endpoint, json=job["json"], headers=headers, timeout=timeout)
+            if resp.status_code in HTTP_RETRY_STATUS:
+                raise BackendUnavailableError(resp.status_code)
+            return resp.json()
+
+        return retry_call(send, SUBMIT_MAX_ATTEMPTS, lambda e: _submit_retryable(e, idempotent),
+                          SUBMIT_RETRY_BACKOFF, SUBMIT_RETRY_MAX_BACKOFF)
+
+    def _upload_blobs(self, backend, job, progress_callback=None, cancel=None, span=(0.2, 0.3)):
+        """确保后端持有 job 的每个输入文件 (HEAD /blobs/<sha256>，缺失时 PUT 上传)
+
+        返回用 blobs 字段 (JSON: {字段名: {sha256, filename}}) 代替文件的表单字段。
+        cancel (threading.Event) 被设置时在下一个数据块处抛出 _Cancelled。
+        上传进度映射到 span 区间 (与切换模型并行提前上传时在发送生成请求之前，取 [0.15, 0.2])。
+        """
+        blobs = {}
+        for name, path, (start, end) in _split_span(job["files"], span):
+            digest = file_digest(path)
+            if cancel is not None and cancel.is_set():
+                raise _Cancelled()
+            resp = backend.transport.request("HEAD", f"/blobs/{digest}", timeout=JOB_SUBMIT_TIMEOUT)
+            if resp.status_code != 200:
+                with FileStream(path, progress_callback=_cancellable(scaled_progress(
+                        progress_callback, start, end, job.get("upload_desc", "上传文件")), cancel)) as body:
+                    resp = backend.transport.request(
+                        "PUT", f"/blobs/{digest}", data=body, headers=body.headers, timeout=JOB_SUBMIT_TIMEOUT
+                    )
+                _check_blob_upload(resp.status_code)
+            elif progress_callback:
+                progress_callback(end, f"{os.path.basename(path)} 已在服务端，跳过上传")
+            blobs[name] = {"sha256": digest, "filename": os.path.basename(path)}
+        return dict(job.get("fields") or {}, blobs=json.dumps(blobs))
+
+    def _stream_job_events(self, backend, job, progress_callback=None):
+        """订阅任务进度事件流 (SSE)，任务结束时返回结果；事件流中断返回 None，由轮询接手"""
+        poll = _JobPoller(job)
+        parser = _SSEParser()
+        try:
+            with backend.transport.get(
+                f"/jobs/{job['backend_job_id']}/events",
+                stream=True,
+                headers={"Accept": "text/event-stream"},
+                timeout=JOB_EVENTS_READ_TIMEOUT
+            ) as resp:
+                if resp.status_code != 200:
+                    return None
+                for line in resp.iter_lines(decode_unicode=True):
+                    poll.check_deadline()
+                    status = parser.feed(line)
+                    if status is not None:
+                        outcome = poll.on_status(status, progress_callback)
+                        if outcome is not None:
+                            return outcome
+        except requests.exceptions.RequestException:
+            pass
+        return None
+
+    def _wait_job(self, backend, job, progress_callback=None):
+        """长轮询任务状态直到结束，返回与阻塞接口相同格式的结果"""
+        poll = _JobPoller(job)
+        while True:
+            poll.check_deadline()
+            started = time.time()
+            try:
+                resp = backend.transport.get(
+                    f"/jobs/{job['backend_job_id']}",
+                    params={"wait": JOB_LONG_POLL_WAIT},
+                    timeout=JOB_LONG_POLL_WAIT + HTTP_CONNECT_TIMEOUT
+                )
+                status = resp.json() if resp.status_code != 404 else None
+            except (requests.exceptions.RequestException, ValueError):
+                time.sleep(poll.on_error())
+                continue
+
+            outcome = poll.on_status(status, progress_callback)
+            if outcome is not None:
+                return outcome
+            time.sleep(poll.next_delay(time.time() - started))
+
+    # ==================== asyncio 路径 ====================
+
+    async def _execute_async(self, job, config, progress_callback=None, stream=False):
+        """asyncio 执行生成任务并写入生成记录，返回 (output_path, config)
+
+        stream=True 时生成完成后不等结果下载完就返回 (见 stream_proxy.py)：config["stream_url"] 是边下边看的地址，
+        output_path 在后台下载完成后才存在。
+        """
+        started = time.time()
+        job["stream"] = stream
+        job.setdefault("idempotency_key", uuid.uuid4().hex)
+        await asyncio.to_thread(self.jobs.create, self.queue_name, job, config)
+        if progress_callback:
+            progress_callback(0.01, f"任务已登记 (ID: {job['job_id']})")
+        try:
+            output_path, config = await self._execute_job_async(
+                job, config, self.jobs.track(job["job_id"], progress_callback)
+            )
+        except asyncio.CancelledError:
+            # 关闭页面 / 点击停止：记为已取消，重启后不再继续。
+            # 写入 SQLite 放到线程中；shield 保证再次取消时写入照常完成
+            await asyncio.shield(asyncio.to_thread(
+                self.jobs.finish, job["job_id"], None, dict(config, error="任务已取消", cancelled=True)
+            ))
+            raise
+        except Exception as e:
+            await asyncio.to_thread(self.jobs.finish, job["job_id"], None, dict(config, error=str(e)))
+            raise
+        config["job_id"] = job.get("job_id")
+        streaming = job.get("stream_result")
+        if streaming is None:
+            await asyncio.to_thread(self.jobs.finish, job["job_id"], output_path, config)
+            await asyncio.to_thread(self._catalog_record, job, config, output_path, time.time() - started)
+        else:
+            def record(ok):
+                if not ok:
+                    config.update(success=False, error=streaming.error)
+                self.jobs.finish(job["job_id"], output_path if ok else None, config)
+                self._catalog_record(job, config, output_path if ok else None, time.time() - started)
+            streaming.on_done(record)
+        return output_path, config
+
+    async def _execute_job_async(self, job, config, progress_callback=None):
+        """asyncio 查缓存 -> 合并相同请求 -> 生成"""
+        # 计算缓存键需要读取输入文件，放到线程中
+        with _timed(job, "lookup"):
+            cached = await asyncio.to_thread(self._cache_lookup, job)
+        if cached is not None:
+            return self._finish_cached(cached, config, progress_callback)
+
+        while True:
+            flight, leader = self.flights.join(self._flight_key(job), progress_callback)
+            if leader:
+                break
+            try:
+                result = await flight.wait_async()
+            finally:
+                flight.depart(progress_callback)
+            if not result[1].get("interrupted"):
+                return self._follow(result, config)
+            self._take_over(job, result[1])
+        try:
+            if job.get("backend_job_id"):
+                # 接手执行者已提交的后端任务 (同步等待与下载放到线程中)
+                await asyncio.to_thread(self.jobs.update, job["job_id"], "submitted",
+                                        backend_url=job["backend_url"], backend_job_id=job["backend_job_id"])
+                output_path, config = await asyncio.to_thread(
+                    self._reattach, job, config, flight.report if flight else progress_callback
+                )
+            else:
+                output_path, config = await self._generate_async(
+                    job, config, flight.report if flight else progress_callback
+                )
+            if flight:
+                flight.resolve(output_path, config)
+            return output_path, config
+        except asyncio.CancelledError:
+            # 没有其他会话在等同一结果时让后端停止生成；否则后端任务留给接手的等待者
+            if not (flight and flight.waiting):
+                await self._cancel_backend_job_async(job)
+            raise
+        finally:
+            self._leave_flight(flight, job)
+
+    async def _generate_async(self, job, config, progress_callback=None):
+        """asyncio 排队等待执行名额后生成 (逻辑同 _generate)"""
+        try:
+            with _timed(job, "queue"):
+                lane = await self.admission.acquire_async(progress_callback, job.get("model_type"))
+        except QueueFullError as e:
+            config["error"] = str(e)
+            config["rejected"] = True
+            return None, config
+        job["preferred_endpoint"] = lane
+        started = time.time()
+        cancelled = False
+        try:
+            return await self._generate_on_pool_async(job, config, progress_callback)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            # 被取消的任务耗时不计入等待时间估算
+            self.admission.release(None if cancelled else time.time() - started, lane)
+
+    async def _generate_on_pool_async(self, job, config, progress_callback=None):
+        """asyncio 选择端点执行生成任务并写入缓存"""
+        if progress_callback:
+            progress_callback(0.1, "检查服务状态...")
+
+        # 健康缓存过期时会同步探测，放到线程中
+        backend, snapshot, probe = await asyncio.to_thread(
+            self.pool.acquire, job.get("model_type"), job.get("preferred_endpoint")
+        )
+        if backend is None:
+            config["error"] = self._unavailable_error()
+            return None, config
+        job["backend_url"] = backend.url
+        await asyncio.to_thread(self.jobs.update, job["job_id"], "running", backend_url=backend.url)
+        try:
+            output_path, config = await self._execute_on_async(backend, snapshot, job, config, progress_callback)
+        except BaseException:
+            self.pool.release(backend, probe)
+            raise
+        if job.get("stream_result"):
+            # 边下边看：后台仍在从该端点下载，下载结束后才释放端点 (未完成任务计数、试探名额)
+            job["stream_result"].on_done(lambda ok: self.pool.release(backend, probe))
+        else:
+            self.pool.release(backend, probe)
+        if output_path and job.get("stream_result"):
+            job["stream_result"].on_done(lambda ok: ok and self._cache_store(job, output_path, config))
+        elif output_path:
+            await asyncio.to_thread(self._cache_store, job, output_path, config)
+        return output_path, config
+
+    async def _execute_on_async(self, backend, snapshot, job, config, progress_callback=None):
+        """asyncio 在选定的端点上执行任务"""
+        try:
+            uploaded = await self._prepare_async(backend, job, snapshot, progress_callback)
+
+            if progress_callback:
+                progress_callback(0.2, job.get("request_desc", "发送生成请求..."))
+
+            result = await self._submit_async(backend, job, snapshot, progress_callback, uploaded)
+
+            if progress_callback:
+                progress_callback(0.8, "下载生成结果...")
+
+            downloaded = False
+            if result.get("success") and result.get("filename") and job.get("stream") and result.get("size"):
+                # 边下边看：后台下载，立即返回直通地址
+                # 下载成功后才记为成功 (见 StreamRegistry._download)
+                job["stream_result"] = self.streams.start(backend, job, result)
+                config["stream_url"] = self.streams.url(job["job_id"])
+                return self._finish(job, config, progress_callback)
+            if result.get("success") and result.get("filename"):
+                with _timed(job, "download"):
+                    downloaded = await backend.async_transport.download(
+                        f"/download/{result['filename']}",
+                        job["output_path"],
+                        timeout=job.get("download_timeout", 120),
+                        expected_size=result.get("size"),
+                        expected_sha256=result.get("sha256")
+                    )
+            if downloaded:
+                backend.breaker.record_success()
+                return self._finish(job, config, progress_callback)
+
+            config["error"] = result.get("error") or ("下载生成结果失败" if result.get("success") else "生成失败")
+            return None, config
+
+        except Exception as e:
+            return self._fail(backend, e, config)
+
+    async def _prepare_async(self, backend, job, snapshot, progress_callback=None):
+        """asyncio 版本的 _prepare：切换模型与上传是两个任务，任一个失败 (或整个任务被取消) 时取消另一个"""
+        if not self._needs_model_switch(job, snapshot):
+            return None
+        if not self._uploads_blobs(job, snapshot):
+            await self._switch_model_async(backend, job, progress_callback)
+            return None
+
+        async def upload():
+            with _timed(job, "upload"):
+                return await self._upload_blobs_async(backend, job, progress_callback, span=(0.15, 0.2))
+
+        switching = asyncio.create_task(self._switch_model_async(backend, job, progress_callback))
+        uploading = asyncio.create_task(upload())
+        tasks = (switching, uploading)
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in tasks:
+                if task.done():
+                    task.result()  # 抛出失败步骤的异常
+            return uploading.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _switch_model_async(self, backend, job, progress_callback=None):
+        """asyncio 版本的 _switch_model"""
+        if progress_callback:
+            progress_callback(0.15, job.get("switch_desc", "切换模型..."))
+        try:
+            with _timed(job, "switch"):
+                resp = await backend.async_transport.post(
+                    "/load_model", json={"model_type": job["model_type"]}, timeout=300
+                )
+            _check_model_switch(resp.status_code)
+        except httpx.ReadTimeout:
+            print(f"[{self.queue_name}] {backend.url} 切换模型超时，继续发送请求")
+        finally:
+            backend.health.invalidate()
+
+    async def _submit_async(self, backend, job, snapshot, progress_callback=None, uploaded=None):
+        """asyncio 发送生成请求，返回后端 JSON 结果 (逻辑同 _submit)"""
+        capabilities = snapshot["capabilities"]
+        if "jobs" in capabilities:
+            with _timed(job, "submit"):
+                submitted = await self._post_generate_async(
+                    backend, job, "/jobs" + job["endpoint"], JOB_SUBMIT_TIMEOUT, capabilities, progress_callback,
+                    uploaded
+                )
+            if not submitted.get("job_id"):
+                return submitted
+            job["backend_job_id"] = submitted["job_id"]
+            await asyncio.to_thread(self.jobs.update, job["job_id"], "submitted", backend_job_id=submitted["job_id"])
+            with _timed(job, "inference"):
+                if "events" in capabilities:
+                    outcome = await self._stream_job_events_async(backend, job, progress_callback)
+                    if outcome is not None:
+                        return outcome
+                return await self._wait_job_async(backend, job, progress_callback)
+        with _timed(job, "inference"):
+            return await self._post_generate_async(
+                backend, job, job["endpoint"], job["timeout"], capabilities, progress_callback, uploaded
+            )
+
+    async def _post_generate_async(self, backend, job, endpoint, timeout, capabilities=(),
+                                   progress_callback=None, uploaded=None):
+        """asyncio POST 生成请求体 (重试和 blobs 逻辑同 _post_generate)"""
+        headers = {"Idempotency-Key": job.setdefault("idempotency_key", uuid.uuid4().hex)}
+        idempotent = "idempotency" in capabilities
+
+        async def send():
+            if job.get("files") is not None:
+                fields, files = job.get("fields"), job["files"]
+                if uploaded is not None:
+                    fields, files = uploaded, None
+                elif UPLOAD_DEDUP_ENABLED and "blobs" in capabilities:
+                    fields, files = await self._upload_blobs_async(backend, job, progress_callback), None
+                async with MultipartEncoder(
+                    fields, files,
+                    progress_callback=scaled_progress(
+                        progress_callback, 0.2, 0.3, job.get("upload_desc", "上传文件")) if files else None
+                ) as body:
+                    # 显式传入异步迭代器，httpx 才会走 async 流式发送
+                    resp = await backend.async_transport.post(
+                        endpoint, content=aiter(body), headers={**headers, **body.headers}, timeout=timeout
+                    )
+            else:
+                resp = await backend.async_transport.post(
+                    endpoint, json=job["json"], headers=headers, timeout=timeout
+                )
+            if resp.status_code in HTTP_RETRY_STATUS:
+                raise BackendUnavailableError(resp.status_code)
+            return resp.json()
+
+        return await retry_call_async(send, SUBMIT_MAX_ATTEMPTS, lambda e: _submit_retryable(e, idempotent),
+                                      SUBMIT_RETRY_BACKOFF, SUBMIT_RETRY_MAX_BACKOFF)
+
+    async def _upload_blobs_async(self, backend, job, progress_callback=None, span=(0.2, 0.3)):
+        """asyncio 版本的 _upload_blobs"""
+        blobs = {}
+        for name, path, (start, end) in _split_span(job["files"], span):
+            digest = await asyncio.to_thread(file_digest, path)
+            resp = await backend.async_transport.request("HEAD", f"/blobs/{digest}", timeout=JOB_SUBMIT_TIMEOUT)
+            if resp.status_code != 200:
+                async with FileStream(path, progress_callback=scaled_progress(
+                        progress_callback, start, end, job.get("upload_desc", "上传文件"))) as body:
+                    resp = await backend.async_transport.request(
+                        "PUT", f"/blobs/{digest}", content=aiter(body), headers=body.headers,
+                        timeout=JOB_SUBMIT_TIMEOUT
+                    )
+                _check_blob_upload(resp.status_code)
+            elif progress_callback:
+                progress_callback(end, f"{os.path.basename(path)} 已在服务端，跳过上传")
+            blobs[name] = {"sha256": digest, "filename": os.path.basename(path)}
+        return dict(job.get("fields") or {}, blobs=json.dumps(blobs))
+
+    async def _cancel_backend_job_async(self, job):
+        """任务被取消：后端支持取消接口 (capabilities 含 "cancel") 时通知它停止生成，尽快释放 GPU"""
+        backend = self.pool.get(job.get("backend_url"))
+        if backend is None or not job.get("backend_job_id"):
+            return
+        # 优先读健康监控的缓存快照；没有缓存时探测 (HTTP 请求) 放到线程中，不阻塞事件循环
+        snapshot = backend.health.cached() or await asyncio.to_thread(backend.health.snapshot)
+        if "cancel" not in snapshot["capabilities"]:
+            return
+        try:
+            resp = await backend.async_transport.post(
+                f"/jobs/{job['backend_job_id']}/cancel", timeout=JOB_CANCEL_TIMEOUT
+            )
+            print(f"[{self.queue_name}] 取消后端任务 {job['backend_job_id']}: HTTP {resp.status_code}")
+        except Exception as e:
+            print(f"[{self.queue_name}] 取消后端任务 {job['backend_job_id']} 失败: {e}")
+
+    async def _stream_job_events_async(self, backend, job, progress_callback=None):
+        """asyncio 订阅任务进度事件流 (逻辑同 _stream_job_events)"""
+        poll = _JobPoller(job)
+        parser = _SSEParser()
+        try:
+            async with backend.async_transport.stream(
+                "GET",
+                f"/jobs/{job['backend_job_id']}/events",
+                headers={"Accept": "text/event-stream"},
+                timeout=JOB_EVENTS_READ_TIMEOUT
+            ) as resp:
+                if resp.status_code != 200:
+                    return None
+                async for line in resp.aiter_lines():
+                    poll.check_deadline()
+                    status = parser.feed(line.rstrip("\r\n"))
+                    if status is not None:
+                        outcome = poll.on_status(status, progress_callback)
+                        if outcome is not None:
+                            return outcome
+        except httpx.HTTPError:
+            pass
+        return None
+
+    async def _wait_job_async(self, backend, job, progress_callback=None):
+        """asyncio 长轮询任务状态直到结束"""
+        poll = _JobPoller(job)
+        while True:
+            poll.check_deadline()
+            started = time.time()
+            try:
+                resp = await backend.async_transport.get(
+                    f"/jobs/{job['backend_job_id']}",
+                    params={"wait": JOB_LONG_POLL_WAIT},
+                    timeout=JOB_LONG_POLL_WAIT + HTTP_CONNECT_TIMEOUT
+                )
+                status = resp.json() if resp.status_code != 404 else None
+            except (httpx.HTTPError, ValueError):
+                await asyncio.sleep(poll.on_error())
+                continue
+
+            outcome = poll.on_status(status, progress_callback)
+            if outcome is not None:
+                return outcome
+            await asyncio.sleep(poll.next_delay(time.time() - started))
+
+    # ==================== 公共辅助 ====================
+
+    def _cache_lookup(self, job):
+        """计算请求哈希 (写入 job["request_key"] / job["cache_key"]) 并查找已有结果"""
+        try:
+            job["request_key"] = self.cache.request_key(job)
+        except OSError:
+            job["request_key"] = None  # 输入文件不可读，交给后端报错
+        job["cache_key"] = job["request_key"] if self.cache.accepts(job) else None
+        cached = self.cache.lookup(job["cache_key"], job["output_path"].suffix)
+        if cached is None and job["cache_key"] is not None:
+            # 缓存副本已被淘汰，但生成记录里同一请求的输出文件还在
+            try:
+                cached = self.catalog.find_output(job["request_key"])
+            except sqlite3.Error:
+                cached = None
+        if cached is not None:
+            self.storage.record_access(cached)
+        return cached
+
+    def _cache_store(self, job, output_path, config):
+        """新结果去重后计入存储配额并写入缓存；去重或缓存写入失败不影响本次生成结果"""
+        try:
+            # 与已有文件内容相同 (如重试后重新下载的同一结果) 时换成硬链接，不再多占一份空间
+            self.dedup.add(output_path)
+        except (OSError, sqlite3.Error) as e:
+            print(f"输出去重失败: {e}")
+        self.storage.track(output_path)
+        try:
+            cached = self.cache.store(job.get("cache_key"), output_path, config)
+        except OSError as e:
+            print(f"结果缓存写入失败: {e}")
+            return
+        if cached is not None:
+            self.storage.track(cached)
+
+    def _catalog_record(self, job, config, output_path, duration):
+        """写入生成记录；记录失败不影响本次生成结果"""
+        if config.get("coalesced"):
+            status = "coalesced"
+        elif config.get("cached"):
+            status = "cached"
+        else:
+            status = None  # 由 success 决定 generated / failed
+        try:
+            inputs = {
+                name: file_digest(path)
+                for name, path in (job.get("files") or {}).items() if path is not None
+            }
+            self.catalog.record(
+                config.get("type") or job["endpoint"].strip("/"), config, output_path,
+                inputs=inputs, timings=job.get("timings"), duration=round(duration, 3),
+                request_key=job.get("request_key"), backend_url=job.get("backend_url"), status=status,
+                job_id=job.get("job_id"),
+            )
+        except (sqlite3.Error, OSError) as e:
+            print(f"生成记录写入失败: {e}")
+
+    @staticmethod
+    def _flight_key(job):
+        """合并相同请求用的键 (与缓存开关无关；随机种子的请求为 None，不合并)"""
+        return job["request_key"] if job.get("coalesce", True) else None
+
+    @staticmethod
+    def _follow(result, config):
+        """已合并到进行中的相同任务：复用它的结果"""
+        output_path, leader_config = result
+        for key in ("success", "output_path", "error", "cached", "stream_url"):
+            if key in leader_config:
+                config[key] = leader_config[key]
+        config["coalesced"] = True
+        return output_path, config
+
+    @staticmethod
+    def _needs_model_switch(job, snapshot):
+        """job 要求的模型类型与后端当前模型不一致"""
+        return bool(job.get("model_type") and snapshot["info"]
+                    and snapshot["model_type"] != job["model_type"])
+
+    @staticmethod
+    def _uploads_blobs(job, snapshot):
+        """job 的输入文件按内容哈希单独上传 (可以在发送生成请求之前完成)"""
+        return job.get("files") is not None and UPLOAD_DEDUP_ENABLED and "blobs" in snapshot["capabilities"]
+
+    @staticmethod
+    def _fail(backend, error, config):
+        """任务异常结束：连接类故障计入熔断器并刷新健康缓存 (本地错误如输入文件无效不影响端点状态)"""
+        if isinstance(error, _BACKEND_FAILURES):
+            backend.health.invalidate()
+            backend.breaker.record_failure(error)
+        config["error"] = "请求超时，生成时间过长" if isinstance(error, _TIMEOUTS) else str(error)
+        return None, config
+
+    @staticmethod
+    def _finish_cached(cached_path, config, progress_callback=None):
+        """缓存命中：直接返回已有结果文件"""
+        if progress_callback:
+            progress_callback(1.0, "命中缓存，直接返回已有结果")
+        config["success"] = True
+        config["cached"] = True
+        config["output_path"] = str(cached_path)
+        return str(cached_path), config
+
+    @staticmethod
+    def _finish(job, config, progress_callback=None):
+        if progress_callback:
+            progress_callback(1.0, "生成完成!")
+        config["success"] = True
+        config["output_path"] = str(job["output_path"])
+        return str(job["output_path"]), config
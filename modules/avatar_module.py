@@ -5,37 +5,89 @@ Avatar 模块
 """
 import os
 import json
-import time
-import requests
-from pathlib import Path
+
+from modules.admission import get_admission_queue
+from modules.affinity import AffinityQueue
+from modules.api_base import ApiModuleBase
 
 # API 服务地址
 AVATAR_API_URL = os.environ.get("AVATAR_API_URL", "http://localhost:8003")
 
 
-class AvatarModule:
+class AvatarModule(ApiModuleBase):
     """Avatar 功能模块 - HTTP API 版本"""
     
+    service_error = "Avatar API 服务未启动，请先运行: python LongCat-Video/api_server_avatar.py --port 8003"
+    queue_name = "avatar"
+    
     def __init__(self, api_url=None):
-        self.api_url = api_url or AVATAR_API_URL
-        self.output_dir = Path(__file__).parent.parent / "outputs" / "avatar"
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        super().__init__(api_url or AVATAR_API_URL, "avatar")
+
+    def _admission_queue(self):
+        """单人 / 双人任务按模型成批调度，减少 /load_model 切换 (见 affinity.py)"""
+        return get_admission_queue(self.queue_name, create=lambda: AffinityQueue(self.queue_name, self.pool))
     
-    def _check_service(self):
-        """检查服务是否可用"""
-        try:
-            resp = requests.get(f"{self.api_url}/health", timeout=5)
-            if resp.status_code == 200:
-                return True, resp.json()
-            return False, None
-        except:
-            return False, None
+    def _single_avatar_job(self, audio_path, image_path=None, prompt="A person is speaking.",
+                           stage_1="ai2v", resolution="480p", num_inference_steps=50,
+                           text_guidance_scale=4.0, audio_guidance_scale=4.0,
+                           seed=42, num_segments=1, ref_img_index=10, mask_frame_range=3):
+        """单人说话视频的请求描述 (参数说明见 single_avatar)"""
+        job_id, local_output_path = self._new_output("single_avatar", ".mp4")
+        
+        config = {
+            "type": "single_avatar",
+            "prompt": prompt,
+            "stage_1": stage_1,
+            "resolution": resolution,
+            "num_inference_steps": num_inference_steps,
+            "text_guidance_scale": text_guidance_scale,
+            "audio_guidance_scale": audio_guidance_scale,
+            "seed": seed,
+            "num_segments": num_segments,
+            "ref_img_index": ref_img_index,
+            "mask_frame_range": mask_frame_range,
+        }
+        
+        files = {}
+        data = {
+            'prompt': prompt,
+            'stage_1': stage_1,
+            'resolution': resolution,
+            'num_inference_steps': num_inference_steps,
+            'text_guidance_scale': text_guidance_scale,
+            'audio_guidance_scale': audio_guidance_scale,
+            'seed': seed,
+            'num_segments': num_segments,
+            'ref_img_index': ref_img_index,
+            'mask_frame_range': mask_frame_range,
+        }
+        
+        # 添加音频文件
+        files['audio'] = audio_path
+        
+        # 添加图片文件 (如果有)
+        if image_path and os.path.exists(image_path):
+            files['image'] = image_path
+        
+        job = {
+            "endpoint": "/single_avatar",
+            "fields": data,
+            "files": files,
+            #"timeout": 1800,  # 30分钟超时
+            "timeout": None,
+            "download_timeout": 120,
+            "output_path": local_output_path,
+            "job_id": job_id,
+            "model_type": "single",
+            "switch_desc": "切换到单人模型...",
+            "request_desc": "上传文件并发送请求...",
+        }
+        return config, job
     
-    def single_avatar(self, audio_path, image_path=None, prompt="A person is speaking.",
-                      stage_1="ai2v", resolution="480p", num_inference_steps=50,
-                      text_guidance_scale=4.0, audio_guidance_scale=4.0,
-                      seed=42, num_segments=1, ref_img_index=10, mask_frame_range=3,
-                      progress_callback=None):
+    def single_avatar(self, audio_path, image_path=None, prompt="A person is speaking.", stage_1="ai2v",
+                      resolution="480p", num_inference_steps=50, text_guidance_scale=4.0,
+                      audio_guidance_scale=4.0, seed=42, num_segments=1, ref_img_index=10,
+                      mask_frame_range=3, progress_callback=None):
         """单人说话视频生成
         
         Args:
@@ -56,13 +108,41 @@ class AvatarModule:
         Returns:
             (output_path, config): 输出视频路径和配置信息
         """
-        timestamp = int(time.time())
-        local_output_path = self.output_dir / f"single_avatar_{timestamp}.mp4"
+        config, job = self._single_avatar_job(
+            audio_path=audio_path, image_path=image_path, prompt=prompt, stage_1=stage_1,
+            resolution=resolution, num_inference_steps=num_inference_steps,
+            text_guidance_scale=text_guidance_scale, audio_guidance_scale=audio_guidance_scale, seed=seed,
+            num_segments=num_segments, ref_img_index=ref_img_index, mask_frame_range=mask_frame_range
+        )
+        return self._execute(job, config, progress_callback)
+    
+    async def single_avatar_async(self, audio_path, image_path=None, prompt="A person is speaking.",
+                                  stage_1="ai2v", resolution="480p", num_inference_steps=50,
+                                  text_guidance_scale=4.0, audio_guidance_scale=4.0, seed=42, num_segments=1,
+                                  ref_img_index=10, mask_frame_range=3, progress_callback=None,
+                                  stream=False):
+        """单人说话视频生成 - asyncio 版本 (参数同 single_avatar)"""
+        config, job = self._single_avatar_job(
+            audio_path=audio_path, image_path=image_path, prompt=prompt, stage_1=stage_1,
+            resolution=resolution, num_inference_steps=num_inference_steps,
+            text_guidance_scale=text_guidance_scale, audio_guidance_scale=audio_guidance_scale, seed=seed,
+            num_segments=num_segments, ref_img_index=ref_img_index, mask_frame_range=mask_frame_range
+        )
+        return await self._execute_async(job, config, progress_callback, stream)
+
+    def _multi_avatar_job(self, image_path, audio1_path=None, audio2_path=None,
+                          prompt="Two people are having a conversation.",
+                          audio_type="para", resolution="480p", num_inference_steps=50,
+                          text_guidance_scale=4.0, audio_guidance_scale=4.0,
+                          seed=42, num_segments=1, ref_img_index=10, mask_frame_range=3,
+                          bbox1=None, bbox2=None):
+        """双人对话视频的请求描述 (参数说明见 multi_avatar)"""
+        job_id, local_output_path = self._new_output("multi_avatar", ".mp4")
         
         config = {
-            "type": "single_avatar",
+            "type": "multi_avatar",
             "prompt": prompt,
-            "stage_1": stage_1,
+            "audio_type": audio_type,
             "resolution": resolution,
             "num_inference_steps": num_inference_steps,
             "text_guidance_scale": text_guidance_scale,
@@ -73,102 +153,56 @@ class AvatarModule:
             "mask_frame_range": mask_frame_range,
         }
         
-        if progress_callback:
-            progress_callback(0.1, "检查服务状态...")
+        files = {}
+        data = {
+            'prompt': prompt,
+            'audio_type': audio_type,
+            'resolution': resolution,
+            'num_inference_steps': num_inference_steps,
+            'text_guidance_scale': text_guidance_scale,
+            'audio_guidance_scale': audio_guidance_scale,
+            'seed': seed,
+            'num_segments': num_segments,
+            'ref_img_index': ref_img_index,
+            'mask_frame_range': mask_frame_range,
+        }
         
-        is_available, health_info = self._check_service()
-        if not is_available:
-            config["error"] = "Avatar API 服务未启动，请先运行: python LongCat-Video/api_server_avatar.py --port 8003"
-            return None, config
+        # 添加 bbox (如果有)
+        if bbox1:
+            data['bbox1'] = ','.join(map(str, bbox1))
+        if bbox2:
+            data['bbox2'] = ','.join(map(str, bbox2))
         
-        # 检查模型类型
-        if health_info and health_info.get("model_type") != "single":
-            if progress_callback:
-                progress_callback(0.15, "切换到单人模型...")
-            try:
-                requests.post(f"{self.api_url}/load_model", json={"model_type": "single"}, timeout=300)
-            except:
-                pass
+        # 添加图片文件
+        files['image'] = image_path
         
-        if progress_callback:
-            progress_callback(0.2, "上传文件并发送请求...")
+        # 添加音频文件
+        if audio1_path and os.path.exists(audio1_path):
+            files['audio1'] = audio1_path
         
-        try:
-            files = {}
-            data = {
-                'prompt': prompt,
-                'stage_1': stage_1,
-                'resolution': resolution,
-                'num_inference_steps': num_inference_steps,
-                'text_guidance_scale': text_guidance_scale,
-                'audio_guidance_scale': audio_guidance_scale,
-                'seed': seed,
-                'num_segments': num_segments,
-                'ref_img_index': ref_img_index,
-                'mask_frame_range': mask_frame_range,
-            }
-            
-            # 添加音频文件
-            audio_file = open(audio_path, 'rb')
-            files['audio'] = audio_file
-            
-            # 添加图片文件 (如果有)
-            image_file = None
-            if image_path and os.path.exists(image_path):
-                image_file = open(image_path, 'rb')
-                files['image'] = image_file
-            
-            resp = requests.post(
-                f"{self.api_url}/single_avatar",
-                files=files,
-                data=data,
-                #timeout=1800  # 30分钟超时
-                timeout=None
-            )
-            
-            # 关闭文件
-            audio_file.close()
-            if image_file:
-                image_file.close()
-            
-            if progress_callback:
-                progress_callback(0.8, "下载生成结果...")
-            
-            result = resp.json()
-            
-            if result.get("success") and result.get("filename"):
-                download_resp = requests.get(
-                    f"{self.api_url}/download/{result['filename']}",
-                    timeout=120
-                )
-                
-                if download_resp.status_code == 200:
-                    with open(local_output_path, 'wb') as f:
-                        f.write(download_resp.content)
-                    
-                    if progress_callback:
-                        progress_callback(1.0, "生成完成!")
-                    
-                    config["success"] = True
-                    config["output_path"] = str(local_output_path)
-                    return str(local_output_path), config
-            
-            config["error"] = result.get("error", "生成失败")
-            return None, config
-            
-        except requests.exceptions.Timeout:
-            config["error"] = "请求超时，生成时间过长"
-            return None, config
-        except Exception as e:
-            config["error"] = str(e)
-            return None, config
+        if audio2_path and os.path.exists(audio2_path):
+            files['audio2'] = audio2_path
+        
+        job = {
+            "endpoint": "/multi_avatar",
+            "fields": data,
+            "files": files,
+            #"timeout": 1800,  # 30分钟超时
+            "timeout": None,
+            "download_timeout": 120,
+            "output_path": local_output_path,
+            "job_id": job_id,
+            "model_type": "multi",
+            "switch_desc": "切换到多人模型...",
+            "request_desc": "上传文件并发送请求...",
+        }
+        return config, job
 
     def multi_avatar(self, image_path, audio1_path=None, audio2_path=None,
-                     prompt="Two people are having a conversation.",
-                     audio_type="para", resolution="480p", num_inference_steps=50,
-                     text_guidance_scale=4.0, audio_guidance_scale=4.0,
-                     seed=42, num_segments=1, ref_img_index=10, mask_frame_range=3,
-                     bbox1=None, bbox2=None, progress_callback=None):
+                     prompt="Two people are having a conversation.", audio_type="para", resolution="480p",
+                     num_inference_steps=50, text_guidance_scale=4.0, audio_guidance_scale=4.0, seed=42,
+                     num_segments=1, ref_img_index=10, mask_frame_range=3, bbox1=None, bbox2=None,
+                     progress_callback=None):
         """双人对话视频生成
         
         Args:
@@ -192,126 +226,30 @@ class AvatarModule:
         Returns:
             (output_path, config): 输出视频路径和配置信息
         """
-        timestamp = int(time.time())
-        local_output_path = self.output_dir / f"multi_avatar_{timestamp}.mp4"
-        
-        config = {
-            "type": "multi_avatar",
-            "prompt": prompt,
-            "audio_type": audio_type,
-            "resolution": resolution,
-            "num_inference_steps": num_inference_steps,
-            "text_guidance_scale": text_guidance_scale,
-            "audio_guidance_scale": audio_guidance_scale,
-            "seed": seed,
-            "num_segments": num_segments,
-            "ref_img_index": ref_img_index,
-            "mask_frame_range": mask_frame_range,
-        }
-        
-        if progress_callback:
-            progress_callback(0.1, "检查服务状态...")
-        
-        is_available, health_info = self._check_service()
-        if not is_available:
-            config["error"] = "Avatar API 服务未启动，请先运行: python LongCat-Video/api_server_avatar.py --port 8003"
-            return None, config
-        
-        # 检查模型类型
-        if health_info and health_info.get("model_type") != "multi":
-            if progress_callback:
-                progress_callback(0.15, "切换到多人模型...")
-            try:
-                requests.post(f"{self.api_url}/load_model", json={"model_type": "multi"}, timeout=300)
-            except:
-                pass
-        
-        if progress_callback:
-            progress_callback(0.2, "上传文件并发送请求...")
-        
-        try:
-            files = {}
-            data = {
-                'prompt': prompt,
-                'audio_type': audio_type,
-                'resolution': resolution,
-                'num_inference_steps': num_inference_steps,
-                'text_guidance_scale': text_guidance_scale,
-                'audio_guidance_scale': audio_guidance_scale,
-                'seed': seed,
-                'num_segments': num_segments,
-                'ref_img_index': ref_img_index,
-                'mask_frame_range': mask_frame_range,
-            }
-            
-            # 添加 bbox (如果有)
-            if bbox1:
-                data['bbox1'] = ','.join(map(str, bbox1))
-            if bbox2:
-                data['bbox2'] = ','.join(map(str, bbox2))
-            
-            # 添加图片文件
-            image_file = open(image_path, 'rb')
-            files['image'] = image_file
-            
-            # 添加音频文件
-            audio1_file = None
-            audio2_file = None
-            
-            if audio1_path and os.path.exists(audio1_path):
-                audio1_file = open(audio1_path, 'rb')
-                files['audio1'] = audio1_file
-            
-            if audio2_path and os.path.exists(audio2_path):
-                audio2_file = open(audio2_path, 'rb')
-                files['audio2'] = audio2_file
-            
-            resp = requests.post(
-                f"{self.api_url}/multi_avatar",
-                files=files,
-                data=data,
-                #timeout=1800  # 30分钟超时
-                timeout=None
-            )
-            
-            # 关闭文件
-            image_file.close()
-            if audio1_file:
-                audio1_file.close()
-            if audio2_file:
-                audio2_file.close()
-            
-            if progress_callback:
-                progress_callback(0.8, "下载生成结果...")
-            
-            result = resp.json()
-            
-            if result.get("success") and result.get("filename"):
-                download_resp = requests.get(
-                    f"{self.api_url}/download/{result['filename']}",
-                    timeout=120
-                )
-                
-                if download_resp.status_code == 200:
-                    with open(local_output_path, 'wb') as f:
-                        f.write(download_resp.content)
-                    
-                    if progress_callback:
-                        progress_callback(1.0, "生成完成!")
-                    
-                    config["success"] = True
-                    config["output_path"] = str(local_output_path)
-                    return str(local_output_path), config
-            
-            config["error"] = result.get("error", "生成失败")
-            return None, config
-            
-        except requests.exceptions.Timeout:
-            config["error"] = "请求超时，生成时间过长"
-            return None, config
-        except Exception as e:
-            config["error"] = str(e)
-            return None, config
+        config, job = self._multi_avatar_job(
+            image_path=image_path, audio1_path=audio1_path, audio2_path=audio2_path, prompt=prompt,
+            audio_type=audio_type, resolution=resolution, num_inference_steps=num_inference_steps,
+            text_guidance_scale=text_guidance_scale, audio_guidance_scale=audio_guidance_scale, seed=seed,
+            num_segments=num_segments, ref_img_index=ref_img_index, mask_frame_range=mask_frame_range,
+            bbox1=bbox1, bbox2=bbox2
+        )
+        return self._execute(job, config, progress_callback)
+
+    async def multi_avatar_async(self, image_path, audio1_path=None, audio2_path=None,
+                                 prompt="Two people are having a conversation.", audio_type="para",
+                                 resolution="480p", num_inference_steps=50, text_guidance_scale=4.0,
+                                 audio_guidance_scale=4.0, seed=42, num_segments=1, ref_img_index=10,
+                                 mask_frame_range=3, bbox1=None, bbox2=None, progress_callback=None,
+                                 stream=False):
+        """双人对话视频生成 - asyncio 版本 (参数同 multi_avatar)"""
+        config, job = self._multi_avatar_job(
+            image_path=image_path, audio1_path=audio1_path, audio2_path=audio2_path, prompt=prompt,
+            audio_type=audio_type, resolution=resolution, num_inference_steps=num_inference_steps,
+            text_guidance_scale=text_guidance_scale, audio_guidance_scale=audio_guidance_scale, seed=seed,
+            num_segments=num_segments, ref_img_index=ref_img_index, mask_frame_range=mask_frame_range,
+            bbox1=bbox1, bbox2=bbox2
+        )
+        return await self._execute_async(job, config, progress_callback, stream)
 
 
 # 全局实例
@@ -0,0 +1,227 @@
+"""
+生成结果目录 (catalog)
+每次生成 (含缓存命中、合并请求和失败) 的完整配置、输入文件哈希、输出路径、大小、总耗时和各阶段耗时
+记录到 SQLite (WAL 模式，画廊读取与生成线程写入互不阻塞)。
+
+画廊按 (created_at, id) 做键集分页 (keyset pagination)：翻页代价与历史记录总数无关；
+提示词检索使用 FTS5 trigram 全文索引 (SQLite 不支持时退化为 LIKE 扫描)。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import CATALOG_DB, GALLERY_PAGE_SIZE
+from modules.cold_storage import get_cold_storage
+
+# 表结构版本，结构变化时递增，并在 _MIGRATIONS 中添加升级语句
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id      TEXT,                   -- 任务 ID (ULID)
+    job_type    TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    status      TEXT NOT NULL,          -- generated / cached / coalesced / failed
+    prompt      TEXT,
+    seed        INTEGER,
+    output_path TEXT,
+    size        INTEGER,
+    duration    REAL,                   -- 总耗时 (秒)
+    timings     TEXT,                   -- JSON: 阶段 -> 秒
+    config      TEXT,                   -- JSON: 完整生成配置
+    inputs      TEXT,                   -- JSON: 输入字段 -> sha256
+    request_key TEXT,
+    backend_url TEXT,
+    error       TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outputs_created ON outputs(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_outputs_type_created ON outputs(job_type, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_outputs_request_key ON outputs(request_key);
+"""
+
+# 各版本的升级语句 (旧版本号 -> 升级到下一版本)
+_MIGRATIONS = {
+    1: "ALTER TABLE outputs ADD COLUMN job_id TEXT;",
+}
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_outputs_job_id ON outputs(job_id);
+"""
+
+# 提示词全文索引 (external content，由触发器与 outputs 表同步)
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS outputs_fts USING fts5(
+    prompt, content='outputs', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS outputs_fts_insert AFTER INSERT ON outputs BEGIN
+    INSERT INTO outputs_fts(rowid, prompt) VALUES (new.id, new.prompt);
+END;
+CREATE TRIGGER IF NOT EXISTS outputs_fts_delete AFTER DELETE ON outputs BEGIN
+    INSERT INTO outputs_fts(outputs_fts, rowid, prompt) VALUES ('delete', old.id, old.prompt);
+END;
+"""
+
+
+def prompt_text(config):
+    """从生成配置中取出用于检索的提示文字 (视频提示词 / 歌曲描述与歌词)"""
+    parts = [config.get(key) for key in ("prompt", "description", "lyrics")]
+    return "\n".join(part for part in parts if isinstance(part, str) and part.strip()) or None
+
+
+class Catalog:
+    """生成记录的 SQLite 目录 (线程安全，每个线程一个连接)"""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or CATALOG_DB)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self.fts = False
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        with conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version and version < SCHEMA_VERSION:
+                for old in range(version, SCHEMA_VERSION):
+                    conn.executescript(_MIGRATIONS[old])
+            conn.executescript(_SCHEMA)
+            conn.executescript(_INDEXES)
+            try:
+                conn.executescript(_FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError as e:
+                print(f"[catalog] 全文索引不可用，提示词检索退化为 LIKE: {e}")
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    # ==================== 写入 ====================
+
+    def record(self, job_type, config, output_path=None, inputs=None, timings=None,
+               duration=None, request_key=None, backend_url=None, status=None, job_id=None):
+        """记录一次生成，返回记录 id"""
+        size = None
+        if output_path:
+            try:
+                size = os.path.getsize(output_path)
+            except OSError:
+                pass
+        if status is None:
+            status = "generated" if config.get("success") else "failed"
+        seed = config.get("seed")
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO outputs (job_id, job_type, created_at, status, prompt, seed, output_path, size, duration,"
+                " timings, config, inputs, request_key, backend_url, error)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, job_type, time.time(), status, prompt_text(config),
+                    int(seed) if isinstance(seed, (int, float)) else None,
+                    str(output_path) if output_path else None, size, duration,
+                    json.dumps(timings or {}), json.dumps(config, ensure_ascii=False, default=str),
+                    json.dumps(inputs or {}), request_key, backend_url, config.get("error"),
+                ),
+            )
+        return cursor.lastrowid
+
+    # ==================== 查询 ====================
+
+    def find_output(self, request_key):
+        """最近一次与 request_key 相同、输出文件仍然存在 (或可从冷存储取回) 的成功生成的输出路径"""
+        if request_key is None:
+            return None
+        rows = self._connect().execute(
+            "SELECT output_path FROM outputs WHERE request_key = ? AND status = 'generated'"
+            " ORDER BY created_at DESC, id DESC LIMIT 5",
+            (request_key,),
+        ).fetchall()
+        for row in rows:
+            if get_cold_storage().ensure_local(row["output_path"]):
+                return row["output_path"]
+        return None
+
+    def find_output_by_job_id(self, job_id):
+        """任务 ID 对应的、仍然存在的输出文件路径 (已转入冷存储时取回)"""
+        row = self._connect().execute(
+            "SELECT output_path FROM outputs WHERE job_id = ? AND status != 'failed'"
+            " ORDER BY id DESC LIMIT 1",
+            (job_id,),
+        ).fetchone()
+        if row and get_cold_storage().ensure_local(row["output_path"]):
+            return row["output_path"]
+        return None
+
+    def page(self, job_type=None, query=None, cursor=None, limit=None):
+        """按时间倒序取一页成功的生成记录，返回 (记录列表, 下一页游标)
+
+        cursor 为上一页返回的 (created_at, id)，None 表示第一页；没有下一页时游标为 None。
+        """
+        limit = limit or GALLERY_PAGE_SIZE
+        where = ["o.status != 'failed'", "o.output_path IS NOT NULL"]
+        params = []
+        if job_type:
+            where.append("o.job_type = ?")
+            params.append(job_type)
+        if cursor:
+            where.append("(o.created_at, o.id) < (?, ?)")
+            params.extend(cursor)
+
+        source = "outputs o"
+        query = (query or "").strip()
+        if query and self.fts and len(query) >= 3:
+            # trigram 索引要求检索词至少 3 个字符，短词走 LIKE
+            source = "outputs_fts f JOIN outputs o ON o.id = f.rowid"
+            where.append("outputs_fts MATCH ?")
+            params.append('"' + query.replace('"', '""') + '"')
+        elif query:
+            where.append("o.prompt LIKE ? ESCAPE '\\'")
+            params.append("%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+
+        rows = self._connect().execute(
+            f"SELECT o.* FROM {source} WHERE {' AND '.join(where)}"
+            " ORDER BY o.created_at DESC, o.id DESC LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+        items = [self._row(row) for row in rows[:limit]]
+        next_cursor = (rows[limit - 1]["created_at"], rows[limit - 1]["id"]) if len(rows) > limit else None
+        return items, next_cursor
+
+    def get(self, record_id):
+        row = self._connect().execute("SELECT * FROM outputs WHERE id = ?", (record_id,)).fetchone()
+        return self._row(row) if row else None
+
+    @staticmethod
+    def _row(row):
+        item = dict(row)
+        for key in ("timings", "config", "inputs"):
+            try:
+                item[key] = json.loads(item[key]) if item[key] else {}
+            except ValueError:
+                item[key] = {}
+        return item
+
+
+# 全局实例
+catalog = None
+
+
+def get_catalog():
+    """获取生成记录目录实例"""
+    global catalog
+    if catalog is None:
+        catalog = Catalog()
+    return catalog
@@ -0,0 +1,256 @@
+"""
+冷存储分层
+长期未访问 (COLD_TIER_AFTER_DAYS 天) 的输出从 outputs/* 移到冷存储层，原位置只留一个很小的存根文件
+<文件名>.cold (JSON: 冷存储层、对象键、大小、sha256)，热盘用量和目录扫描时间保持有界，历史记录不丢失。
+
+冷存储层 (COLD_TIER):
+    archive  本地归档目录 (gzip 格式；视频、音频等已压缩的媒体以级别 0 存入，COLD_ARCHIVE_DIR 可以放在另一块大容量磁盘上)
+    s3       S3 兼容对象存储 (AWS S3 / MinIO / 本地替身服务)，配置了密钥时请求使用 SigV4 签名
+
+对象按内容 sha256 寻址，相同内容只存一份。画廊、结果缓存和媒体路由访问到存根时透明地取回文件 (recall)：
+写回原位置 (校验 sha256 后原子落盘) 并删除存根，再通知存储管理把文件重新计入用量 (on_recall)，
+去重登记在下一轮去重扫描时补上。
+
+冷存储中的对象不会被 WebUI 删除：取回后仍保留 (再次转冷时不必重新上传)，多个存根可能引用同一对象。
+需要回收空间时只能删除没有任何存根 (outputs/**/*.cold 中的 key) 引用的对象。
+"""
+import gzip
+import hashlib
+import hmac
+import json
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from config import (
+    COLD_TIER, COLD_TIMEOUT, COLD_ARCHIVE_DIR, COLD_ARCHIVE_LEVEL, COLD_ARCHIVE_STORED,
+    COLD_S3_ENDPOINT, COLD_S3_BUCKET, COLD_S3_PREFIX, COLD_S3_REGION, COLD_S3_ACCESS_KEY, COLD_S3_SECRET_KEY,
+)
+from modules.file_utils import atomic_write, file_digest
+from modules.http_client import get_transport
+
+# 存根文件后缀
+STUB_SUFFIX = ".cold"
+
+# 空请求体的 sha256 (SigV4 对 GET / HEAD 请求签名时使用)
+_EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+def stub_path(path):
+    """输出文件对应的存根路径"""
+    return Path(f"{path}{STUB_SUFFIX}")
+
+
+def is_stub(path):
+    return str(path).endswith(STUB_SUFFIX)
+
+
+class _VerifyingWriter:
+    """写入时顺便计算 sha256，取回结束后与存根记录比对"""
+
+    def __init__(self, f):
+        self.f = f
+        self.hasher = hashlib.sha256()
+
+    def write(self, data):
+        self.hasher.update(data)
+        return self.f.write(data)
+
+    def check(self, expected_sha256):
+        if expected_sha256 and self.hasher.hexdigest() != expected_sha256:
+            raise IOError("冷存储对象校验失败 (sha256 不一致)")
+
+
+class ArchiveTier:
+    """本地归档目录: <root>/<ab>/<sha256>.gz"""
+
+    name = "archive"
+
+    def __init__(self, root=None, level=None):
+        self.root = Path(root or COLD_ARCHIVE_DIR)
+        self.level = COLD_ARCHIVE_LEVEL if level is None else level
+
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.gz"
+
+    def exists(self, key):
+        return self._path(key).is_file()
+
+    def put(self, key, src_path):
+        if self.exists(key):
+            return
+        # 已压缩的媒体压缩不了多少，只用 gzip 的存储块 (读取方式不变)
+        level = 0 if Path(src_path).suffix.lower() in COLD_ARCHIVE_STORED else self.level
+        with atomic_write(self._path(key)) as f, open(src_path, "rb") as src:
+            with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=level, mtime=0) as gz:
+                shutil.copyfileobj(src, gz, 1024 * 1024)
+
+    def get(self, key, dest_path, expected_sha256=None, expected_size=None):
+        path = self._path(key)
+        if not path.is_file():
+            raise FileNotFoundError(f"冷存储中没有对象 {key}")
+        with atomic_write(dest_path) as f, gzip.open(path, "rb") as src:
+            writer = _VerifyingWriter(f)
+            shutil.copyfileobj(src, writer, 1024 * 1024)
+            writer.check(expected_sha256)
+
+
+class S3Tier:
+    """S3 兼容对象存储 (路径风格地址: <endpoint>/<bucket>/<prefix><sha256>)"""
+
+    name = "s3"
+
+    def __init__(self, endpoint=None, bucket=None, prefix=None, region=None, access_key=None, secret_key=None):
+        self.endpoint = (endpoint or COLD_S3_ENDPOINT).rstrip("/")
+        self.bucket = bucket or COLD_S3_BUCKET
+        self.prefix = COLD_S3_PREFIX if prefix is None else prefix
+        self.region = region or COLD_S3_REGION
+        self.access_key = COLD_S3_ACCESS_KEY if access_key is None else access_key
+        self.secret_key = COLD_S3_SECRET_KEY if secret_key is None else secret_key
+        self.transport = get_transport(self.endpoint)
+
+    def _object(self, key):
+        return quote(f"/{self.bucket}/{self.prefix}{key}")
+
+    def _headers(self, method, path, payload_sha256=_EMPTY_SHA256):
+        """AWS Signature Version 4 请求头；未配置密钥时不签名"""
+        if not self.access_key:
+            return {}
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        host = urlsplit(self.endpoint).netloc
+        signed_headers = "host;x-amz-content-sha256;x-amz-date"
+        canonical_request = "\n".join([
+            method, path, "",
+            f"host:{host}\nx-amz-content-sha256:{payload_sha256}\nx-amz-date:{amz_date}\n",
+            signed_headers, payload_sha256,
+        ])
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+        ])
+        key = ("AWS4" + self.secret_key).encode("utf-8")
+        for part in (date, self.region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+        signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        return {
+            "x-amz-date": amz_date,
+            "x-amz-content-sha256": payload_sha256,
+            "Authorization": f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                             f"SignedHeaders={signed_headers}, Signature={signature}",
+        }
+
+    def exists(self, key):
+        path = self._object(key)
+        resp = self.transport.request("HEAD", path, timeout=COLD_TIMEOUT, headers=self._headers("HEAD", path))
+        return resp.status_code == 200
+
+    def put(self, key, src_path):
+        if self.exists(key):
+            return
+        path = self._object(key)
+        with open(src_path, "rb") as f:
+            # 对象键就是内容 sha256，直接作为签名的请求体哈希
+            resp = self.transport.request("PUT", path, timeout=COLD_TIMEOUT, data=f,
+                                          headers=self._headers("PUT", path, key))
+        if resp.status_code not in (200, 201, 204):
+            raise IOError(f"冷存储上传失败 (HTTP {resp.status_code})")
+
+    def get(self, key, dest_path, expected_sha256=None, expected_size=None):
+        path = self._object(key)
+        ok = self.transport.download(path, dest_path, timeout=COLD_TIMEOUT, expected_size=expected_size,
+                                     expected_sha256=expected_sha256, headers=self._headers("GET", path))
+        if not ok:
+            raise FileNotFoundError(f"冷存储中没有对象 {key}")
+
+
+_TIERS = {"archive": ArchiveTier, "s3": S3Tier}
+
+
+class ColdStorage:
+    """输出文件转冷 (archive) 与取回 (recall)"""
+
+    def __init__(self, tier=None):
+        tier = COLD_TIER if tier is None else tier
+        self.tier = _TIERS[tier]() if tier in _TIERS else None
+        self.enabled = self.tier is not None
+        self._tiers = {self.tier.name: self.tier} if self.enabled else {}
+        # 按路径分段加锁：同一文件的并发取回只下载一次
+        self._locks = [threading.Lock() for _ in range(64)]
+        self._recalled = 0
+        self._on_recall = []
+
+    def _tier(self, name):
+        """存根记录的冷存储层 (切换 COLD_TIER 后，旧存根仍按原来的层取回)"""
+        if name not in self._tiers:
+            self._tiers[name] = _TIERS[name]()
+        return self._tiers[name]
+
+    def on_recall(self, callback):
+        """文件从冷存储取回后调用 callback(path) (存储管理据此重新计入用量)"""
+        self._on_recall.append(callback)
+
+    def archive(self, path):
+        """把热盘上的 path 移到冷存储，原位置换成存根，返回存根路径"""
+        path = Path(path)
+        stat = path.stat()
+        digest = file_digest(path)
+        self.tier.put(digest, path)
+        stub = {
+            "tier": self.tier.name,
+            "key": digest,
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "archived_at": time.time(),
+        }
+        stub_file = stub_path(path)
+        with atomic_write(stub_file) as f:
+            f.write(json.dumps(stub, indent=2).encode("utf-8"))
+        path.unlink()
+        return stub_file
+
+    def ensure_local(self, path):
+        """path 在热盘上时返回 True；只有存根时从冷存储取回，取回失败或两者都不存在时返回 False"""
+        if not path:
+            return False
+        path = Path(path)
+        if path.is_file():
+            return True
+        stub_file = stub_path(path)
+        if not stub_file.is_file():
+            return False
+        with self._locks[hash(str(path)) % len(self._locks)]:
+            if path.is_file():
+                return True  # 等锁期间已被其他请求取回
+            try:
+                stub = json.loads(stub_file.read_text(encoding="utf-8"))
+                self._tier(stub["tier"]).get(stub["key"], path, stub.get("sha256"), stub.get("size"))
+                stub_file.unlink()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[cold] 取回 {path.name} 失败: {e}")
+                return False
+        self._recalled += 1
+        print(f"[cold] 已从冷存储取回 {path.name}")
+        for callback in self._on_recall:
+            callback(path)
+        return True
+
+    def stats(self):
+        return {"tier": self.tier.name if self.enabled else None, "recalled": self._recalled}
+
+
+# 全局实例
+cold_storage = None
+
+
+def get_cold_storage():
+    """获取冷存储实例"""
+    global cold_storage
+    if cold_storage is None:
+        cold_storage = ColdStorage()
+    return cold_storage
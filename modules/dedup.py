@@ -0,0 +1,191 @@
+"""
+输出文件去重
+内容完全相同的输出 (缓存副本、重试后重新下载的结果、相同参数的重复生成) 只在磁盘上保存一份：
+新文件写入时 (以及存储管理的后台扫描中) 计算 sha256，已有相同内容时把新文件原子替换为指向已有数据的
+硬链接 (不支持时用 reflink)。
+
+引用计数表 (DEDUP_DB):
+    contents    内容哈希 -> 大小、引用数
+    links       文件路径 -> 内容哈希、登记时的修改时间 (文件被原子替换后不再共享数据，修改时间随之变化)
+淘汰文件前调用 release()：只有最后一个引用被删除时，才真正释放磁盘空间。
+"""
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from config import DEDUP_ENABLED, DEDUP_DB, DEDUP_MIN_SIZE
+from modules.file_utils import file_digest, link_file
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contents (
+    digest  TEXT PRIMARY KEY,
+    size    INTEGER NOT NULL,
+    refs    INTEGER NOT NULL        -- 共享这份数据的路径数
+);
+CREATE TABLE IF NOT EXISTS links (
+    path     TEXT PRIMARY KEY,
+    digest   TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_links_digest ON links(digest);
+"""
+
+
+class DedupIndex:
+    """内容哈希 -> 共享同一份数据的文件 (线程安全，每个线程一个连接)"""
+
+    def __init__(self, db_path=None, enabled=None):
+        self.db_path = Path(db_path or DEDUP_DB)
+        self.enabled = DEDUP_ENABLED if enabled is None else enabled
+        self._local = threading.local()
+        # 登记 / 链接 / 释放互斥，避免两个线程同时把同一路径链接到不同的数据
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ==================== 登记 ====================
+
+    def is_current(self, path):
+        """path 已登记且登记后未被替换"""
+        path = Path(path).resolve()
+        row = self._connect().execute("SELECT mtime_ns FROM links WHERE path = ?", (str(path),)).fetchone()
+        try:
+            return row is not None and row["mtime_ns"] == path.stat().st_mtime_ns
+        except OSError:
+            return False
+
+    def add(self, path):
+        """登记新文件；已有相同内容时把它换成共享数据的链接，返回使用的方式 ("hardlink" / "reflink")"""
+        if not self.enabled:
+            return None
+        path = Path(path).resolve()
+        try:
+            stat = path.stat()
+            if stat.st_size < DEDUP_MIN_SIZE:
+                return None
+            digest = file_digest(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._unregister(conn, path)
+                mode = None
+                for row in conn.execute("SELECT path FROM links WHERE digest = ?", (digest,)).fetchall():
+                    source = Path(row["path"])
+                    if not self._shares_row(conn, source):
+                        continue
+                    if os.path.samefile(source, path):
+                        break
+                    mode = link_file(source, path)
+                    if mode is not None:
+                        break
+                else:
+                    if conn.execute("SELECT 1 FROM links WHERE digest = ?", (digest,)).fetchone():
+                        return None  # 无法与已有数据共享 (跨文件系统等)，保留为独立文件
+                self._register(conn, path, digest, stat.st_size)
+        return mode
+
+    def link_copy(self, src_path, dest_path):
+        """把已登记的 src_path 放到 dest_path (如写入结果缓存)：优先共享数据，不能共享时复制"""
+        if not self.enabled:
+            return link_file(src_path, dest_path, copy=True)
+        self.add(src_path)
+        mode = link_file(src_path, dest_path, copy=True)
+        if mode == "copy":
+            self.add(dest_path)
+            return mode
+        dest_path = Path(dest_path).resolve()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute(
+                    "SELECT digest FROM links WHERE path = ?", (str(Path(src_path).resolve()),)
+                ).fetchone()
+                self._unregister(conn, dest_path)
+                if row is not None:
+                    self._register(conn, dest_path, row["digest"], dest_path.stat().st_size)
+        return mode
+
+    def _register(self, conn, path, digest, size):
+        conn.execute(
+            "INSERT OR REPLACE INTO links (path, digest, mtime_ns) VALUES (?, ?, ?)",
+            (str(path), digest, path.stat().st_mtime_ns),
+        )
+        conn.execute(
+            "INSERT INTO contents (digest, size, refs) VALUES (?, ?, 1)"
+            " ON CONFLICT(digest) DO UPDATE SET refs = refs + 1",
+            (digest, size),
+        )
+
+    def _unregister(self, conn, path):
+        """删除 path 的登记，返回它原来指向的内容哈希"""
+        row = conn.execute("SELECT digest FROM links WHERE path = ?", (str(path),)).fetchone()
+        if row is None:
+            return None
+        conn.execute("DELETE FROM links WHERE path = ?", (str(path),))
+        conn.execute("UPDATE contents SET refs = refs - 1 WHERE digest = ?", (row["digest"],))
+        conn.execute("DELETE FROM contents WHERE digest = ? AND refs <= 0", (row["digest"],))
+        return row["digest"]
+
+    def _shares_row(self, conn, path):
+        """登记的 path 是否仍是那份数据；已删除或被替换的登记顺便清除"""
+        try:
+            row = conn.execute("SELECT mtime_ns FROM links WHERE path = ?", (str(path),)).fetchone()
+            if row is not None and Path(path).stat().st_mtime_ns == row["mtime_ns"]:
+                return True
+        except OSError:
+            pass
+        self._unregister(conn, path)
+        return False
+
+    # ==================== 释放 ====================
+
+    def release(self, path):
+        """path 即将被删除：移除登记，返回仍共享这份数据的路径数 (0 表示删除后空间被释放)
+
+        path 未登记时返回 None，由调用方按文件系统的链接数判断。
+        """
+        if not self.enabled:
+            return None
+        path = Path(path).resolve()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                digest = self._unregister(conn, path)
+                if digest is None:
+                    return None
+                others = conn.execute("SELECT path FROM links WHERE digest = ?", (digest,)).fetchall()
+                return sum(1 for row in others if self._shares_row(conn, row["path"]))
+
+    def stats(self):
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS contents, COALESCE(SUM(refs), 0) AS links,"
+            " COALESCE(SUM(size * (refs - 1)), 0) AS saved FROM contents"
+        ).fetchone()
+        return dict(row)
+
+
+# 全局实例
+dedup_index = None
+
+
+def get_dedup_index():
+    """获取去重索引实例"""
+    global dedup_index
+    if dedup_index is None:
+        dedup_index = DedupIndex()
+    return dedup_index
@@ -0,0 +1,180 @@
+"""
+后端端点池
+每个模块可以配置多个后端地址 (逗号分隔)，每个生成任务路由到未完成任务最少的健康端点。
+
+地址格式:
+    http://gpu1:8001,http://gpu2:8001|weight=2,http://gpu3:8001|drain
+    weight=N  权重，未完成任务数按权重折算 (默认 1，显存 / 算力更大的节点可以调高)
+    drain     排空，不再分配新任务 (已在执行的任务不受影响)，用于下线维护
+    model=X   固定模型类型：只接收要求模型 X 的任务 (如 Avatar 的 single / multi)，避免来回切换模型
+熔断中的端点 (见 resilience.py) 同样不参与路由。
+"""
+import threading
+
+from modules.http_client import get_transport, get_async_transport
+from modules.health_monitor import get_health_monitor
+from modules.resilience import get_breaker
+
+
+class Endpoint:
+    """端点池中的一个后端：传输、健康监控、熔断器和本进程内的未完成任务数"""
+
+    def __init__(self, url, weight=1.0, drain=False, pinned_model=None):
+        self.url = url.rstrip("/")
+        self.weight = weight
+        self.drain = drain
+        self.pinned_model = pinned_model
+        self.transport = get_transport(self.url)
+        self.async_transport = get_async_transport(self.url)
+        self.health = get_health_monitor(self.transport)
+        self.breaker = get_breaker(self.url)
+        self.outstanding = 0
+        # 最近分配到该端点的任务要求的模型类型 (有未完成任务时，后端即将 / 已经切换到该模型)
+        self.target_model = None
+
+    def effective_model(self, snapshot):
+        """路由时认为该端点所处的模型类型"""
+        if self.outstanding > 0 and self.target_model:
+            return self.target_model
+        return snapshot["model_type"]
+
+    def stats(self):
+        snapshot = self.health.cached()
+        return {
+            "url": self.url,
+            "weight": self.weight,
+            "drain": self.drain,
+            "pinned_model": self.pinned_model,
+            "outstanding": self.outstanding,
+            "available": bool(snapshot and snapshot["available"]),
+            "model_type": snapshot["model_type"] if snapshot else None,
+            "breaker": self.breaker.snapshot(),
+        }
+
+
+def parse_endpoints(spec):
+    """解析端点配置 (逗号分隔的字符串或字符串列表)，返回 Endpoint 列表"""
+    items = spec.split(",") if isinstance(spec, str) else list(spec)
+    endpoints = []
+    for item in items:
+        parts = [p.strip() for p in item.split("|")]
+        if not parts[0]:
+            continue
+        weight, drain, pinned_model = 1.0, False, None
+        for option in parts[1:]:
+            if option == "drain":
+                drain = True
+            elif option.startswith("model="):
+                pinned_model = option[len("model="):]
+            elif option.startswith("weight="):
+                weight = float(option[len("weight="):])
+                if weight <= 0:
+                    raise ValueError(f"端点权重必须大于 0: {item}")
+            elif option:
+                raise ValueError(f"无法识别的端点参数 '{option}': {item}")
+        endpoints.append(Endpoint(parts[0], weight=weight, drain=drain, pinned_model=pinned_model))
+    if not endpoints:
+        raise ValueError(f"没有配置后端地址: {spec!r}")
+    return endpoints
+
+
+class EndpointPool:
+    """一组同类后端，按 "未完成任务数 / 权重" 最少路由
+
+    需要特定模型类型的任务 (Avatar 单人 / 双人) 优先分配给已加载该模型的端点，避免 /load_model 切换。
+    """
+
+    def __init__(self, spec):
+        self.endpoints = parse_endpoints(spec)
+        self._lock = threading.Lock()
+        # 提前启动各端点的健康监控，路由时直接读缓存
+        for endpoint in self.endpoints:
+            endpoint.health.start()
+
+    @property
+    def urls(self):
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def snapshots(self):
+        """所有端点的 (端点, 健康快照)"""
+        return [(endpoint, endpoint.health.snapshot()) for endpoint in self.endpoints]
+
+    def serves(self, endpoint, model_type):
+        """端点是否接收要求 model_type 的任务：固定了模型的端点只接收该模型；
+        某个模型有专属端点时，它的任务只分配给专属端点"""
+        if endpoint.pinned_model:
+            return endpoint.pinned_model == model_type
+        if model_type is None:
+            return True
+        return not any(other.pinned_model == model_type and not other.drain for other in self.endpoints)
+
+    def acquire(self, model_type=None, prefer=None):
+        """选择一个端点并计入未完成任务，返回 (端点, 健康快照, 试探凭证)
+
+        prefer 为调度器 (AffinityQueue) 分配的端点地址：只选择该端点，它已不可用时返回 (None, None, None)，
+        不占用其他端点上调度器没有分配的执行位置。
+        试探凭证只在任务是 half-open 端点的试探任务时不为 None。
+        没有可用端点时返回 (None, None, None)；否则任务结束后必须调用 release(端点, 试探凭证)。
+        """
+        candidates = [
+            (endpoint, snapshot) for endpoint, snapshot in self.snapshots()
+            if snapshot["available"] and not endpoint.drain and endpoint.breaker.can_attempt()
+            and self.serves(endpoint, model_type) and (prefer is None or endpoint.url == prefer)
+        ]
+
+        with self._lock:
+            def score(candidate):
+                endpoint, snapshot = candidate
+                mismatch = bool(model_type and endpoint.effective_model(snapshot) != model_type)
+                return (mismatch, (endpoint.outstanding + 1) / endpoint.weight, snapshot["load"] or 0)
+
+            for endpoint, snapshot in sorted(candidates, key=score):
+                # half-open 的端点同一时间只放行一个试探任务，名额被占用时换下一个
+                lease = endpoint.breaker.attempt()
+                if not lease:
+                    continue
+                endpoint.outstanding += 1
+                if model_type:
+                    endpoint.target_model = model_type
+                return endpoint, snapshot, (None if lease is True else lease)
+        return None, None, None
+
+    def get(self, url):
+        """地址对应的端点，不在池中时返回 None"""
+        if not url:
+            return None
+        return next((endpoint for endpoint in self.endpoints if endpoint.url == url.rstrip("/")), None)
+
+    def attach(self, url, model_type=None):
+        """计入指定端点的未完成任务 (重新连接已在该端点上执行的任务)，返回端点；地址不在池中时返回 None
+
+        任务结束后同样必须调用 release()。
+        """
+        endpoint = self.get(url)
+        if endpoint is None:
+            return None
+        with self._lock:
+            endpoint.outstanding += 1
+            if model_type:
+                endpoint.target_model = model_type
+        return endpoint
+
+    def release(self, endpoint, probe=None):
+        """任务结束 (无论成败)，释放端点上的未完成任务计数；probe 为 acquire() 返回的试探凭证"""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if endpoint.outstanding == 0:
+                endpoint.target_model = None
+        # 试探任务结束 (包括被取消) 时归还 half-open 名额；其他任务结束不影响正在执行的试探任务
+        endpoint.breaker.release_probe(probe)
+
+    def breaker_wait(self):
+        """熔断中的端点距离最早放行试探任务的秒数；没有熔断的端点时返回 None"""
+        waits = [
+            endpoint.breaker.retry_in() for endpoint in self.endpoints
+            if not endpoint.drain and endpoint.stats()["available"] and not endpoint.breaker.can_attempt()
+        ]
+        return min(waits) if waits else None
+
+    def stats(self):
+        return [endpoint.stats() for endpoint in self.endpoints]
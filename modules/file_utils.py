@@ -0,0 +1,161 @@
+"""
+文件工具
+输出文件的原子写入：先写同目录临时文件，fsync 后 rename 到最终路径
+"""
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def temp_path_for(dest_path):
+    """目标文件对应的临时文件路径 (与目标同目录，保证 rename 原子性)
+
+    名称带随机后缀，同一目标的并发写入 (例如两个进程写同一个缓存键) 各用各的临时文件，最后一个 rename 生效。
+    """
+    dest_path = Path(dest_path)
+    return dest_path.with_name(f".{dest_path.name}.{uuid.uuid4().hex[:8]}.part")
+
+
+def fsync_dir(dir_path):
+    """fsync 目录，确保 rename 落盘 (Windows 不支持，直接跳过)"""
+    if os.name != "posix":
+        return
+    fd = os.open(str(dir_path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def finalize_file(tmp_path, dest_path):
+    """把已写完并 fsync 的临时文件原子替换为目标文件"""
+    dest_path = Path(dest_path)
+    for attempt in range(5):
+        try:
+            os.replace(tmp_path, dest_path)
+            break
+        except PermissionError:
+            # Windows 上临时文件正被读者 (边下边看的浏览器请求) 短暂打开时无法 rename，稍后重试
+            if os.name == "posix" or attempt == 4:
+                raise
+            time.sleep(0.2)
+    fsync_dir(dest_path.parent)
+
+
+@contextmanager
+def atomic_write(dest_path, mode="wb"):
+    """原子写入文件
+
+    读者只会看到完整的旧文件或完整的新文件，写入中途失败时临时文件会被清理。
+    """
+    dest_path = Path(dest_path)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path_for(dest_path)
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        finalize_file(tmp_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+# Linux 的 FICLONE ioctl (btrfs / XFS / bcachefs 等支持 reflink 的文件系统)
+_FICLONE = 0x40049409
+
+
+def _reflink(src_path, dest_path):
+    """写时复制克隆文件内容，不支持时抛出 OSError"""
+    if not sys.platform.startswith("linux"):
+        raise OSError("当前系统不支持 reflink")
+    import fcntl
+
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+
+
+def _copy(src_path, dest_path):
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+        dst.flush()
+        os.fsync(dst.fileno())
+
+
+def link_file(src_path, dest_path, copy=False):
+    """让 dest_path 与 src_path 共享同一份内容，原子替换已有的 dest_path
+
+    依次尝试硬链接、reflink；都不可用 (跨文件系统等) 时，copy 为 True 则复制，否则不做任何修改。
+    返回 "hardlink" / "reflink" / "copy"，未修改时返回 None。
+    """
+    dest_path = Path(dest_path)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = temp_path_for(dest_path)
+    methods = [("hardlink", os.link), ("reflink", _reflink)]
+    if copy:
+        methods.append(("copy", _copy))
+    for mode, method in methods:
+        try:
+            method(str(src_path), str(tmp_path))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            continue
+        try:
+            finalize_file(tmp_path, dest_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return mode
+    return None
+
+
+# 文件内容哈希缓存: (路径, 大小, 修改时间) -> sha256，按最近使用保留最多 _DIGESTS_MAX 项
+_DIGESTS_MAX = 4096
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """分块计算文件内容的 sha256 (十六进制)"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def file_digest(path):
+    """文件内容的 sha256，按 (路径, 大小, 修改时间) 缓存，同一文件反复使用时不必重复读取"""
+    stat = os.stat(path)
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(key)
+        if digest is not None:
+            _digests.move_to_end(key)
+    if digest is None:
+        digest = file_sha256(path)
+        with _digests_lock:
+            _digests[key] = digest
+            while len(_digests) > _DIGESTS_MAX:
+                _digests.popitem(last=False)
+    return digest
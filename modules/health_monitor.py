@@ -0,0 +1,134 @@
+"""
+后端健康监控
+每个后端一个后台探测线程，定期刷新 /health 及其元数据 (model_type、负载、显存、能力列表)，
+生成请求直接读取缓存快照，不再在关键路径上同步探测
+"""
+import threading
+import time
+
+import requests
+
+from config import HEALTH_CHECK_INTERVAL, HEALTH_MAX_STALENESS, HEALTH_PROBE_TIMEOUT
+from modules.resilience import get_breaker
+
+
+class HealthMonitor:
+    """单个后端的健康状态缓存 + 后台探测线程"""
+
+    def __init__(self, transport, interval=None, max_staleness=None):
+        self.transport = transport
+        self.interval = interval or HEALTH_CHECK_INTERVAL
+        self.max_staleness = max_staleness or HEALTH_MAX_STALENESS
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        # 探测不走共享传输 (其 Retry 会对连接失败退避重试，一次探测可能耗时数倍 HEALTH_PROBE_TIMEOUT)，
+        # 用不重试的独立 Session：一次探测最多 HEALTH_PROBE_TIMEOUT 秒，失败由下一轮探测兜底
+        self._session = requests.Session()
+
+    def start(self):
+        """启动后台探测线程 (重复调用无副作用)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._run, name=f"health-{self.transport.base_url}", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self.probe()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def probe(self):
+        """立即探测一次 /health 并更新缓存"""
+        started = time.time()
+        snapshot = {
+            "available": False,
+            "info": None,
+            "model_type": None,
+            "load": None,
+            "vram": None,
+            "capabilities": [],
+            "error": None,
+            "stale": False,
+        }
+        try:
+            resp = self._session.get(self.transport.url("/health"), timeout=HEALTH_PROBE_TIMEOUT)
+            if resp.status_code == 200:
+                info = resp.json()
+                snapshot.update({
+                    "available": True,
+                    "info": info,
+                    "model_type": info.get("model_type"),
+                    "load": info.get("load", info.get("queue_size")),
+                    "vram": info.get("vram", info.get("gpu_memory")),
+                    "capabilities": info.get("capabilities") or [],
+                })
+            else:
+                snapshot["error"] = f"HTTP {resp.status_code}"
+        except Exception as e:
+            snapshot["error"] = str(e)
+
+        snapshot["latency"] = time.time() - started
+        snapshot["checked_at"] = time.time()
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self, max_staleness=None):
+        """读取健康快照
+
+        缓存不超过 max_staleness 秒时直接返回，否则同步探测一次 (仅首次或监控线程卡住时发生)。
+        """
+        self.start()
+        max_staleness = self.max_staleness if max_staleness is None else max_staleness
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is not None and time.time() - snapshot["checked_at"] <= max_staleness:
+            return snapshot
+        return self.probe()
+
+    def cached(self):
+        """最近一次探测的快照 (可能为 None)，不探测也不加锁 (快照整体替换，读取引用是原子的)"""
+        return self._snapshot
+
+    def invalidate(self):
+        """后端出错或切换模型后调用：把缓存标记为过期 (stale) 并唤醒后台线程立即重新探测
+
+        读者继续使用上一份快照直到探测完成，请求路径上不会因此同步探测。
+        """
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot = dict(self._snapshot, stale=True)
+        self._wake.set()
+
+
+# 全局实例 - 每个后端地址一个监控
+_monitors = {}
+_monitors_lock = threading.Lock()
+
+
+def get_health_monitor(transport):
+    """获取 (或创建) 指定后端传输的健康监控"""
+    with _monitors_lock:
+        monitor = _monitors.get(transport.base_url)
+        if monitor is None:
+            monitor = HealthMonitor(transport)
+            _monitors[transport.base_url] = monitor
+        return monitor
+
+
+def get_health_snapshots():
+    """所有后端的最新健康快照及熔断器状态 (不触发探测)"""
+    with _monitors_lock:
+        monitors = list(_monitors.values())
+    result = {}
+    for monitor in monitors:
+        snapshot = dict(monitor.cached() or {})
+        snapshot["breaker"] = get_breaker(monitor.transport.base_url).snapshot()
+        result[monitor.transport.base_url] = snapshot
+    return result
@@ -0,0 +1,412 @@
+"""
+HTTP 传输层
+为 LongCat-Video / SongGeneration / Avatar 三个后端提供共享的 keep-alive 连接池
+"""
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_POOL_BLOCK,
+    HTTP_CONNECT_TIMEOUT, HTTP_RETRY_TOTAL, HTTP_RETRY_BACKOFF,
+    DOWNLOAD_CHUNK_SIZE, DOWNLOAD_MAX_ATTEMPTS,
+    DOWNLOAD_RETRY_BACKOFF, DOWNLOAD_RETRY_MAX_BACKOFF,
+)
+from modules.file_utils import temp_path_for, finalize_file
+from modules.resilience import backoff_delay
+
+
+class DownloadError(Exception):
+    """结果文件下载失败 (重试耗尽或校验不通过)"""
+
+
+_CONTENT_RANGE_RE = re.compile(r"bytes (\d+)-")
+
+
+def _download_backoff(attempt):
+    """第 attempt 次重试前的退避时间 (指数增长，有上限，带随机抖动)"""
+    return backoff_delay(attempt, DOWNLOAD_RETRY_BACKOFF, DOWNLOAD_RETRY_MAX_BACKOFF)
+
+
+class _ResumableDownload:
+    """可续传下载的本地状态：临时文件、已写入字节数和增量 sha256
+
+    同步 / asyncio 两条下载路径共用，负责 Range 续传判断、校验和原子落盘。
+    """
+
+    def __init__(self, dest_path, expected_size=None, expected_sha256=None, on_progress=None):
+        self.dest_path = Path(dest_path)
+        # on_progress(临时文件路径, 已写入字节数)：边下边读的读者 (见 stream_proxy.py) 据此等待数据
+        self.on_progress = on_progress
+        self.dest_path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = temp_path_for(self.dest_path)
+        self.expected_size = int(expected_size) if expected_size is not None else None
+        self.expected_sha256 = expected_sha256.lower() if expected_sha256 else None
+        self.last_error = None
+        self.offset = 0
+        self.hasher = hashlib.sha256()
+        self.file = open(self.tmp_path, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.file.closed:
+            self.file.close()
+        if self.tmp_path.exists():
+            try:
+                os.remove(self.tmp_path)
+            except OSError:
+                pass
+
+    def reset(self):
+        """丢弃已写入内容，从头下载"""
+        self.offset = 0
+        self.hasher = hashlib.sha256()
+        self.file.seek(0)
+        self.file.truncate()
+        if self.on_progress:
+            self.on_progress(self.tmp_path, 0)
+
+    def range_headers(self):
+        return {"Range": f"bytes={self.offset}-"} if self.offset else {}
+
+    def begin(self, status_code, content_range=None):
+        """根据响应状态决定动作: write 写入响应体 / done 已写完 / abort 放弃 / retry 重试"""
+        if status_code == 416 and self.offset and self.expected_size in (None, self.offset):
+            return "done"  # 上一次已经写完全部字节
+        if status_code in (200, 206):
+            match = _CONTENT_RANGE_RE.match(content_range or "")
+            if status_code == 200 or not match or int(match.group(1)) != self.offset:
+                # 服务端不支持 / 忽略了 Range，从头开始
+                self.reset()
+            return "write"
+        if 400 <= status_code < 500:
+            return "abort"
+        self.last_error = f"HTTP {status_code}"
+        return "retry"
+
+    def write(self, chunk):
+        if chunk:
+            self.file.write(chunk)
+            self.hasher.update(chunk)
+            self.offset += len(chunk)
+            if self.on_progress:
+                self.file.flush()
+                self.on_progress(self.tmp_path, self.offset)
+
+    def verify(self):
+        """检查是否下载完整且校验通过；损坏时重置以便重新下载"""
+        if self.expected_size is not None and self.offset < self.expected_size:
+            self.last_error = f"下载不完整: {self.offset}/{self.expected_size} 字节"
+            return False
+        if ((self.expected_size is not None and self.offset != self.expected_size) or
+                (self.expected_sha256 and self.hasher.hexdigest() != self.expected_sha256)):
+            self.last_error = "下载文件校验失败"
+            self.reset()
+            return False
+        return True
+
+    def finalize(self):
+        """fsync 后原子 rename 到目标路径"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        finalize_file(self.tmp_path, self.dest_path)
+
+    def fail(self):
+        raise DownloadError(f"下载失败 (已重试 {DOWNLOAD_MAX_ATTEMPTS} 次): {self.last_error}")
+
+
+class HttpTransport:
+    """单个后端地址的 HTTP 传输 - 复用同一个 Session 及其连接池"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+        # 只重试连接建立失败 (请求还没发出，对所有方法都安全)。读超时和 502/503/504 不在这里重试：
+        # 下载的续传循环、任务轮询和提交重试 (retry_call) 自己处理，叠加重试会让一次下载发出数十个请求
+        retry = Retry(
+            total=HTTP_RETRY_TOTAL,
+            connect=HTTP_RETRY_TOTAL,
+            read=0,
+            status=0,
+            other=0,
+            backoff_factor=HTTP_RETRY_BACKOFF,
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            pool_block=HTTP_POOL_BLOCK,
+            max_retries=retry,
+        )
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    def url(self, path):
+        """拼接完整 URL"""
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _timeout(self, timeout):
+        """把单个读超时转换为 (连接超时, 读超时)；None 表示不限制读超时"""
+        if isinstance(timeout, tuple):
+            return timeout
+        return (HTTP_CONNECT_TIMEOUT, timeout)
+
+    def request(self, method, path, timeout=None, **kwargs):
+        """发送请求，连接由连接池复用"""
+        with self._lock:
+            self._requests += 1
+        try:
+            return self.session.request(
+                method, self.url(path), timeout=self._timeout(timeout), **kwargs
+            )
+        except requests.exceptions.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def get(self, path, timeout=None, **kwargs):
+        return self.request("GET", path, timeout=timeout, **kwargs)
+
+    def post(self, path, timeout=None, **kwargs):
+        return self.request("POST", path, timeout=timeout, **kwargs)
+
+    def download(self, path, dest_path, timeout=None, chunk_size=None,
+                 expected_size=None, expected_sha256=None, on_progress=None, headers=None):
+        """流式、可续传的下载到本地文件
+
+        按块写入同目录临时文件，连接中断时用 Range 从最后写入的字节续传，
+        并按退避策略重试；全部写完后校验大小 / sha256 (若生成接口返回了这些信息)，
+        fsync 后原子 rename 到 dest_path，内存占用与文件大小无关。
+
+        on_progress(临时文件路径, 已写入字节数) 在每块写入 (并 flush) 后调用；
+        headers 附加到每次请求 (如对象存储的签名)。
+
+        返回 True 表示下载成功，服务端返回 4xx (文件不存在等) 时返回 False，
+        重试耗尽或校验失败时抛出 DownloadError。
+        """
+        chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+        with _ResumableDownload(dest_path, expected_size, expected_sha256, on_progress) as state:
+            for attempt in range(DOWNLOAD_MAX_ATTEMPTS):
+                if attempt:
+                    time.sleep(_download_backoff(attempt))
+                try:
+                    with self.get(path, timeout=timeout, stream=True,
+                                  headers={**(headers or {}), **state.range_headers()}) as resp:
+                        action = state.begin(resp.status_code, resp.headers.get("Content-Range"))
+                        if action == "abort":
+                            return False
+                        if action == "retry":
+                            continue
+                        if action == "write":
+                            for chunk in resp.iter_content(chunk_size=chunk_size):
+                                state.write(chunk)
+                except (requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout,
+                        requests.exceptions.ChunkedEncodingError) as e:
+                    state.last_error = str(e)
+                    continue
+
+                if state.verify():
+                    state.finalize()
+                    return True
+            state.fail()
+
+    def pool_stats(self):
+        """连接池统计信息 (urllib3 不公开连接池内部状态，只给出配置和请求数)"""
+        with self._lock:
+            return {
+                "base_url": self.base_url,
+                "requests": self._requests,
+                "errors": self._errors,
+                "pool_maxsize": HTTP_POOL_MAXSIZE,
+            }
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncHttpTransport:
+    """单个后端地址的 asyncio HTTP 传输 (httpx.AsyncClient)
+
+    长时间的生成请求只占用事件循环上的一个协程，不再占用工作线程。
+    AsyncClient 与创建它的事件循环绑定，事件循环变化时自动重建并关闭旧的客户端 (释放其连接池)。
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self._client = None
+        self._loop = None
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+
+    @property
+    def client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._client is None or self._loop is not loop:
+                if self._client is not None:
+                    _close_client(self._client, self._loop)
+                self._client = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    limits=httpx.Limits(
+                        max_connections=None,
+                        max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                    ),
+                    # httpx 只重试连接建立失败，与同步传输的 POST 重试语义一致
+                    transport=httpx.AsyncHTTPTransport(retries=HTTP_RETRY_TOTAL),
+                )
+                self._loop = loop
+            return self._client
+
+    def url(self, path):
+        """拼接完整 URL"""
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def _timeout(self, timeout):
+        if isinstance(timeout, tuple):
+            return httpx.Timeout(timeout[1], connect=timeout[0])
+        return httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT)
+
+    def _count(self, error=False):
+        with self._lock:
+            if error:
+                self._errors += 1
+            else:
+                self._requests += 1
+
+    async def request(self, method, path, timeout=None, **kwargs):
+        """发送请求，连接由连接池复用"""
+        self._count()
+        try:
+            return await self.client.request(
+                method, self.url(path), timeout=self._timeout(timeout), **kwargs
+            )
+        except httpx.HTTPError:
+            self._count(error=True)
+            raise
+
+    async def get(self, path, timeout=None, **kwargs):
+        return await self.request("GET", path, timeout=timeout, **kwargs)
+
+    async def post(self, path, timeout=None, **kwargs):
+        return await self.request("POST", path, timeout=timeout, **kwargs)
+
+    def stream(self, method, path, timeout=None, **kwargs):
+        """流式请求 (async with transport.stream(...) as resp)"""
+        self._count()
+        return self.client.stream(
+            method, self.url(path), timeout=self._timeout(timeout), **kwargs
+        )
+
+    async def download(self, path, dest_path, timeout=None, chunk_size=None,
+                       expected_size=None, expected_sha256=None, on_progress=None, headers=None):
+        """流式、可续传的下载到本地文件 - 行为与 HttpTransport.download 相同"""
+        chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+        with _ResumableDownload(dest_path, expected_size, expected_sha256, on_progress) as state:
+            for attempt in range(DOWNLOAD_MAX_ATTEMPTS):
+                if attempt:
+                    await asyncio.sleep(_download_backoff(attempt))
+                try:
+                    async with self.stream("GET", path, timeout=timeout,
+                                           headers={**(headers or {}), **state.range_headers()}) as resp:
+                        action = state.begin(resp.status_code, resp.headers.get("Content-Range"))
+                        if action == "abort":
+                            return False
+                        if action == "retry":
+                            continue
+                        if action == "write":
+                            async for chunk in resp.aiter_bytes(chunk_size):
+                                state.write(chunk)
+                except httpx.TransportError as e:
+                    self._count(error=True)
+                    state.last_error = str(e)
+                    continue
+
+                if state.verify():
+                    # fsync 可能较慢，放到线程中执行
+                    await asyncio.to_thread(state.finalize)
+                    return True
+            state.fail()
+
+    def pool_stats(self):
+        """连接池统计信息 (httpx 不公开连接池内部状态，只统计请求数)"""
+        with self._lock:
+            return {
+                "base_url": self.base_url,
+                "requests": self._requests,
+                "errors": self._errors,
+                "client_open": self._client is not None and not self._client.is_closed,
+            }
+
+    async def aclose(self):
+        with self._lock:
+            client, self._client, self._loop = self._client, None, None
+        if client is not None:
+            await client.aclose()
+
+
+def _close_client(client, loop):
+    """关闭绑定在旧事件循环上的 AsyncClient：连接只能在它自己的事件循环上关闭
+
+    旧循环仍在运行 (其他线程) 时在该循环上 aclose()；已经停止 (如 asyncio.run 结束) 时无法再在上面执行协程，
+    丢弃引用后连接的 socket 随传输对象被回收时关闭。
+    """
+    if loop is not None and loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+
+# 全局实例 - 每个后端地址一个传输
+_transports = {}
+_async_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(base_url):
+    """获取 (或创建) 指定后端地址的共享传输"""
+    key = base_url.rstrip("/")
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = HttpTransport(key)
+            _transports[key] = transport
+        return transport
+
+
+def get_async_transport(base_url):
+    """获取 (或创建) 指定后端地址的共享 asyncio 传输"""
+    key = base_url.rstrip("/")
+    with _transports_lock:
+        transport = _async_transports.get(key)
+        if transport is None:
+            transport = AsyncHttpTransport(key)
+            _async_transports[key] = transport
+        return transport
+
+
+def get_pool_stats():
+    """所有后端的连接池统计"""
+    with _transports_lock:
+        transports = list(_transports.values())
+        async_transports = list(_async_transports.values())
+    stats = {t.base_url: t.pool_stats() for t in transports}
+    for t in async_transports:
+        stats.setdefault(t.base_url, {})["async"] = t.pool_stats()
+    return stats
@@ -0,0 +1,49 @@
+"""
+任务 ID
+使用 ULID: 48 位毫秒时间戳 + 80 位随机数，Crockford base32 编码为 26 个字符。
+字典序即创建时间顺序；同一毫秒内生成的 ID 随机部分递增，进程内严格单调、不会重复，
+并发任务在同一秒内结束也不会互相覆盖输出文件。
+"""
+import hashlib
+import os
+import threading
+import time
+
+from config import OUTPUT_SHARD_DEPTH
+
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_RANDOM_BITS = 80
+
+_lock = threading.Lock()
+_last_ms = 0
+_last_random = 0
+
+
+def new_job_id():
+    """生成一个新的 ULID"""
+    global _last_ms, _last_random
+    with _lock:
+        ms = int(time.time() * 1000)
+        if ms <= _last_ms:
+            # 同一毫秒 (或系统时钟回拨)：沿用上一个时间戳，随机部分加一
+            ms, random_part = _last_ms, _last_random + 1
+            if random_part >> _RANDOM_BITS:
+                ms, random_part = ms + 1, int.from_bytes(os.urandom(10), "big")
+        else:
+            random_part = int.from_bytes(os.urandom(10), "big")
+        _last_ms, _last_random = ms, random_part
+    value = (ms << _RANDOM_BITS) | random_part
+    return "".join(_ALPHABET[(value >> shift) & 31] for shift in range(125, -1, -5))
+
+
+def shard_dir(root, job_id, depth=None):
+    """按 ID 哈希前缀分片的目录: root/ab/cd (每级 256 个子目录)
+
+    ULID 的前缀是时间戳，直接用它分片会让同一时段的文件集中在一个目录里，所以取哈希前缀。
+    """
+    depth = OUTPUT_SHARD_DEPTH if depth is None else depth
+    digest = hashlib.sha256(job_id.encode("ascii")).hexdigest()
+    path = root
+    for level in range(depth):
+        path = path / digest[level * 2:level * 2 + 2]
+    return path
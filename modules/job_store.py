@@ -0,0 +1,182 @@
+"""
+任务库 (job store)
+每个生成任务从登记到结束的状态持久化到 SQLite (WAL 模式)：请求描述 (job)、返回给界面的配置、状态、
+分配到的端点、后端任务 ID 和输出位置。WebUI 重启 (如发布新版本) 后:
+    queued / running    还没有拿到后端任务 ID：按保存的请求重新执行 (提交带原来的 Idempotency-Key，
+                        支持去重的后端不会重复生成)
+    submitted           后端已在生成：重新连接到该后端任务，等待结束并下载结果，不浪费已经用掉的 GPU 时间
+任何会话都可以按任务 ID 重新连接到任务，等待结束后取回结果 (见 app.py 的"任务查询")。
+
+状态: queued -> running -> submitted -> done / failed / cancelled (关闭页面或点击停止，重启后不再继续)
+最新进度只保存在内存中 (不在每次进度回调时写库)。
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import JOB_STORE_DB, JOB_STORE_RETENTION_DAYS
+
+# 任务结束的状态
+FINISHED = ("done", "failed", "cancelled")
+# SQL 中 FINISHED 的占位符 (状态值作为参数传入)
+_FINISHED_PLACEHOLDERS = ", ".join("?" * len(FINISHED))
+
+# 持久化的请求字段 (其余字段是执行过程中的临时状态)
+_REQUEST_KEYS = (
+    "endpoint", "json", "fields", "files", "timeout", "download_timeout", "output_path", "job_id",
+    "model_type", "cacheable", "coalesce", "switch_desc", "request_desc", "upload_desc",
+    "idempotency_key", "backend_url", "backend_job_id",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id          TEXT PRIMARY KEY,       -- 任务 ID (ULID)
+    module          TEXT NOT NULL,          -- 后端组 (longcat / song / avatar)
+    job_type        TEXT,
+    status          TEXT NOT NULL,          -- queued / running / submitted / done / failed / cancelled
+    request         TEXT NOT NULL,          -- JSON: 请求描述 (可据此重新执行)
+    config          TEXT NOT NULL,          -- JSON: 返回给界面的配置
+    backend_url     TEXT,
+    backend_job_id  TEXT,
+    output_path     TEXT,
+    error           TEXT,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+"""
+
+
+class JobStore:
+    """任务状态的 SQLite 存储 (线程安全，每个线程一个连接)"""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or JOB_STORE_DB)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        # 任务 ID -> (进度, 描述)
+        self._progress = {}
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ==================== 写入 ====================
+
+    def create(self, module, job, config):
+        """登记新任务 (状态 queued)"""
+        now = time.time()
+        request = {key: job[key] for key in _REQUEST_KEYS if key in job}
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, module, job_type, status, request, config, created_at, updated_at)"
+                " VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (
+                    job["job_id"], module, config.get("type"),
+                    json.dumps(request, ensure_ascii=False, default=str),
+                    json.dumps(config, ensure_ascii=False, default=str), now, now,
+                ),
+            )
+
+    def update(self, job_id, status, backend_url=None, backend_job_id=None):
+        """任务进入新状态 (running: 已分配端点；submitted: 后端已接受任务)"""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, backend_url = COALESCE(?, backend_url),"
+                " backend_job_id = COALESCE(?, backend_job_id), updated_at = ? WHERE job_id = ?",
+                (status, backend_url, backend_job_id, time.time(), job_id),
+            )
+
+    def finish(self, job_id, output_path, config):
+        """任务结束：记录输出位置或错误信息 (config["cancelled"] 为真时记为已取消)"""
+        self._progress.pop(job_id, None)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, output_path = ?, error = ?, config = ?, updated_at = ? WHERE job_id = ?",
+                (
+                    "cancelled" if config.get("cancelled") else
+                    "done" if output_path and config.get("success") else "failed",
+                    str(output_path) if output_path else None, config.get("error"),
+                    json.dumps(config, ensure_ascii=False, default=str), time.time(), job_id,
+                ),
+            )
+
+    def track(self, job_id, progress_callback=None):
+        """包装进度回调：记录任务的最新进度 (供重新连接的会话显示) 并转发给原回调"""
+        def report(value, desc=""):
+            self._progress[job_id] = (value, desc)
+            if progress_callback:
+                progress_callback(value, desc)
+        return report
+
+    def prune(self, days=None):
+        """删除结束超过 days 天的任务，返回删除数"""
+        cutoff = time.time() - (JOB_STORE_RETENTION_DAYS if days is None else days) * 86400
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({_FINISHED_PLACEHOLDERS}) AND updated_at < ?",
+                (*FINISHED, cutoff),
+            )
+        return cursor.rowcount
+
+    # ==================== 查询 ====================
+
+    def get(self, job_id):
+        """任务状态 (含内存中的最新进度)；不存在时返回 None"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        item = self._row(row)
+        item["progress"] = self._progress.get(job_id)
+        return item
+
+    def unfinished(self, module):
+        """module 中尚未结束的任务 (按登记顺序)"""
+        rows = self._connect().execute(
+            f"SELECT * FROM jobs WHERE module = ? AND status NOT IN ({_FINISHED_PLACEHOLDERS}) ORDER BY created_at",
+            (module, *FINISHED),
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def recent(self, limit=10):
+        """最近登记的任务 (新的在前)"""
+        rows = self._connect().execute(
+            "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    @staticmethod
+    def _row(row):
+        item = dict(row)
+        for key in ("request", "config"):
+            try:
+                item[key] = json.loads(item[key]) if item[key] else {}
+            except ValueError:
+                item[key] = {}
+        return item
+
+
+# 全局实例
+job_store = None
+
+
+def get_job_store():
+    """获取任务库实例"""
+    global job_store
+    if job_store is None:
+        job_store = JobStore()
+    return job_store
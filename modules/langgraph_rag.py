@@ -16,6 +16,8 @@ from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
 
+from modules.media_server import media_url as get_media_url
+
 # Load Knowledge Base
 def load_kb(kb_path):
     try:
@@ -122,8 +124,9 @@ class LangGraphRAG:
                 abs_path = (project_root / media_url.replace("\\", "/")).resolve()
                 
                 if abs_path.exists():
-                    # 核心修复：Windows 下必须是 /file=E:/path 格式（无额外斜杠，盘符大写）
-                    media_url = f"/file={abs_path.as_posix()}"
+                    # 优先走媒体路由 (/media/static/...?v=<内容哈希>)：支持 Range，浏览器长期缓存，重复回答不再重新下载
+                    # 不在媒体目录内时退回 Gradio 文件路由，Windows 下必须是 /file=E:/path 格式（无额外斜杠，盘符大写）
+                    media_url = get_media_url(abs_path) or f"/file={abs_path.as_posix()}"
                 else:
                     print(f"[Warning] File not found on disk: {abs_path}")
             except Exception as e:
@@ -214,7 +217,7 @@ class LangGraphRAG:
 **绝对禁令**：
 - 严禁自己编造或猜测任何文件路径。
 - 你必须【逐字逐句】使用 search_knowledge_base 工具返回结果中的 `media_url`。
-- 如果工具返回的路径以 '/file=' 开头，你必须完整保留这个前缀，不要修改它。
+- 如果工具返回的路径以 '/media/' 或 '/file=' 开头，你必须完整保留这个路径 (包括 ? 后面的参数)，不要修改它。
 
 **核心原则**：
 1. **优先检索**：对于用户提出的任何关于陕北文化、民歌、习俗、节日、食物、特产、具体名词（如“信天游”、“腰鼓”）或“不知道”、“神秘”等相关的问题，你**必须**首先调用 `search_knowledge_base` 工具进行搜索，**绝对不要**仅凭记忆回答。
@@ -4,36 +4,27 @@ LongCat-Video 模块
 """
 import os
 import json
-import time
-import requests
-from pathlib import Path
+
+from modules.api_base import ApiModuleBase
 
 # API 服务地址
 LONGCAT_API_URL = os.environ.get("LONGCAT_API_URL", "http://localhost:8001")
 
 
-class LongCatVideoModule:
+class LongCatVideoModule(ApiModuleBase):
     """LongCat-Video 功能模块 - HTTP API 版本"""
     
-    def __init__(self, api_url=None):
-        self.api_url = api_url or LONGCAT_API_URL
-        self.output_dir = Path(__file__).parent.parent / "outputs" / "videos"
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+    service_error = "LongCat-Video 服务未启动，请先运行: python LongCat-Video/api_server.py --port 8001"
+    queue_name = "longcat"
     
-    def _check_service(self):
-        """检查服务是否可用"""
-        try:
-            resp = requests.get(f"{self.api_url}/health", timeout=5)
-            return resp.status_code == 200
-        except:
-            return False
+    def __init__(self, api_url=None):
+        super().__init__(api_url or LONGCAT_API_URL, "videos")
     
-    def text_to_video(self, prompt, negative_prompt="", height=480, width=832, 
-                      num_frames=93, num_inference_steps=50, guidance_scale=4.0,
-                      seed=42, use_distill=False, progress_callback=None):
-        """文本生成视频 - 通过 API 调用"""
-        timestamp = int(time.time())
-        local_output_path = self.output_dir / f"t2v_{timestamp}.mp4"
+    def _text_to_video_job(self, prompt, negative_prompt="", height=480, width=832, 
+                           num_frames=93, num_inference_steps=50, guidance_scale=4.0,
+                           seed=42, use_distill=False):
+        """文本生成视频的请求描述"""
+        job_id, local_output_path = self._new_output("t2v", ".mp4")
         
         config = {
             "type": "text_to_video",
@@ -48,62 +39,43 @@ class LongCatVideoModule:
             "use_distill": use_distill,
         }
         
-        if progress_callback:
-            progress_callback(0.1, "检查服务状态...")
-        
-        if not self._check_service():
-            config["error"] = f"LongCat-Video 服务未启动，请先运行: python LongCat-Video/api_server.py --port 8001"
-            return None, config
-        
-        if progress_callback:
-            progress_callback(0.2, "发送生成请求...")
-        
-        try:
-            resp = requests.post(
-                f"{self.api_url}/text_to_video",
-                json=config,
-                timeout=1200  # 20分钟超时
-            )
-            
-            if progress_callback:
-                progress_callback(0.8, "下载生成结果...")
-            
-            result = resp.json()
-            
-            if result.get("success") and result.get("filename"):
-                download_resp = requests.get(
-                    f"{self.api_url}/download/{result['filename']}",
-                    timeout=120
-                )
-                
-                if download_resp.status_code == 200:
-                    with open(local_output_path, 'wb') as f:
-                        f.write(download_resp.content)
-                    
-                    if progress_callback:
-                        progress_callback(1.0, "生成完成!")
-                    
-                    config["success"] = True
-                    config["output_path"] = str(local_output_path)
-                    return str(local_output_path), config
-            
-            config["error"] = result.get("error", "生成失败")
-            return None, config
-            
-        except requests.exceptions.Timeout:
-            config["error"] = "请求超时，生成时间过长"
-            return None, config
-        except Exception as e:
-            config["error"] = str(e)
-            return None, config
+        job = {
+            "endpoint": "/text_to_video",
+            "json": dict(config),
+            "timeout": 1200,  # 20分钟超时
+            "download_timeout": 120,
+            "output_path": local_output_path,
+            "job_id": job_id,
+        }
+        return config, job
     
-    def image_to_video(self, image_path, prompt, negative_prompt="", 
-                       resolution="480p", num_frames=93, num_inference_steps=50,
-                       guidance_scale=4.0, seed=42, use_distill=False,
-                       progress_callback=None):
-        """图片生成视频 - 通过 API 调用"""
-        timestamp = int(time.time())
-        local_output_path = self.output_dir / f"i2v_{timestamp}.mp4"
+    def text_to_video(self, prompt, negative_prompt="", height=480, width=832, num_frames=93,
+                      num_inference_steps=50, guidance_scale=4.0, seed=42, use_distill=False,
+                      progress_callback=None):
+        """文本生成视频 - 通过 API 调用"""
+        config, job = self._text_to_video_job(
+            prompt=prompt, negative_prompt=negative_prompt, height=height, width=width,
+            num_frames=num_frames, num_inference_steps=num_inference_steps, guidance_scale=guidance_scale,
+            seed=seed, use_distill=use_distill
+        )
+        return self._execute(job, config, progress_callback)
+    
+    async def text_to_video_async(self, prompt, negative_prompt="", height=480, width=832, num_frames=93,
+                                  num_inference_steps=50, guidance_scale=4.0, seed=42, use_distill=False,
+                                  progress_callback=None, stream=False):
+        """文本生成视频 - asyncio 版本 (参数同 text_to_video)"""
+        config, job = self._text_to_video_job(
+            prompt=prompt, negative_prompt=negative_prompt, height=height, width=width,
+            num_frames=num_frames, num_inference_steps=num_inference_steps, guidance_scale=guidance_scale,
+            seed=seed, use_distill=use_distill
+        )
+        return await self._execute_async(job, config, progress_callback, stream)
+    
+    def _image_to_video_job(self, image_path, prompt, negative_prompt="", 
+                            resolution="480p", num_frames=93, num_inference_steps=50,
+                            guidance_scale=4.0, seed=42, use_distill=False):
+        """图片生成视频的请求描述"""
+        job_id, local_output_path = self._new_output("i2v", ".mp4")
         
         config = {
             "type": "image_to_video",
@@ -117,68 +89,51 @@ class LongCatVideoModule:
             "use_distill": use_distill,
         }
         
-        if progress_callback:
-            progress_callback(0.1, "检查服务状态...")
-        
-        if not self._check_service():
-            config["error"] = f"LongCat-Video 服务未启动，请先运行: python LongCat-Video/api_server.py --port 8001"
-            return None, config
-        
-        if progress_callback:
-            progress_callback(0.2, "上传图片并发送请求...")
+        data = {
+            'prompt': prompt,
+            'negative_prompt': negative_prompt,
+            'resolution': resolution,
+            'num_frames': num_frames,
+            'num_inference_steps': num_inference_steps,
+            'guidance_scale': guidance_scale,
+            'seed': seed,
+            'use_distill': str(use_distill).lower(),
+        }
         
-        try:
-            with open(image_path, 'rb') as f:
-                files = {'image': f}
-                data = {
-                    'prompt': prompt,
-                    'negative_prompt': negative_prompt,
-                    'resolution': resolution,
-                    'num_frames': num_frames,
-                    'num_inference_steps': num_inference_steps,
-                    'guidance_scale': guidance_scale,
-                    'seed': seed,
-                    'use_distill': str(use_distill).lower(),
-                }
-                
-                resp = requests.post(
-                    f"{self.api_url}/image_to_video",
-                    files=files,
-                    data=data,
-                    timeout=1200
-                )
-            
-            if progress_callback:
-                progress_callback(0.8, "下载生成结果...")
-            
-            result = resp.json()
-            
-            if result.get("success") and result.get("filename"):
-                download_resp = requests.get(
-                    f"{self.api_url}/download/{result['filename']}",
-                    timeout=120
-                )
-                
-                if download_resp.status_code == 200:
-                    with open(local_output_path, 'wb') as f:
-                        f.write(download_resp.content)
-                    
-                    if progress_callback:
-                        progress_callback(1.0, "生成完成!")
-                    
-                    config["success"] = True
-                    config["output_path"] = str(local_output_path)
-                    return str(local_output_path), config
-            
-            config["error"] = result.get("error", "生成失败")
-            return None, config
-            
-        except requests.exceptions.Timeout:
-            config["error"] = "请求超时，生成时间过长"
-            return None, config
-        except Exception as e:
-            config["error"] = str(e)
-            return None, config
+        job = {
+            "endpoint": "/image_to_video",
+            "fields": data,
+            "files": {'image': image_path},
+            "timeout": 1200,
+            "download_timeout": 120,
+            "output_path": local_output_path,
+            "job_id": job_id,
+            "request_desc": "上传图片并发送请求...",
+            "upload_desc": "上传图片",
+        }
+        return config, job
+    
+    def image_to_video(self, image_path, prompt, negative_prompt="", resolution="480p", num_frames=93,
+                       num_inference_steps=50, guidance_scale=4.0, seed=42, use_distill=False,
+                       progress_callback=None):
+        """图片生成视频 - 通过 API 调用"""
+        config, job = self._image_to_video_job(
+            image_path=image_path, prompt=prompt, negative_prompt=negative_prompt, resolution=resolution,
+            num_frames=num_frames, num_inference_steps=num_inference_steps, guidance_scale=guidance_scale,
+            seed=seed, use_distill=use_distill
+        )
+        return self._execute(job, config, progress_callback)
+    
+    async def image_to_video_async(self, image_path, prompt, negative_prompt="", resolution="480p",
+                                   num_frames=93, num_inference_steps=50, guidance_scale=4.0, seed=42,
+                                   use_distill=False, progress_callback=None, stream=False):
+        """图片生成视频 - asyncio 版本 (参数同 image_to_video)"""
+        config, job = self._image_to_video_job(
+            image_path=image_path, prompt=prompt, negative_prompt=negative_prompt, resolution=resolution,
+            num_frames=num_frames, num_inference_steps=num_inference_steps, guidance_scale=guidance_scale,
+            seed=seed, use_distill=use_distill
+        )
+        return await self._execute_async(job, config, progress_callback, stream)
     
     def audio_to_video_single(self, audio_path, image_path=None, prompt="",
                               resolution="480p", num_frames=93, 
@@ -0,0 +1,56 @@
+"""
+结果展示组件
+Gradio 4.x 的 Video / Audio 组件收到 http(s) 地址时会先由 WebUI 服务器把整个文件下载到自己的缓存，
+再以 /file= 地址提供第二份副本 (move_resource_to_block_cache)：边下边看要等下载结束才开始播放，
+媒体路由的 ETag / Range / 长缓存也到不了浏览器。
+
+ResultVideo / ResultAudio 把 http(s) 地址放进 FileData.url 原样交给浏览器 (Gradio 对带 url 的输出不再下载)，
+本地文件路径仍按原组件处理。地址只由 public_url() 按配置的 PUBLIC_BASE_URL 拼接，不来自请求头。
+"""
+from pathlib import PurePosixPath
+from urllib.parse import unquote, urlsplit
+
+import gradio as gr
+from gradio.components.video import VideoData
+from gradio.data_classes import FileData
+
+from config import PUBLIC_BASE_URL
+
+
+def public_url(path):
+    """WebUI 路由 (如 /media/...、/stream/...) 的绝对地址；未配置 PUBLIC_BASE_URL 时返回 None"""
+    if path is None or not PUBLIC_BASE_URL:
+        return None
+    return f"{PUBLIC_BASE_URL}{path}"
+
+
+def _is_url(value):
+    return isinstance(value, str) and value.startswith(("http://", "https://"))
+
+
+def _file_data(url):
+    name = PurePosixPath(unquote(urlsplit(url).path)).name
+    return FileData(path=url, url=url, orig_name=name or None)
+
+
+class ResultVideo(gr.Video):
+    """结果视频：地址直接交给浏览器播放"""
+
+    # 模板组件：前端沿用 Video 的实现
+    is_template = True
+
+    def postprocess(self, value):
+        if _is_url(value):
+            return VideoData(video=_file_data(value), subtitles=None)
+        return super().postprocess(value)
+
+
+class ResultAudio(gr.Audio):
+    """结果音频：地址直接交给浏览器播放"""
+
+    is_template = True
+
+    def postprocess(self, value):
+        if _is_url(value):
+            return _file_data(value)
+        return super().postprocess(value)
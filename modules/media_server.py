@@ -0,0 +1,201 @@
+"""
+媒体文件路由
+GET / HEAD {MEDIA_ROUTE}/<根名>/<相对路径>，为生成结果和知识库媒体 (static/) 提供:
+    强 ETag (内容 sha256)，If-None-Match 命中时返回 304
+    Cache-Control: 一次写入的输出目录 (任务 ID / 缓存键命名，内容不会变) 和带 ?v=<内容哈希> 的地址
+                   为 immutable 长缓存，其余地址每次用 ETag 验证
+    Range / If-Range，拖动进度条只请求需要的片段
+    零拷贝发送: ASGI 服务器支持 http.response.zerocopysend (sendfile) 或 http.response.pathsend 时交给服务器发送，
+               否则在线程中分块读取
+    已转入冷存储的文件在第一次请求时取回
+
+实现为纯 ASGI 应用，不依赖 starlette；只有注册路由 (register_media_routes) 时才用到 gradio 自带的 starlette。
+"""
+import asyncio
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from pathlib import Path
+from urllib.parse import parse_qs, quote
+
+from config import (
+    DOWNLOAD_CHUNK_SIZE, MEDIA_ROUTE, MEDIA_ROOTS, MEDIA_IMMUTABLE_ROOTS, MEDIA_EXTENSIONS, MEDIA_MAX_AGE,
+)
+from modules.cold_storage import get_cold_storage
+from modules.file_utils import file_digest
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+# 带版本号的地址中使用的内容哈希前缀长度
+VERSION_LENGTH = 16
+
+
+def parse_range(header, size):
+    """解析单个 Range 请求头，返回 (start, end) (含 end)
+
+    没有 Range 或格式不支持 (多段范围) 时返回 None，范围无法满足时抛出 ValueError。
+    """
+    match = _RANGE_RE.fullmatch((header or "").strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # 后缀范围: 最后 N 个字节
+        if int(last) == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def read_file_range(path, start, end, chunk_size=None):
+    """逐块产出文件 [start, end] 范围的内容"""
+    chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            data = f.read(min(remaining, chunk_size))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def _roots():
+    return {name: Path(path).resolve() for name, path in MEDIA_ROOTS.items()}
+
+
+def media_url(path, versioned=None):
+    """本地文件的媒体地址；不在 MEDIA_ROOTS 内时返回 None
+
+    versioned 为 None 时，只给内容可能变化的目录 (如 static/) 加 ?v=<内容哈希>，使其也能 immutable 缓存。
+    """
+    path = Path(path).resolve()
+    for name, root in _roots().items():
+        if root == path or root not in path.parents:
+            continue
+        url = f"{MEDIA_ROUTE}/{name}/{quote(path.relative_to(root).as_posix())}"
+        if versioned or (versioned is None and name not in MEDIA_IMMUTABLE_ROOTS):
+            url += f"?v={file_digest(path)[:VERSION_LENGTH]}"
+        return url
+    return None
+
+
+class MediaApp:
+    """媒体文件的 ASGI 应用 (挂在带 {path:path} 参数的路由上)"""
+
+    def __init__(self):
+        self.roots = _roots()
+
+    def resolve(self, relative):
+        """把 <根名>/<相对路径> 解析为允许访问的文件，返回 (根名, 路径)；不允许时返回 (None, None)"""
+        name, _, rest = relative.partition("/")
+        root = self.roots.get(name)
+        if root is None or not rest:
+            return None, None
+        path = (root / rest).resolve()
+        # 防止 .. 越出根目录；隐藏文件 (写入中的临时文件等) 和非媒体文件 (缓存元数据、冷存储存根等) 不提供
+        if root not in path.parents or path.name.startswith(".") or path.suffix.lower() not in MEDIA_EXTENSIONS:
+            return None, None
+        return name, path
+
+    async def __call__(self, scope, receive, send):
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        name, path = self.resolve(scope["path_params"]["path"])
+        # 已转入冷存储的文件先取回 (见 cold_storage.py)
+        if path is None or not await asyncio.to_thread(get_cold_storage().ensure_local, path):
+            await _send_empty(send, 404)
+            return
+        try:
+            size = path.stat().st_size
+            mtime = path.stat().st_mtime
+            digest = await asyncio.to_thread(file_digest, path)
+        except OSError:
+            await _send_empty(send, 404)
+            return
+
+        etag = f'"{digest}"'
+        version = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("v", [None])[0]
+        if name in MEDIA_IMMUTABLE_ROOTS or (version and digest.startswith(version)):
+            cache_control = f"public, max-age={MEDIA_MAX_AGE}, immutable"
+        else:
+            cache_control = "no-cache"
+        response_headers = [
+            (b"etag", etag.encode("latin-1")),
+            (b"cache-control", cache_control.encode("latin-1")),
+            (b"last-modified", formatdate(mtime, usegmt=True).encode("latin-1")),
+            (b"accept-ranges", b"bytes"),
+        ]
+
+        if etag in [tag.strip() for tag in headers.get("if-none-match", "").split(",")] or \
+                headers.get("if-none-match", "").strip() == "*":
+            await _send_empty(send, 304, response_headers)
+            return
+
+        # If-Range 与当前版本不一致时忽略 Range，返回完整内容
+        range_header = headers.get("range")
+        if headers.get("if-range") and headers["if-range"].strip() != etag:
+            range_header = None
+        try:
+            requested = parse_range(range_header, size)
+        except ValueError:
+            await _send_empty(send, 416, [(b"content-range", f"bytes */{size}".encode("latin-1"))])
+            return
+        start, end = requested or (0, size - 1)
+        length = end - start + 1
+
+        content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        response_headers += [
+            (b"content-type", content_type.encode("latin-1")),
+            (b"content-length", str(length).encode("latin-1")),
+        ]
+        if requested:
+            response_headers.append((b"content-range", f"bytes {start}-{end}/{size}".encode("latin-1")))
+        await send({"type": "http.response.start", "status": 206 if requested else 200,
+                    "headers": response_headers})
+        if scope.get("method") == "HEAD" or length <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await _send_file(scope, send, path, start, length, whole=requested is None)
+
+
+async def _send_empty(send, status, headers=()):
+    await send({"type": "http.response.start", "status": status,
+                "headers": list(headers) + [(b"content-length", b"0")]})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _send_file(scope, send, path, start, length, whole):
+    """发送文件内容：优先使用服务器的零拷贝扩展"""
+    extensions = scope.get("extensions") or {}
+    if "http.response.zerocopysend" in extensions:
+        with open(path, "rb") as f:
+            await send({"type": "http.response.zerocopysend", "file": f, "offset": start, "count": length})
+        return
+    if whole and "http.response.pathsend" in extensions:
+        await send({"type": "http.response.pathsend", "path": os.fspath(path)})
+        return
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = await asyncio.to_thread(f.read, min(remaining, DOWNLOAD_CHUNK_SIZE))
+            if not data:
+                break
+            remaining -= len(data)
+            await send({"type": "http.response.body", "body": data, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b""})
+
+
+def register_media_routes(server_app):
+    """在 Gradio 的 FastAPI 应用上注册 {MEDIA_ROUTE}/<根名>/<相对路径> (插在最前面)"""
+    from starlette.routing import Route
+
+    route = Route(f"{MEDIA_ROUTE}/{{path:path}}", endpoint=MediaApp(), methods=["GET", "HEAD"])
+    server_app.router.routes.insert(0, route)
@@ -0,0 +1,191 @@
+"""
+流式 multipart/form-data 编码器
+上传参考图片 / 音频时按固定大小分块读取文件，不在内存中拼接整个请求体
+"""
+import asyncio
+import mimetypes
+import os
+import uuid
+
+from config import UPLOAD_CHUNK_SIZE
+
+
+def _quote(value):
+    """multipart 头部参数转义 (与 HTML5 表单一致)"""
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class MultipartEncoder:
+    """流式 multipart 请求体
+
+    Content-Length 在构造时即可确定，requests / httpx 会据此发送定长请求体并逐块迭代本对象
+    (同步迭代或 async for 均可)。
+    文件只在迭代到对应分段时才打开，迭代结束、中途异常或 close() 时都会释放句柄。
+
+    Args:
+        fields: 普通表单字段 {name: value}，值为 None 的字段会被跳过
+        files: 文件字段 {name: path}，值为 None 的字段会被跳过
+        chunk_size: 每次读取文件的字节数
+        progress_callback: 上传进度回调 (sent_bytes, total_bytes)
+    """
+
+    def __init__(self, fields=None, files=None, chunk_size=None, progress_callback=None):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+        self.progress_callback = progress_callback
+        self._iterators = []
+        self._aiterators = []
+
+        # 分段列表: bytes 或 (path, size)
+        self._parts = []
+        for name, value in (fields or {}).items():
+            if value is None:
+                continue
+            self._parts.append(
+                self._part_header(name) + str(value).encode("utf-8") + b"\r\n"
+            )
+        for name, path in (files or {}).items():
+            if path is None:
+                continue
+            filename = os.path.basename(str(path))
+            mime = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            self._parts.append(self._part_header(name, filename, mime))
+            self._parts.append((str(path), os.path.getsize(path)))
+            self._parts.append(b"\r\n")
+        self._parts.append(f"--{self.boundary}--\r\n".encode("utf-8"))
+
+        self.len = sum(len(p) if isinstance(p, bytes) else p[1] for p in self._parts)
+
+    def _part_header(self, name, filename=None, mime=None):
+        disposition = f'form-data; name="{_quote(name)}"'
+        if filename is not None:
+            disposition += f'; filename="{_quote(filename)}"'
+        header = f"--{self.boundary}\r\nContent-Disposition: {disposition}\r\n"
+        if mime:
+            header += f"Content-Type: {mime}\r\n"
+        return (header + "\r\n").encode("utf-8")
+
+    @property
+    def headers(self):
+        """请求头 (Content-Type 带 boundary，Content-Length 为定长)"""
+        return {"Content-Type": self.content_type, "Content-Length": str(self.len)}
+
+    def __len__(self):
+        return self.len
+
+    def _report(self, sent):
+        if self.progress_callback:
+            self.progress_callback(sent, self.len)
+
+    def _generate(self):
+        sent = 0
+        self._report(sent)
+        for part in self._parts:
+            if isinstance(part, bytes):
+                sent += len(part)
+                yield part
+                continue
+            with open(part[0], "rb") as f:
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    sent += len(chunk)
+                    self._report(sent)
+                    yield chunk
+        self._report(sent)
+
+    def __iter__(self):
+        # 每次迭代都从头生成，连接失败重发时可以重新读取
+        iterator = self._generate()
+        self._iterators.append(iterator)
+        return iterator
+
+    async def _agenerate(self):
+        # 文件读取放到线程中，避免阻塞事件循环
+        sent = 0
+        self._report(sent)
+        for part in self._parts:
+            if isinstance(part, bytes):
+                sent += len(part)
+                yield part
+                continue
+            f = await asyncio.to_thread(open, part[0], "rb")
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(f.read, self.chunk_size)
+                    if not chunk:
+                        break
+                    sent += len(chunk)
+                    self._report(sent)
+                    yield chunk
+            finally:
+                f.close()
+        self._report(sent)
+
+    def __aiter__(self):
+        iterator = self._agenerate()
+        self._aiterators.append(iterator)
+        return iterator
+
+    def close(self):
+        """关闭仍在迭代中的生成器，释放其打开的文件句柄"""
+        for iterator in self._iterators:
+            iterator.close()
+        self._iterators = []
+
+    async def aclose(self):
+        """asyncio 版本的 close()"""
+        self.close()
+        for iterator in self._aiterators:
+            await iterator.aclose()
+        self._aiterators = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+
+class FileStream(MultipartEncoder):
+    """流式上传单个文件的原始内容 (不做 multipart 编码)，用于 PUT /blobs/<sha256>
+
+    与 MultipartEncoder 一样支持同步迭代 / async for、进度回调和 with 语句释放句柄。
+    """
+
+    def __init__(self, path, chunk_size=None, progress_callback=None):
+        self.content_type = mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+        self.chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+        self.progress_callback = progress_callback
+        self._iterators = []
+        self._aiterators = []
+        self._parts = [(str(path), os.path.getsize(path))]
+        self.len = self._parts[0][1]
+
+
+def scaled_progress(progress_callback, start, end, desc="上传文件"):
+    """把上传字节进度映射到 progress_callback 的 [start, end] 区间
+
+    只在百分比变化时回调，避免大文件上传时刷屏。
+    """
+    if not progress_callback:
+        return None
+    last = {"percent": -1}
+
+    def report(sent, total):
+        percent = int(sent * 100 / total) if total else 100
+        if percent == last["percent"]:
+            return
+        last["percent"] = percent
+        progress_callback(start + (end - start) * percent / 100,
+                          f"{desc} {sent / 1048576:.1f}/{total / 1048576:.1f} MB")
+
+    return report
@@ -8,6 +8,7 @@ import requests
 import gradio as gr
 from ai_assistant_ui import get_ai_assistant_html, get_ai_assistant_js
 from modules.langgraph_rag import LangGraphRAG
+from config import RAG_CONCURRENCY
 
 # Singleton instance
 rag_assistant = LangGraphRAG()
@@ -31,10 +32,13 @@ def create_rag_interface():
     ai_hidden_output = gr.Textbox(visible=True, elem_id="ai-hidden-output", elem_classes=["force-hide"])
     ai_hidden_btn = gr.Button(visible=True, elem_id="ai-hidden-btn", elem_classes=["force-hide"])
 
+    # 独立并发组：对话很轻量，不与视频 / 歌曲 / 数字人生成共用并发名额
     ai_hidden_btn.click(
         fn=get_rag_response,
         inputs=[ai_hidden_input],
-        outputs=[ai_hidden_output]
+        outputs=[ai_hidden_output],
+        concurrency_id="rag",
+        concurrency_limit=RAG_CONCURRENCY
     )
 
 def get_rag_js_logic():
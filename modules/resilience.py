@@ -0,0 +1,165 @@
+"""
+熔断与重试
+每个后端端点一个熔断器 (closed / open / half-open)：连续失败达到阈值后熔断，
+熔断期间不再向该端点分配任务；冷却结束后放行一个试探任务，成功则恢复，失败则继续熔断。
+提交和下载阶段的重试使用带随机抖动的指数退避，避免所有客户端在同一时刻重试。
+"""
+import asyncio
+import random
+import threading
+import time
+
+from config import BREAKER_FAILURE_THRESHOLD, BREAKER_RECOVERY_TIMEOUT
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class BackendUnavailableError(Exception):
+    """后端返回 502 / 503 / 504 (过载或网关故障)，请求没有被处理"""
+
+    def __init__(self, status_code):
+        super().__init__(f"后端暂时不可用 (HTTP {status_code})")
+        self.status_code = status_code
+
+
+def backoff_delay(attempt, base, cap):
+    """第 attempt 次重试 (从 1 开始) 前的等待：指数增长，上限 cap，全抖动 (0 ~ 上限均匀分布)"""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """单个后端端点的熔断器 (线程安全)"""
+
+    def __init__(self, name, failure_threshold=None, recovery_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or BREAKER_FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or BREAKER_RECOVERY_TIMEOUT
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe = None        # 当前 half-open 试探任务的凭证 (None 表示没有试探任务在执行)
+        self._last_error = None
+        self._lock = threading.Lock()
+
+    def _current_state(self):
+        # open 状态冷却结束后视为 half-open (调用方需持有锁)
+        if self._state == OPEN and time.time() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._probe = None
+        return self._state
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def can_attempt(self):
+        """当前是否允许分配任务 (不占用 half-open 的试探名额)"""
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and self._probe is None)
+
+    def attempt(self):
+        """分配任务前调用：不允许时返回 None；正常状态返回 True；
+        half-open 状态下同一时间只放行一个试探任务，返回它的凭证 (任务结束时交给 release_probe())
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probe is None:
+                self._probe = object()
+                return self._probe
+            return None
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._opened_at = None
+            self._probe = None
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._failures += 1
+            self._last_error = str(error) if error is not None else None
+            state = self._current_state()
+            # 已经熔断时 (熔断前发出的任务陆续失败) 不延长冷却时间
+            if state == HALF_OPEN or (state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.time()
+                self._probe = None
+
+    def release_probe(self, token):
+        """试探任务结束但无法判断后端是否正常 (如生成超时、被取消)：归还 half-open 的试探名额
+
+        token 为 attempt() 返回的凭证；熔断前发出的普通任务或上一轮的试探任务不会释放当前试探名额。
+        """
+        with self._lock:
+            if token is not None and token is self._probe:
+                self._probe = None
+
+    def retry_in(self):
+        """熔断中时距离放行试探任务的秒数，否则为 0"""
+        with self._lock:
+            if self._current_state() != OPEN:
+                return 0
+            return max(0.0, self._opened_at + self.recovery_timeout - time.time())
+
+    def snapshot(self):
+        """熔断器状态 (用于健康信息展示)"""
+        retry_in = self.retry_in()
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "failures": self._failures,
+                "retry_in": round(retry_in, 1),
+                "last_error": self._last_error,
+            }
+
+
+def retry_call(func, attempts, should_retry, base, cap):
+    """调用 func()，抛出 should_retry(e) 为真的异常时按抖动退避重试，最多 attempts 次"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return func()
+        except Exception as e:
+            if attempt >= attempts or not should_retry(e):
+                raise
+        time.sleep(backoff_delay(attempt, base, cap))
+
+
+async def retry_call_async(func, attempts, should_retry, base, cap):
+    """retry_call 的 asyncio 版本，func 返回协程"""
+    for attempt in range(1, attempts + 1):
+        try:
+            return await func()
+        except Exception as e:
+            if attempt >= attempts or not should_retry(e):
+                raise
+        await asyncio.sleep(backoff_delay(attempt, base, cap))
+
+
+# 全局实例 - 每个后端地址一个熔断器
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(base_url):
+    """获取 (或创建) 指定后端地址的熔断器"""
+    key = base_url.rstrip("/")
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(key)
+            _breakers[key] = breaker
+        return breaker
+
+
+def get_breaker_snapshots():
+    """所有后端熔断器的状态"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
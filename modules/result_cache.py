@@ -0,0 +1,129 @@
+"""
+生成结果缓存
+以 "规范化的请求参数 + 上传文件内容哈希" 的 sha256 为键保存生成结果，
+参数完全相同的重复生成 (例如固定种子 42、同一提示词) 直接返回已有文件，不再占用 GPU。
+
+目录结构 (RESULT_CACHE_DIR):
+    ab/abcdef....mp4     结果文件
+    ab/abcdef....json    元数据: 生成配置、创建时间、命中次数
+"""
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+
+from config import RESULT_CACHE_ENABLED, RESULT_CACHE_DIR
+from modules.cold_storage import get_cold_storage
+from modules.dedup import get_dedup_index
+from modules.file_utils import atomic_write, file_digest
+
+# 缓存键格式版本，键的构成变化时递增，使旧缓存自然失效
+CACHE_KEY_VERSION = 1
+
+
+def canonicalize(value):
+    """把请求参数转换为与书写方式无关的规范形式
+
+    字典键排序由 json.dumps 完成；整数值的浮点数 (4.0) 与整数 (4) 视为相同；
+    值为 None 的字段不会发送给后端，也不参与哈希。
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): canonicalize(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(v) for v in value]
+    return str(value)
+
+
+class ResultCache:
+    """内容寻址的生成结果缓存 (线程安全)"""
+
+    def __init__(self, root=None, enabled=None):
+        self.root = Path(root or RESULT_CACHE_DIR)
+        self.enabled = RESULT_CACHE_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+
+    def accepts(self, job):
+        """job 的结果是否写入 / 读取缓存"""
+        return self.enabled and job.get("cacheable", True)
+
+    def request_key(self, job):
+        """规范化请求哈希：参数和输入文件内容完全相同的请求得到相同的值；随机种子返回 None"""
+        params = job.get("json") if job.get("json") is not None else job.get("fields") or {}
+        seed = params.get("seed")
+        if isinstance(seed, (int, float)) and seed < 0:
+            return None  # 负数种子表示随机，结果不可复现
+
+        files = {}
+        for name, path in (job.get("files") or {}).items():
+            if path is not None:
+                files[name] = file_digest(path)
+
+        payload = {
+            "v": CACHE_KEY_VERSION,
+            "endpoint": job["endpoint"],
+            "model_type": job.get("model_type"),
+            "params": canonicalize(params),
+            "files": files,
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _paths(self, key, suffix):
+        shard = self.root / key[:2]
+        return shard / f"{key}{suffix}", shard / f"{key}.json"
+
+    def lookup(self, key, suffix):
+        """查找缓存结果，命中时返回文件路径并记录命中次数"""
+        if key is None:
+            return None
+        path, meta_path = self._paths(key, suffix)
+        # 已转入冷存储的结果在这里取回
+        if not get_cold_storage().ensure_local(path):
+            return None
+        try:
+            with self._lock:
+                meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                meta["hits"] = meta.get("hits", 0) + 1
+                meta["last_hit"] = time.time()
+                with atomic_write(meta_path) as f:
+                    f.write(json.dumps(meta, ensure_ascii=False, indent=2).encode("utf-8"))
+        except (OSError, ValueError):
+            pass  # 元数据损坏不影响结果文件
+        return path
+
+    def store(self, key, output_path, config):
+        """把新生成的结果放进缓存 (原子写入，优先与输出文件共享数据，见 dedup.py)，返回缓存文件路径"""
+        if key is None:
+            return None
+        output_path = Path(output_path)
+        path, meta_path = self._paths(key, output_path.suffix)
+        get_dedup_index().link_copy(output_path, path)
+        meta = {
+            "key": key,
+            "config": config,
+            "created_at": time.time(),
+            "size": path.stat().st_size,
+            "hits": 0,
+        }
+        with self._lock, atomic_write(meta_path) as f:
+            f.write(json.dumps(meta, ensure_ascii=False, indent=2, default=str).encode("utf-8"))
+        return path
+
+
+# 全局实例
+result_cache = None
+
+
+def get_result_cache():
+    """获取结果缓存实例"""
+    global result_cache
+    if result_cache is None:
+        result_cache = ResultCache()
+    return result_cache
@@ -0,0 +1,157 @@
+"""
+相同请求合并 (singleflight)
+参数完全相同 (同一缓存键) 的生成请求正在执行时，后来的请求不再提交到后端，
+而是挂到进行中的任务上：收到同样的进度更新，任务结束时得到同一个输出文件。
+同步路径 (线程) 和 asyncio 路径的请求可以互相合并。
+"""
+import asyncio
+import threading
+
+
+class Flight:
+    """一个进行中的生成任务及其等待者"""
+
+    def __init__(self, key):
+        self.key = key
+        self.result = None       # (output_path, config)
+        self.followers = 0
+        self.waiting = 0         # 仍在等待结果的等待者数 (已取消的不计)
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._last_progress = None
+        self._waiters = []       # asyncio 等待者: (事件循环, Future)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    # ==================== 进度转发 ====================
+
+    def subscribe(self, progress_callback):
+        """订阅进度，立即补发最近一次进度"""
+        if not progress_callback:
+            return
+        with self._lock:
+            self._listeners.append(progress_callback)
+            last = self._last_progress
+        if last is not None:
+            self._call(progress_callback, *last)
+
+    def unsubscribe(self, progress_callback):
+        with self._lock:
+            if progress_callback in self._listeners:
+                self._listeners.remove(progress_callback)
+
+    def depart(self, progress_callback):
+        """等待者结束等待 (拿到结果或被取消)"""
+        self.unsubscribe(progress_callback)
+        with self._lock:
+            self.waiting -= 1
+
+    def report(self, value, desc=""):
+        """执行者的进度回调：转发给所有订阅者"""
+        with self._lock:
+            self._last_progress = (value, desc)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            self._call(listener, value, desc)
+
+    @staticmethod
+    def _call(listener, value, desc):
+        try:
+            listener(value, desc)
+        except Exception:
+            pass  # 某个订阅者的界面已关闭，不影响其他人
+
+    # ==================== 结果 ====================
+
+    def resolve(self, output_path, config):
+        """任务结束 (成功或失败)，唤醒所有等待者"""
+        with self._lock:
+            if self._done.is_set():
+                return
+            self.result = (output_path, config)
+            self._done.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_set_future, future)
+
+    def wait(self):
+        self._done.wait()
+        return self.result
+
+    async def wait_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if not self._done.is_set():
+                self._waiters.append((loop, future))
+            else:
+                future.set_result(None)
+        await future
+        return self.result
+
+
+def _set_future(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """进行中任务表: 缓存键 -> Flight (线程安全)"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def join(self, key, progress_callback=None):
+        """加入 key 对应的任务，返回 (flight, 是否为执行者)
+
+        key 为 None (不可合并的请求) 时返回 (None, True)。执行者必须在结束时调用 leave()。
+        """
+        if key is None:
+            return None, True
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = Flight(key)
+                self._flights[key] = flight
+            else:
+                flight.followers += 1
+                flight.waiting += 1
+        flight.subscribe(progress_callback)
+        return flight, leader
+
+    def leave(self, flight, idempotency_key=None, backend_url=None, backend_job_id=None):
+        """执行者结束：移出任务表
+
+        执行者没有正常 resolve (被取消 / 异常退出) 时以 interrupted 结束，等待者会重新加入并接手执行：
+        执行者已把任务提交到后端 (backend_url / backend_job_id) 时接手者直接等待该后端任务，不重新提交；
+        否则沿用 idempotency_key 提交 (后端支持提交去重时，仍在执行的任务不会重新生成)。
+        """
+        if flight is None:
+            return
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+        flight.resolve(None, {"success": False, "interrupted": True, "error": "相同的生成任务已中断",
+                              "idempotency_key": idempotency_key,
+                              "backend_url": backend_url, "backend_job_id": backend_job_id})
+
+    def stats(self):
+        with self._lock:
+            return {key: flight.followers for key, flight in self._flights.items()}
+
+
+# 全局实例
+singleflight = None
+
+
+def get_singleflight():
+    """获取全局的进行中任务表"""
+    global singleflight
+    if singleflight is None:
+        singleflight = SingleFlight()
+    return singleflight
@@ -4,9 +4,8 @@ SongGeneration 模块
 """
 import os
 import json
-import time
-import requests
-from pathlib import Path
+
+from modules.api_base import ApiModuleBase
 
 # API 服务地址
 SONG_API_URL = os.environ.get("SONG_API_URL", "http://localhost:8002")
@@ -22,32 +21,22 @@ AUTO_PROMPT_TYPES = [
 GENERATION_TYPES = ['mixed', 'vocal', 'bgm', 'separate']
 
 
-class SongGenerationModule:
+class SongGenerationModule(ApiModuleBase):
     """SongGeneration 功能模块 - HTTP API 版本"""
     
-    def __init__(self, api_url=None):
-        self.api_url = api_url or SONG_API_URL
-        self.output_dir = Path(__file__).parent.parent / "outputs" / "songs"
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+    service_error = "SongGeneration 服务未启动，请先运行: python SongGeneration/api_server.py --port 8002"
+    queue_name = "song"
     
-    def _check_service(self):
-        """检查服务是否可用"""
-        try:
-            resp = requests.get(f"{self.api_url}/health", timeout=5)
-            return resp.status_code == 200
-        except:
-            return False
+    def __init__(self, api_url=None):
+        super().__init__(api_url or SONG_API_URL, "songs")
     
-    def generate_song(self, lyrics, description=None, prompt_audio_path=None,
-                      auto_prompt_type=None, gen_type="mixed",
-                      model_name=None, max_duration=160,
-                      cfg_coef=1.5, temperature=0.9, top_k=50, top_p=0.0,
-                      low_mem=False, progress_callback=None):
-        """
-        生成歌曲 - 通过 API 调用
-        """
-        timestamp = int(time.time())
-        local_output_path = self.output_dir / f"song_{timestamp}.wav"
+    def _generate_song_job(self, lyrics, description=None, prompt_audio_path=None,
+                           auto_prompt_type=None, gen_type="mixed",
+                           model_name=None, max_duration=160,
+                           cfg_coef=1.5, temperature=0.9, top_k=50, top_p=0.0,
+                           low_mem=False):
+        """生成歌曲的请求描述"""
+        job_id, local_output_path = self._new_output("song", ".wav")
         
         config = {
             "type": "song_generation",
@@ -62,67 +51,52 @@ class SongGenerationModule:
             "top_p": top_p,
         }
         
-        if progress_callback:
-            progress_callback(0.1, "检查服务状态...")
-        
-        # 检查服务
-        if not self._check_service():
-            config["error"] = f"SongGeneration 服务未启动，请先运行: python SongGeneration/api_server.py --port 8002"
-            return None, config
-        
-        if progress_callback:
-            progress_callback(0.2, "发送生成请求...")
-        
-        try:
-            # 发送请求
-            resp = requests.post(
-                f"{self.api_url}/generate",
-                json={
-                    "lyrics": lyrics,
-                    "description": description,
-                    "auto_prompt_type": auto_prompt_type,
-                    "gen_type": gen_type,
-                    "max_duration": max_duration,
-                    "cfg_coef": cfg_coef,
-                    "temperature": temperature,
-                    "top_k": top_k,
-                    "top_p": top_p,
-                },
-                timeout=600  # 10分钟超时
-            )
-            
-            if progress_callback:
-                progress_callback(0.8, "下载生成结果...")
-            
-            result = resp.json()
-            
-            if result.get("success") and result.get("filename"):
-                # 下载文件
-                download_resp = requests.get(
-                    f"{self.api_url}/download/{result['filename']}",
-                    timeout=60
-                )
-                
-                if download_resp.status_code == 200:
-                    with open(local_output_path, 'wb') as f:
-                        f.write(download_resp.content)
-                    
-                    if progress_callback:
-                        progress_callback(1.0, "生成完成!")
-                    
-                    config["success"] = True
-                    config["output_path"] = str(local_output_path)
-                    return str(local_output_path), config
-            
-            config["error"] = result.get("error", "生成失败")
-            return None, config
-            
-        except requests.exceptions.Timeout:
-            config["error"] = "请求超时，生成时间过长"
-            return None, config
-        except Exception as e:
-            config["error"] = str(e)
-            return None, config
+        job = {
+            "endpoint": "/generate",
+            "json": {
+                "lyrics": lyrics,
+                "description": description,
+                "auto_prompt_type": auto_prompt_type,
+                "gen_type": gen_type,
+                "max_duration": max_duration,
+                "cfg_coef": cfg_coef,
+                "temperature": temperature,
+                "top_k": top_k,
+                "top_p": top_p,
+            },
+            "timeout": 600,  # 10分钟超时
+            "download_timeout": 60,
+            "output_path": local_output_path,
+            "job_id": job_id,
+        }
+        return config, job
+    
+    def generate_song(self, lyrics, description=None, prompt_audio_path=None, auto_prompt_type=None,
+                      gen_type="mixed", model_name=None, max_duration=160, cfg_coef=1.5, temperature=0.9,
+                      top_k=50, top_p=0.0, low_mem=False, progress_callback=None):
+        """
+        生成歌曲 - 通过 API 调用
+        """
+        config, job = self._generate_song_job(
+            lyrics=lyrics, description=description, prompt_audio_path=prompt_audio_path,
+            auto_prompt_type=auto_prompt_type, gen_type=gen_type, model_name=model_name,
+            max_duration=max_duration, cfg_coef=cfg_coef, temperature=temperature, top_k=top_k, top_p=top_p,
+            low_mem=low_mem
+        )
+        return self._execute(job, config, progress_callback)
+    
+    async def generate_song_async(self, lyrics, description=None, prompt_audio_path=None,
+                                  auto_prompt_type=None, gen_type="mixed", model_name=None, max_duration=160,
+                                  cfg_coef=1.5, temperature=0.9, top_k=50, top_p=0.0, low_mem=False,
+                                  progress_callback=None, stream=False):
+        """生成歌曲 - asyncio 版本 (参数同 generate_song)"""
+        config, job = self._generate_song_job(
+            lyrics=lyrics, description=description, prompt_audio_path=prompt_audio_path,
+            auto_prompt_type=auto_prompt_type, gen_type=gen_type, model_name=model_name,
+            max_duration=max_duration, cfg_coef=cfg_coef, temperature=temperature, top_k=top_k, top_p=top_p,
+            low_mem=low_mem
+        )
+        return await self._execute_async(job, config, progress_callback, stream)
     
     def get_example_lyrics(self):
         """获取示例歌词"""
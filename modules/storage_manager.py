@@ -0,0 +1,429 @@
+"""
+输出目录容量管理
+为 outputs 下的每个子目录 (videos / songs / avatar / cache) 设置字节配额，
+后台线程分批扫描目录 (每批最多 STORAGE_SCAN_BATCH 个文件，扫描开销有上限)，
+超出配额时按 LRU (最久未访问) 或 LFU (访问次数最少) 淘汰文件。
+
+仍被会话引用的输出 (刚返回给浏览器、界面上还在显示) 会被 pin 住，不参与淘汰；
+pin 在会话关闭时释放，或在 STORAGE_PIN_TTL 秒后自动过期。
+
+扫描的同时对新文件做去重 (见 dedup.py)：同一目录内共享数据的硬链接只计一次用量，
+淘汰时只有删除了最后一个引用才计入释放的磁盘空间。
+超过 COLD_TIER_AFTER_DAYS 天未访问的文件移到冷存储，原位置留存根 (见 cold_storage.py)。
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import (
+    OUTPUT_DIR, STORAGE_QUOTAS, STORAGE_EVICTION_POLICY, STORAGE_EVICT_TARGET,
+    STORAGE_SCAN_INTERVAL, STORAGE_SCAN_BATCH, STORAGE_PIN_TTL, STORAGE_TEMP_MAX_AGE, DEDUP_PASS_BATCH,
+    COLD_TIER_AFTER_DAYS, COLD_TIER_BATCH, COLD_TIER_MIN_SIZE,
+)
+from modules.cold_storage import get_cold_storage, is_stub
+from modules.dedup import get_dedup_index
+from modules.file_utils import atomic_write
+
+# 访问记录持久化文件 (相对 OUTPUT_DIR)，重启后 LRU / LFU 顺序不丢失
+ACCESS_FILE = ".storage_access.json"
+
+
+def _inode(path, stat):
+    """文件数据的标识：硬链接到同一数据的路径相同 (Windows 的目录扫描不提供 inode，退化为路径)"""
+    return (stat.st_dev, stat.st_ino) if stat.st_ino else path
+
+
+def _walk_files(directory, stale_before=None):
+    """逐个产出目录 (含子目录) 下的 (路径, 大小, 修改时间, 数据标识)，跳过写入中的临时文件
+
+    修改时间早于 stale_before 的临时文件 (.part) 是进程崩溃遗留的，顺便删除。
+    """
+    stack = [str(directory)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        try:
+                            stat = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if not entry.name.endswith(".part"):
+                            yield entry.path, stat.st_size, stat.st_mtime, _inode(entry.path, stat)
+                        elif stale_before and stat.st_mtime < stale_before:
+                            try:
+                                os.remove(entry.path)
+                            except OSError:
+                                pass
+        except OSError:
+            continue
+
+
+class _DirectoryState:
+    """单个受管目录的清单：上一轮完整扫描的结果 + 本轮扫描进度"""
+
+    def __init__(self, name, path, quota):
+        self.name = name
+        self.path = Path(path)
+        self.quota = quota
+        self.files = {}        # 路径 -> (大小, 修改时间, 数据标识)
+        self.complete = False  # 是否已完成至少一轮完整扫描
+        self._scan = None
+        self._scan_started = 0.0
+        self._pending = {}
+
+    def scan_batch(self, limit):
+        """继续本轮扫描最多 limit 个文件，返回 (实际检查的文件数, 本轮是否结束)
+
+        只由扫描线程调用，目录遍历和 stat 不持有存储管理的锁；本轮结束后调用方持锁执行 finish_scan()。
+        """
+        if self._scan is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._scan = _walk_files(self.path, stale_before=time.time() - STORAGE_TEMP_MAX_AGE)
+            self._scan_started = time.time()
+            self._pending = {}
+        count = 0
+        for path, size, mtime, inode in self._scan:
+            self._pending[path] = (size, mtime, inode)
+            count += 1
+            if count >= limit:
+                return count, False
+        return count, True
+
+    def finish_scan(self):
+        """本轮结束：用新清单替换 (扫描期间被删除的文件自然消失)，调用方持有锁
+
+        扫描期间新写入、但扫描器已经走过其所在目录的文件从旧清单保留。
+        """
+        for path, entry in self.files.items():
+            if entry[1] >= self._scan_started and path not in self._pending and os.path.exists(path):
+                self._pending[path] = entry
+        self.files, self._pending, self._scan = self._pending, {}, None
+        self.complete = True
+
+    @property
+    def usage(self):
+        """目录占用的字节数，共享同一数据的多个硬链接只计一次"""
+        return sum({inode: size for size, _, inode in self.files.values()}.values())
+
+    def drop(self, path):
+        """从清单移除 path，返回目录因此减少的用量 (同目录内还有其他硬链接时为 0)"""
+        entry = self.files.pop(path, None)
+        if entry is None:
+            return 0
+        size, _, inode = entry
+        return 0 if any(other[2] == inode for other in self.files.values()) else size
+
+
+class StorageManager:
+    """输出目录的配额、访问统计、pin 和后台淘汰 (线程安全)"""
+
+    def __init__(self, root=None, quotas=None, policy=None):
+        self.root = Path(root or OUTPUT_DIR).resolve()
+        self.policy = policy or STORAGE_EVICTION_POLICY
+        self.dirs = [
+            _DirectoryState(name, self.root / name, quota)
+            for name, quota in (quotas if quotas is not None else STORAGE_QUOTAS).items()
+        ]
+        self._lock = threading.Lock()
+        self._access = {}   # 相对路径 -> [最近访问时间, 访问次数]
+        self._pins = {}     # 绝对路径 -> {owner: 过期时间}
+        self._dirty = False
+        self._evicted = 0
+        self._freed = 0
+        self.dedup = get_dedup_index()
+        self.cold = get_cold_storage()
+        # 取回的文件立即计入用量 (去重在下一轮 dedup_pass 时重新登记)
+        self.cold.on_recall(self.track)
+        self._tiered = 0
+        self._deduped = set()  # 本进程已检查过去重的 (路径, 修改时间)，文件离开清单后移除
+        self._thread = None
+        self._load_access()
+
+    # ==================== 访问记录 / pin ====================
+
+    def _key(self, path):
+        path = Path(path).resolve()
+        try:
+            return path.relative_to(self.root).as_posix()
+        except ValueError:
+            return None  # 不在受管目录内
+
+    def record_access(self, path):
+        """记录一次访问 (生成完成、缓存命中、画廊打开等)"""
+        key = self._key(path)
+        if key is None:
+            return
+        with self._lock:
+            entry = self._access.setdefault(key, [0.0, 0])
+            entry[0] = time.time()
+            entry[1] += 1
+            self._dirty = True
+
+    def track(self, path):
+        """新文件写入受管目录：立即计入用量，不必等下一轮扫描"""
+        path = Path(path)
+        try:
+            stat = path.stat()
+        except OSError:
+            return
+        resolved = str(path.resolve())
+        with self._lock:
+            for state in self.dirs:
+                if resolved.startswith(str(state.path) + os.sep):
+                    state.files[resolved] = (stat.st_size, stat.st_mtime, _inode(resolved, stat))
+                    break
+        self.record_access(path)
+
+    def pin(self, path, owner=None, ttl=None):
+        """保护文件不被淘汰，直到 owner 释放或 ttl 秒后过期"""
+        if not path:
+            return
+        expires = time.time() + (ttl or STORAGE_PIN_TTL)
+        with self._lock:
+            self._pins.setdefault(str(Path(path).resolve()), {})[owner] = expires
+
+    def release(self, owner):
+        """释放 owner (通常是 Gradio 会话) 持有的所有 pin"""
+        with self._lock:
+            for path in list(self._pins):
+                self._pins[path].pop(owner, None)
+                if not self._pins[path]:
+                    del self._pins[path]
+
+    def is_pinned(self, path):
+        now = time.time()
+        with self._lock:
+            owners = self._pins.get(str(Path(path).resolve()))
+            if not owners:
+                return False
+            for owner, expires in list(owners.items()):
+                if expires <= now:
+                    del owners[owner]
+            return bool(owners)
+
+    # ==================== 扫描与淘汰 ====================
+
+    def _eviction_order(self, state):
+        """按策略排序的淘汰候选 (最该淘汰的在前)
+
+        元数据 .json 随同名结果文件一起删除，不单独淘汰；冷存储存根是历史记录的唯一入口，也不淘汰。
+        """
+        candidates = []
+        with self._lock:
+            for path, (size, mtime, _) in state.files.items():
+                if path.endswith(".json") or is_stub(path):
+                    continue
+                last_access, count = self._access.get(self._key(path) or "", (mtime, 0))
+                key = (count, last_access) if self.policy == "lfu" else (last_access,)
+                candidates.append((key, path, size))
+        candidates.sort()
+        return candidates
+
+    def _remove(self, path):
+        """删除文件及其同名元数据，返回实际释放的磁盘字节数 (仍有其他引用共享数据时不计)"""
+        freed = 0
+        for victim in (Path(path), Path(path).with_suffix(".json")):
+            try:
+                stat = victim.stat()
+                remaining = self.dedup.release(victim)
+                victim.unlink()
+            except FileNotFoundError:
+                continue
+            # 未登记的文件 (去重关闭、太小) 按文件系统的链接数判断
+            if remaining == 0 or (remaining is None and stat.st_nlink <= 1):
+                freed += stat.st_size
+        return freed
+
+    def enforce_quota(self, state):
+        """目录超出配额时淘汰文件，直到用量降到配额的 STORAGE_EVICT_TARGET；返回淘汰的文件数"""
+        if not state.quota or not state.complete:
+            return 0
+        usage = state.usage
+        if usage <= state.quota:
+            return 0
+        target = state.quota * STORAGE_EVICT_TARGET
+        evicted = 0
+        for _, path, size in self._eviction_order(state):
+            if usage <= target:
+                break
+            if self.is_pinned(path):
+                continue
+            self._freed += self._remove(path)
+            evicted += 1
+            with self._lock:
+                usage -= state.drop(path)
+                usage -= state.drop(str(Path(path).with_suffix(".json")))
+                self._access.pop(self._key(path) or "", None)
+                self._dirty = True
+        if evicted:
+            print(f"[storage] {state.name}: 淘汰 {evicted} 个文件，当前用量 {usage / 1048576:.1f} MB")
+        self._evicted += evicted
+        return evicted
+
+    def run_once(self):
+        """扫描一批文件 (所有目录合计不超过 STORAGE_SCAN_BATCH 个) 并执行配额检查"""
+        budget = STORAGE_SCAN_BATCH
+        for state in self.dirs:
+            if budget <= 0:
+                break
+            count, done = state.scan_batch(budget)
+            budget -= count
+            if done:
+                with self._lock:
+                    state.finish_scan()
+            self.enforce_quota(state)
+        self.dedup_pass()
+        self.tier_pass()
+        self._save_access()
+
+    def tier_pass(self, limit=None):
+        """把超过 COLD_TIER_AFTER_DAYS 天未访问的文件移到冷存储 (最久未访问的优先)，返回转冷的文件数"""
+        if not self.cold.enabled:
+            return 0
+        cutoff = time.time() - COLD_TIER_AFTER_DAYS * 86400
+        candidates = []
+        with self._lock:
+            for state in self.dirs:
+                for path, (size, mtime, _) in state.files.items():
+                    if path.endswith(".json") or is_stub(path) or size < COLD_TIER_MIN_SIZE:
+                        continue
+                    # 刚取回的文件修改时间是取回时间，不会立即再次转冷
+                    last_access = max(self._access.get(self._key(path) or "", (0.0, 0))[0], mtime)
+                    if last_access < cutoff:
+                        candidates.append((last_access, path, state))
+        candidates.sort(key=lambda candidate: candidate[0])
+
+        tiered = 0
+        for _, path, state in candidates[:limit or COLD_TIER_BATCH]:
+            if self.is_pinned(path):
+                continue
+            try:
+                stub = self.cold.archive(path)
+            except (OSError, sqlite3.Error) as e:
+                print(f"[storage] 转入冷存储失败 {path}: {e}")
+                continue
+            # 文件已经换成存根才注销去重登记；转冷失败时文件仍在原位，登记保持与实际链接一致
+            try:
+                self.dedup.release(path)
+            except sqlite3.Error as e:
+                print(f"[storage] 注销去重登记失败 {path}: {e}")
+            tiered += 1
+            with self._lock:
+                state.drop(path)
+                self._access.pop(self._key(path) or "", None)
+                self._dirty = True
+            self.track(stub)
+        if tiered:
+            print(f"[storage] {tiered} 个文件已转入冷存储 ({self.cold.tier.name})")
+        self._tiered += tiered
+        return tiered
+
+    def dedup_pass(self, limit=None):
+        """对清单中尚未检查的文件做去重，每次最多计算 limit 个文件的哈希；返回换成链接的文件数"""
+        if not self.dedup.enabled:
+            return 0
+        budget = limit or DEDUP_PASS_BATCH
+        linked = 0
+        with self._lock:
+            listing = [[(path, entry[1]) for path, entry in state.files.items()] for state in self.dirs]
+        # 已删除 / 已改写的文件不再需要记录
+        self._deduped.intersection_update(key for entries in listing for key in entries)
+        for entries in listing:
+            for path, mtime in entries:
+                if budget <= 0:
+                    return linked
+                if (path, mtime) in self._deduped or path.endswith(".json"):
+                    continue
+                self._deduped.add((path, mtime))
+                if self.dedup.is_current(path):
+                    continue
+                budget -= 1
+                try:
+                    if self.dedup.add(path):
+                        linked += 1
+                        self.track(path)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"[storage] 去重失败 {path}: {e}")
+        return linked
+
+    def start(self):
+        """启动后台扫描线程 (重复调用无副作用)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="storage-manager", daemon=True)
+            self._thread.start()
+        # 退出时保存最后一批访问记录
+        atexit.register(self._save_access)
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[storage] 扫描失败: {e}")
+            time.sleep(STORAGE_SCAN_INTERVAL)
+
+    def stats(self):
+        dedup = self.dedup.stats() if self.dedup.enabled else None
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "dedup": dedup,
+                "evicted": self._evicted,
+                "freed": self._freed,
+                "tiered": self._tiered,
+                "cold": self.cold.stats(),
+                "pinned": len(self._pins),
+                "dirs": {
+                    state.name: {
+                        "usage": state.usage,
+                        "quota": state.quota,
+                        "files": len(state.files),
+                        "complete": state.complete,
+                    }
+                    for state in self.dirs
+                },
+            }
+
+    # ==================== 访问记录持久化 ====================
+
+    def _load_access(self):
+        try:
+            data = json.loads((self.root / ACCESS_FILE).read_text(encoding="utf-8"))
+            self._access = {key: list(value) for key, value in data.items()}
+        except (OSError, ValueError):
+            self._access = {}
+
+    def _save_access(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._access, separators=(",", ":")).encode("utf-8")
+            self._dirty = False
+        try:
+            with atomic_write(self.root / ACCESS_FILE) as f:
+                f.write(data)
+        except OSError as e:
+            print(f"[storage] 访问记录保存失败: {e}")
+
+
+# 全局实例
+storage_manager = None
+
+
+def get_storage_manager():
+    """获取存储管理实例 (首次调用时启动后台扫描)"""
+    global storage_manager
+    if storage_manager is None:
+        storage_manager = StorageManager()
+        storage_manager.start()
+    return storage_manager
@@ -0,0 +1,227 @@
+"""
+结果直通 (边下边看)
+生成完成后不再等 WebUI 把结果完整下载到本地才返回：后台线程照常做可续传下载
+(写同目录临时文件，校验后原子落盘)，界面立即拿到 /stream/<job_id> 地址，
+浏览器从正在增长的临时文件读取已经到达的字节 (tee)；请求的范围远超下载进度时
+(拖动进度条到后面) 直接把 Range 请求转发给后端，不等待也不写本地文件。
+
+下载结束后条目从登记表移除，同一地址按生成记录 (catalog) 找到本地文件，重定向到媒体路由 (见 media_server.py)。
+"""
+import mimetypes
+import threading
+import time
+from pathlib import Path
+
+from config import (
+    DOWNLOAD_CHUNK_SIZE, STREAM_ROUTE, STREAM_PASSTHROUGH_GAP, STREAM_READ_TIMEOUT,
+)
+from modules.catalog import get_catalog
+from modules.media_server import parse_range, media_url
+
+class StreamingResult:
+    """一个正在从后端下载的结果：记录临时文件和下载进度，供多个读者边下边读"""
+
+    def __init__(self, job_id, backend, remote_path, dest_path, size):
+        self.job_id = job_id
+        self.backend = backend
+        self.remote_path = remote_path
+        self.dest_path = Path(dest_path)
+        self.size = size
+        self.content_type = mimetypes.guess_type(self.dest_path.name)[0] or "application/octet-stream"
+        self.tmp_path = None
+        self.offset = 0
+        self.done = False
+        self.ok = False
+        self.error = None
+        self._cond = threading.Condition()
+        self._callbacks = []
+
+    # ==================== 下载方 ====================
+
+    def on_progress(self, tmp_path, offset):
+        """下载写入一块 (或从头重下) 时调用"""
+        with self._cond:
+            self.tmp_path, self.offset = tmp_path, offset
+            self._cond.notify_all()
+
+    def on_done(self, callback):
+        """下载结束后调用 callback(ok)；已经结束时立即调用"""
+        with self._cond:
+            if not self.done:
+                self._callbacks.append(callback)
+                return
+        callback(self.ok)
+
+    def finish(self, ok, error=None):
+        with self._cond:
+            self.done, self.ok, self.error = True, ok, error
+            callbacks, self._callbacks = self._callbacks, []
+            self._cond.notify_all()
+        for callback in callbacks:
+            try:
+                callback(ok)
+            except Exception as e:
+                print(f"[stream] 下载完成回调失败: {e}")
+
+    def wait(self, timeout=None):
+        """等待下载结束，返回是否成功"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.done, timeout)
+            return self.ok
+
+    # ==================== 读者 ====================
+
+    def _wait_for(self, position):
+        """等待 position 处的字节写入，返回当前可读的 (文件路径, 可读字节数)"""
+        deadline = time.time() + STREAM_READ_TIMEOUT
+        with self._cond:
+            while not self.done and self.offset <= position:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError("等待结果数据超时")
+                self._cond.wait(remaining)
+            if self.done:
+                if not self.ok:
+                    raise IOError(self.error or "结果下载失败")
+                return self.dest_path, self.size
+            return self.tmp_path, self.offset
+
+    def read(self, start, end, chunk_size=None):
+        """逐块产出 [start, end] 范围的内容：已下载的部分读本地文件，未到达的部分等待下载"""
+        chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+        if not self.done and start > self.offset + STREAM_PASSTHROUGH_GAP:
+            yield from self._passthrough(start, end, chunk_size)
+            return
+        position = start
+        while position <= end:
+            path, available = self._wait_for(position)
+            try:
+                with open(path, "rb") as f:
+                    f.seek(position)
+                    data = f.read(min(min(end + 1, available) - position, chunk_size))
+            except FileNotFoundError:
+                if self.done:
+                    raise
+                # 临时文件刚被 rename 为最终文件，等下载方标记结束后改读最终文件
+                time.sleep(0.05)
+                continue
+            if not data:
+                continue  # 下载方从头重下，已截断的内容稍后会重新写入
+            position += len(data)
+            yield data
+
+    def _passthrough(self, start, end, chunk_size):
+        """直接向后端请求该范围并原样转发"""
+        with self.backend.transport.get(
+            self.remote_path, stream=True, timeout=STREAM_READ_TIMEOUT,
+            headers={"Range": f"bytes={start}-{end}"}
+        ) as resp:
+            if resp.status_code != 206:
+                raise IOError(f"后端不支持范围请求 (HTTP {resp.status_code})")
+            yield from resp.iter_content(chunk_size=chunk_size)
+
+
+class StreamRegistry:
+    """进行中的直通下载表: job_id -> StreamingResult (线程安全)"""
+
+    def __init__(self):
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def url(job_id):
+        """结果的直通地址 (相对 WebUI 根路径)"""
+        return f"{STREAM_ROUTE}/{job_id}"
+
+    def get(self, job_id):
+        with self._lock:
+            return self._streams.get(job_id)
+
+    def start(self, backend, job, result):
+        """在后台线程下载 job 的结果，立即返回 StreamingResult"""
+        stream = StreamingResult(job["job_id"], backend, f"/download/{result['filename']}",
+                                 job["output_path"], int(result["size"]))
+        with self._lock:
+            self._streams[stream.job_id] = stream
+        threading.Thread(
+            target=self._download, args=(stream, job, result), name=f"stream-{stream.job_id}", daemon=True
+        ).start()
+        return stream
+
+    def _download(self, stream, job, result):
+        ok, error = False, None
+        started = time.perf_counter()
+        try:
+            ok = stream.backend.transport.download(
+                stream.remote_path, stream.dest_path,
+                timeout=job.get("download_timeout", 120),
+                expected_size=result.get("size"),
+                expected_sha256=result.get("sha256"),
+                on_progress=stream.on_progress,
+            )
+            if ok:
+                stream.backend.breaker.record_success()
+            else:
+                error = "结果文件不存在"
+        except Exception as e:
+            error = str(e)
+            stream.backend.breaker.record_failure(e)
+            print(f"[stream] {stream.job_id} 下载失败: {e}")
+        finally:
+            job.setdefault("timings", {})["download"] = round(time.perf_counter() - started, 3)
+            # 先执行完成回调 (写缓存、写生成记录)，再移出登记表，之后的请求按生成记录找到本地文件
+            stream.finish(ok, error)
+            with self._lock:
+                self._streams.pop(stream.job_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {job_id: (stream.offset, stream.size) for job_id, stream in self._streams.items()}
+
+
+# 全局实例
+stream_registry = None
+
+
+def get_stream_registry():
+    """获取直通下载表"""
+    global stream_registry
+    if stream_registry is None:
+        stream_registry = StreamRegistry()
+    return stream_registry
+
+
+def register_stream_routes(server_app):
+    """在 Gradio 的 FastAPI 应用上注册 GET {STREAM_ROUTE}/<job_id> (starlette 随 gradio 安装)
+
+    路由插在最前面，避免被 Gradio 自身的路由匹配。
+    """
+    from starlette.responses import RedirectResponse, Response, StreamingResponse
+    from starlette.routing import Route
+
+    registry = get_stream_registry()
+
+    def serve(request):
+        job_id = request.path_params["job_id"]
+        stream = registry.get(job_id)
+        if stream is None:
+            # 已下载完成：转到媒体路由，由它提供 ETag、长缓存和零拷贝发送
+            path = get_catalog().find_output_by_job_id(job_id)
+            url = path and media_url(path)
+            if url is None:
+                return Response(status_code=404)
+            return RedirectResponse(url, status_code=307)
+
+        size, content_type = stream.size, stream.content_type
+        try:
+            requested = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        start, end = requested or (0, size - 1)
+        headers = {"Accept-Ranges": "bytes", "Content-Length": str(end - start + 1)}
+        if requested:
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return StreamingResponse(stream.read(start, end), status_code=206 if requested else 200,
+                                 media_type=content_type, headers=headers)
+
+    server_app.router.routes.insert(0, Route(f"{STREAM_ROUTE}/{{job_id}}", serve, methods=["GET"]))
@@ -0,0 +1,106 @@
+"""
+测试公用的 fixture:
+    mock_backend  启动 mock_server.py 替身后端 (子进程，随机端口)，测试结束时关闭
+    isolated      把结果缓存、任务库、生成记录、去重索引等全局实例换成 tmp_path 下的新实例，
+                  不读写项目的 outputs/ 目录
+
+在项目根目录运行: python -m pytest tests
+"""
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class MockBackend:
+    """一个运行中的替身后端"""
+
+    def __init__(self, url, log_path):
+        self.url = url
+        self.log_path = log_path
+
+    def health(self):
+        return requests.get(f"{self.url}/health", timeout=5).json()
+
+    def requests_matching(self, text):
+        """替身服务访问日志中包含 text 的请求行数 (如 "POST /jobs/")"""
+        return sum(1 for line in self.log_path.read_text(encoding="utf-8").splitlines() if text in line)
+
+
+@pytest.fixture
+def mock_backend(tmp_path):
+    """mock_backend(kind, *参数) 启动一个替身后端，返回 MockBackend"""
+    processes = []
+
+    def start(kind="avatar", *args, delay=1.0, output_size=64 * 1024):
+        port = free_port()
+        log_path = tmp_path / f"mock_{kind}_{port}.log"
+        log = open(log_path, "w", encoding="utf-8")
+        process = subprocess.Popen(
+            [sys.executable, str(ROOT / "mock_server.py"), "--kind", kind, "--port", str(port),
+             "--delay", str(delay), "--output-size", str(output_size), *args],
+            stdout=log, stderr=subprocess.STDOUT, cwd=ROOT,
+            env=dict(os.environ, TMPDIR=str(tmp_path), PYTHONUNBUFFERED="1"),
+        )
+        processes.append((process, log))
+        backend = MockBackend(f"http://127.0.0.1:{port}", log_path)
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            try:
+                backend.health()
+                return backend
+            except requests.exceptions.ConnectionError:
+                time.sleep(0.1)
+        raise RuntimeError(f"替身后端没有启动: {log_path.read_text(encoding='utf-8')}")
+
+    yield start
+    for process, log in processes:
+        process.terminate()
+        process.wait(timeout=10)
+        log.close()
+
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    """全局实例换成 tmp_path 下的新实例，返回输出根目录"""
+    from modules import admission, api_base, catalog, dedup, job_store, result_cache, singleflight
+    from modules import storage_manager, stream_proxy
+
+    root = tmp_path / "outputs"
+    root.mkdir()
+    monkeypatch.setattr(api_base, "OUTPUT_ROOT", root)
+    monkeypatch.setattr(result_cache, "result_cache", result_cache.ResultCache(root / "cache", enabled=True))
+    monkeypatch.setattr(job_store, "job_store", job_store.JobStore(root / "jobs.db"))
+    monkeypatch.setattr(catalog, "catalog", catalog.Catalog(root / "catalog.db"))
+    monkeypatch.setattr(dedup, "dedup_index", dedup.DedupIndex(root / ".dedup.db"))
+    # 不启动后台扫描
+    monkeypatch.setattr(storage_manager, "storage_manager", storage_manager.StorageManager(root, quotas={}))
+    monkeypatch.setattr(singleflight, "singleflight", singleflight.SingleFlight())
+    monkeypatch.setattr(stream_proxy, "stream_registry", stream_proxy.StreamRegistry())
+    monkeypatch.setattr(admission, "admission_queues", {})
+    return root
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    """生成请求的输入文件: (音频路径, 图片路径)"""
+    audio = tmp_path / "speech.wav"
+    image = tmp_path / "face.png"
+    audio.write_bytes(os.urandom(32 * 1024))
+    image.write_bytes(os.urandom(4 * 1024))
+    return str(audio), str(image)
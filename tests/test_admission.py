@@ -0,0 +1,120 @@
+"""
+准入队列 (modules/admission.py) 与 Avatar 模型亲和调度 (modules/affinity.py)
+调度逻辑只读取端点的 drain / 熔断器 / 健康缓存，这里用替身端点，不启动后端
+"""
+import pytest
+
+from modules import affinity
+from modules.admission import AdmissionQueue, QueueFullError
+from modules.affinity import AffinityQueue
+from modules.endpoint_pool import EndpointPool
+from modules.resilience import CircuitBreaker
+
+
+class _Health:
+    def __init__(self, model_type="single", available=True):
+        self.snapshot = {"available": available, "model_type": model_type}
+
+    def cached(self):
+        return self.snapshot
+
+
+class _Endpoint:
+    def __init__(self, url, model_type="single", available=True, drain=False, pinned_model=None):
+        self.url = url
+        self.drain = drain
+        self.pinned_model = pinned_model
+        self.health = _Health(model_type, available)
+        self.breaker = CircuitBreaker(url, failure_threshold=1, recovery_timeout=60)
+
+
+class _Pool:
+    serves = EndpointPool.serves
+
+    def __init__(self, *endpoints):
+        self.endpoints = list(endpoints)
+
+
+def test_admission_queue_limits_running_and_waiting():
+    queue = AdmissionQueue("test", capacity=1, max_waiting=1)
+    first = queue._enqueue()
+    second = queue._enqueue()
+    assert first.granted and not second.granted
+    with pytest.raises(QueueFullError):
+        queue._enqueue()
+    assert queue.stats()["rejected"] == 1
+    assert queue.position(second)[0] == 1
+
+    queue.release(duration=10)
+    assert second.granted and queue.running == 1
+    queue.release()
+    assert queue.running == 0
+
+
+def test_abandoned_waiter_leaves_the_queue():
+    queue = AdmissionQueue("test", capacity=1, max_waiting=2)
+    queue._enqueue()
+    waiting = queue._enqueue()
+    queue._abandon(waiting)
+    assert queue.stats()["waiting"] == 0
+    queue.release()
+    assert queue.running == 0
+
+
+def test_affinity_batches_the_loaded_model_first():
+    endpoint = _Endpoint("http://gpu1")
+    queue = AffinityQueue("avatar", _Pool(endpoint), max_waiting=8)
+    running = queue._enqueue(model_type="single")
+    multi = queue._enqueue(model_type="multi")
+    single = queue._enqueue(model_type="single")
+    assert running.granted and running.lane == endpoint.url
+
+    queue.release(lane=endpoint.url)
+    assert single.granted and not multi.granted
+    queue.release(lane=endpoint.url)
+    assert multi.granted
+    assert queue.stats()["switches"] == 1
+
+
+def test_affinity_switches_model_only_on_an_idle_lane(monkeypatch):
+    monkeypatch.setattr(affinity, "BACKEND_CONCURRENCY", {"avatar": 2})
+    endpoint = _Endpoint("http://gpu1")
+    queue = AffinityQueue("avatar", _Pool(endpoint), max_waiting=8)
+    running = queue._enqueue(model_type="single")
+    multi = queue._enqueue(model_type="multi")
+    # 位置还有空闲名额，但切换模型要等正在执行的单人任务结束
+    assert running.granted and not multi.granted
+
+    queue.release(lane=endpoint.url)
+    assert multi.granted and queue.lanes[endpoint.url].model == "multi"
+
+
+def test_affinity_routes_pinned_models_to_their_endpoint():
+    general = _Endpoint("http://gpu1", model_type="single")
+    pinned = _Endpoint("http://gpu2", model_type="multi", pinned_model="multi")
+    queue = AffinityQueue("avatar", _Pool(general, pinned), max_waiting=8)
+    first = queue._enqueue(model_type="multi")
+    second = queue._enqueue(model_type="multi")
+    assert first.lane == pinned.url and not second.granted
+
+
+@pytest.mark.parametrize("endpoint", [
+    _Endpoint("http://gpu1", available=False),
+    _Endpoint("http://gpu1", drain=True),
+])
+def test_affinity_releases_waiters_no_endpoint_can_serve(endpoint):
+    queue = AffinityQueue("avatar", _Pool(endpoint), max_waiting=8)
+    ticket = queue._enqueue(model_type="single")
+    # 不在队列里无限等待：不分配位置直接放行，由端点池返回不可用的错误
+    assert ticket.granted and ticket.lane is None
+    queue.release(lane=ticket.lane)
+    assert queue.running == 0
+
+
+def test_affinity_skips_open_breakers():
+    broken = _Endpoint("http://gpu1")
+    healthy = _Endpoint("http://gpu2")
+    broken.breaker.record_failure(IOError("down"))
+    queue = AffinityQueue("avatar", _Pool(broken, healthy), max_waiting=8)
+    ticket = queue._enqueue(model_type="single")
+    assert ticket.lane == healthy.url
@@ -0,0 +1,143 @@
+"""
+生成任务的完整流程 (modules/api_base.py)，对接 mock_server.py 替身后端:
+同步 / asyncio 生成、缓存命中、相同请求合并、边下边看、取消与合并任务接手、提交重试与熔断
+"""
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from modules import api_base
+from modules.avatar_module import AvatarModule
+
+SUBMIT = "POST /jobs/single_avatar"
+
+
+def _submitted(module):
+    """最近登记的任务已拿到后端任务 ID"""
+    items = module.jobs.recent(1)
+    return bool(items) and items[0]["backend_job_id"] is not None
+
+
+def _wait_until(predicate, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+async def _wait_until_async(predicate, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+def test_sync_generation_then_cache_hit(mock_backend, isolated, inputs):
+    backend = mock_backend("avatar")
+    module = AvatarModule(backend.url)
+    audio, image = inputs
+    progress = []
+
+    output_path, config = module.single_avatar(
+        audio, image, progress_callback=lambda value, desc="": progress.append(value)
+    )
+    assert config["success"] and Path(output_path).is_file()
+    assert Path(output_path).is_relative_to(isolated)
+    assert progress == sorted(progress) and progress[-1] == 1.0
+    assert module.jobs.get(config["job_id"])["status"] == "done"
+
+    cached_path, cached_config = module.single_avatar(audio, image)
+    assert cached_config["cached"] and Path(cached_path).is_file()
+    assert backend.requests_matching(SUBMIT) == 1
+
+
+def test_async_identical_requests_are_coalesced(mock_backend, isolated, inputs):
+    backend = mock_backend("avatar")
+    module = AvatarModule(backend.url)
+    audio, image = inputs
+
+    async def run():
+        return await asyncio.gather(module.single_avatar_async(audio, image),
+                                    module.single_avatar_async(audio, image))
+
+    results = asyncio.run(run())
+    assert all(config["success"] for _, config in results)
+    assert [bool(config.get("coalesced")) for _, config in results].count(True) == 1
+    assert backend.requests_matching(SUBMIT) == 1
+
+
+def test_stream_result_releases_endpoint_after_download(mock_backend, isolated, inputs):
+    backend = mock_backend("avatar", output_size=4 * 1024 * 1024)
+    module = AvatarModule(backend.url)
+    audio, image = inputs
+
+    output_path, config = asyncio.run(module.single_avatar_async(audio, image, stream=True))
+    assert config["stream_url"].endswith(config["job_id"])
+    # 完成回调依次为：释放端点、写缓存、写任务库，任务库记为完成时端点已释放
+    assert _wait_until(lambda: module.jobs.get(config["job_id"])["status"] == "done")
+    endpoint = module.pool.endpoints[0]
+    assert endpoint.outstanding == 0
+    assert endpoint.breaker.snapshot()["failures"] == 0
+    assert Path(output_path).stat().st_size == 4 * 1024 * 1024
+
+
+def test_cancel_stops_backend_job(mock_backend, isolated, inputs):
+    backend = mock_backend("avatar", delay=5)
+    module = AvatarModule(backend.url)
+    audio, image = inputs
+    assert backend.health()["cancelled"] == 0
+
+    async def run():
+        task = asyncio.create_task(module.single_avatar_async(audio, image))
+        assert await _wait_until_async(lambda: _submitted(module))
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert _wait_until(lambda: backend.health()["cancelled"] == 1)
+    item = module.jobs.recent(1)[0]
+    assert item["status"] == "cancelled"
+    assert module.admission.running == 0 and module.pool.endpoints[0].outstanding == 0
+
+
+def test_follower_takes_over_cancelled_leader_without_resubmitting(mock_backend, isolated, inputs):
+    backend = mock_backend("avatar", delay=3)
+    module = AvatarModule(backend.url)
+    audio, image = inputs
+
+    async def run():
+        leader = asyncio.create_task(module.single_avatar_async(audio, image))
+        assert await _wait_until_async(lambda: _submitted(module))
+        follower = asyncio.create_task(module.single_avatar_async(audio, image))
+        assert await _wait_until_async(lambda: module.flights.stats() and max(module.flights.stats().values()) == 1)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    output_path, config = asyncio.run(run())
+    assert config["success"] and Path(output_path).is_file()
+    # 接手者等待执行者已提交的后端任务：不重新提交，也不取消
+    assert backend.requests_matching(SUBMIT) == 1
+    assert backend.requests_matching("/cancel") == 0
+
+
+def test_unavailable_backend_is_retried_then_counted_by_breaker(mock_backend, isolated, inputs, monkeypatch):
+    monkeypatch.setattr(api_base, "SUBMIT_RETRY_BACKOFF", 0.01)
+    monkeypatch.setattr(api_base, "SUBMIT_RETRY_MAX_BACKOFF", 0.01)
+    backend = mock_backend("avatar", "--fail-rate", "1.0")
+    module = AvatarModule(backend.url)
+    audio, image = inputs
+
+    output_path, config = module.single_avatar(audio, image)
+    assert output_path is None and config["error"]
+    assert backend.requests_matching(SUBMIT) == api_base.SUBMIT_MAX_ATTEMPTS
+    assert module.pool.endpoints[0].breaker.snapshot()["failures"] == 1
+    assert module.jobs.recent(1)[0]["status"] == "failed"
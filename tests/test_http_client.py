@@ -0,0 +1,120 @@
+"""
+流式可续传下载 (modules/http_client.py): 断线后按 Range 续传、sha256 校验、5xx 由续传循环重试
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from modules import http_client
+from modules.http_client import AsyncHttpTransport, DownloadError, HttpTransport
+
+PAYLOAD = os.urandom(300 * 1024)
+
+
+class _FlakyHandler(BaseHTTPRequestHandler):
+    """第一次请求只发送一半数据就断开；之后的请求正常响应 (支持 Range)"""
+
+    def do_GET(self):
+        server = self.server
+        server.seen.append((self.path, self.headers.get("Range")))
+        if self.path == "/missing":
+            self.send_error(404)
+            return
+        if server.unavailable:
+            server.unavailable -= 1
+            self.send_error(503)
+            return
+        body = server.payload
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].split("-")[0])
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        if server.drop_first:
+            server.drop_first = False
+            self.wfile.write(body[start:start + len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def flaky_server(monkeypatch):
+    monkeypatch.setattr(http_client, "_download_backoff", lambda attempt: 0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FlakyHandler)
+    server.payload = PAYLOAD
+    server.drop_first = True
+    server.unavailable = 0
+    server.seen = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_download_resumes_with_range_after_disconnect(flaky_server, tmp_path):
+    dest = tmp_path / "out.bin"
+    ok = HttpTransport(_url(flaky_server)).download(
+        "/file", dest, timeout=10, expected_size=len(PAYLOAD), expected_sha256=hashlib.sha256(PAYLOAD).hexdigest()
+    )
+    assert ok and dest.read_bytes() == PAYLOAD
+    assert flaky_server.seen[0][1] is None
+    assert flaky_server.seen[-1][1].startswith("bytes=") and flaky_server.seen[-1][1] != "bytes=0-"
+    # 临时文件已原子改名，不留残余
+    assert [path.name for path in tmp_path.iterdir()] == ["out.bin"]
+
+
+def test_async_download_resumes_with_range_after_disconnect(flaky_server, tmp_path):
+    dest = tmp_path / "out.bin"
+    ok = asyncio.run(AsyncHttpTransport(_url(flaky_server)).download(
+        "/file", dest, timeout=10, expected_size=len(PAYLOAD), expected_sha256=hashlib.sha256(PAYLOAD).hexdigest()
+    ))
+    assert ok and dest.read_bytes() == PAYLOAD
+    assert any(range_header for _, range_header in flaky_server.seen)
+
+
+def test_download_rejects_checksum_mismatch(flaky_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(http_client, "DOWNLOAD_MAX_ATTEMPTS", 2)
+    flaky_server.drop_first = False
+    dest = tmp_path / "out.bin"
+    with pytest.raises(DownloadError):
+        HttpTransport(_url(flaky_server)).download("/file", dest, timeout=10, expected_sha256="0" * 64)
+    assert not dest.exists()
+    assert len(flaky_server.seen) == 2
+
+
+def test_download_returns_false_for_missing_file(flaky_server, tmp_path):
+    assert HttpTransport(_url(flaky_server)).download("/missing", tmp_path / "out.bin", timeout=10) is False
+    assert len(flaky_server.seen) == 1
+
+
+def test_unavailable_backend_is_retried_by_the_download_loop_only(flaky_server, tmp_path, monkeypatch):
+    """503 不在连接池层重试 (否则与续传循环叠加)：每次下载尝试只发一个请求"""
+    monkeypatch.setattr(http_client, "DOWNLOAD_MAX_ATTEMPTS", 2)
+    flaky_server.unavailable = 100
+    with pytest.raises(DownloadError):
+        HttpTransport(_url(flaky_server)).download("/file", tmp_path / "out.bin", timeout=10)
+    assert len(flaky_server.seen) == 2
+
+    monkeypatch.setattr(http_client, "DOWNLOAD_MAX_ATTEMPTS", 3)
+    flaky_server.unavailable = 1
+    flaky_server.seen.clear()
+    dest = tmp_path / "out.bin"
+    assert HttpTransport(_url(flaky_server)).download("/file", dest, timeout=10, expected_size=len(PAYLOAD))
+    assert len(flaky_server.seen) == 3  # 503、中途断开、续传
@@ -0,0 +1,75 @@
+"""
+任务库 (modules/job_store.py) 与重启后继续未完成的任务 (ApiModuleBase.resume_jobs)
+"""
+import time
+from pathlib import Path
+
+import requests
+
+from modules.job_store import JobStore
+from modules.longcat_module import LongCatVideoModule
+
+SUBMIT = "POST /jobs/text_to_video"
+
+
+def _wait_for_status(module, job_id, status, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if module.jobs.get(job_id)["status"] == status:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def _register(module, prompt):
+    """登记一个任务 (相当于上次运行时登记后 WebUI 重启)，返回 (job, config)"""
+    config, job = module._text_to_video_job(prompt=prompt)
+    job["idempotency_key"] = job["job_id"]
+    module.jobs.create(module.queue_name, job, config)
+    return job, config
+
+
+def test_resume_reattaches_submitted_job(mock_backend, isolated):
+    backend = mock_backend("video")
+    module = LongCatVideoModule(backend.url)
+    job, _ = _register(module, "a cat")
+    resp = requests.post(f"{backend.url}/jobs/text_to_video", json=job["json"], timeout=5)
+    module.jobs.update(job["job_id"], "submitted", backend_url=backend.url, backend_job_id=resp.json()["job_id"])
+
+    assert module.resume_jobs() == 1
+    assert _wait_for_status(module, job["job_id"], "done")
+    item = module.jobs.get(job["job_id"])
+    assert Path(item["output_path"]).is_file()
+    # 重新连接已提交的后端任务，不重新提交
+    assert backend.requests_matching(SUBMIT) == 1
+
+
+def test_resume_reruns_job_without_backend_id(mock_backend, isolated):
+    backend = mock_backend("video")
+    module = LongCatVideoModule(backend.url)
+    job, _ = _register(module, "a dog")
+
+    assert module.resume_jobs() == 1
+    assert _wait_for_status(module, job["job_id"], "done")
+    assert backend.requests_matching(SUBMIT) == 1
+    assert module.resume_jobs() == 0
+
+
+def test_unfinished_and_prune_filter_finished_statuses(tmp_path):
+    store = JobStore(tmp_path / "jobs.db")
+    for job_id, status in (("a", "queued"), ("b", "submitted"), ("c", "done"), ("d", "cancelled")):
+        store.create("longcat", {"job_id": job_id}, {"type": "text_to_video"})
+        if status == "done":
+            store.finish(job_id, tmp_path / "out.mp4", {"success": True})
+        elif status == "cancelled":
+            store.finish(job_id, None, {"cancelled": True})
+        else:
+            store.update(job_id, status)
+
+    assert [item["job_id"] for item in store.unfinished("longcat")] == ["a", "b"]
+    assert store.unfinished("song") == []
+    assert store.get("c")["status"] == "done" and store.get("d")["status"] == "cancelled"
+
+    assert store.prune(days=1) == 0
+    assert store.prune(days=0) == 2
+    assert store.get("c") is None and store.get("a") is not None
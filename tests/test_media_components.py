@@ -0,0 +1,119 @@
+"""
+结果组件把媒体路由地址原样交给浏览器 (不经 Gradio 下载到缓存再以 /file= 提供)，
+浏览器拿到的地址确实由 /media 路由提供 (带 ETag、支持 Range)。
+
+需要安装 gradio；在项目根目录运行: python -m pytest tests
+"""
+import json
+import os
+import socket
+import uuid
+
+import pytest
+
+gr = pytest.importorskip("gradio")
+requests = pytest.importorskip("requests")
+
+from config import VIDEO_OUTPUT_DIR, MEDIA_ROUTE
+from modules import media_components
+from modules.media_components import ResultVideo, ResultAudio
+from modules.media_server import register_media_routes, media_url
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _call(base_url, api_name):
+    """通过 Gradio 的 /call 接口触发事件 (Gradio 5 在 /gradio_api 下)，返回输出列表"""
+    for prefix in ("/gradio_api", ""):
+        resp = requests.post(f"{base_url}{prefix}/call/{api_name}", json={"data": []}, timeout=30)
+        if resp.ok:
+            break
+    event_id = resp.json()["event_id"]
+    with requests.get(f"{base_url}{prefix}/call/{api_name}/{event_id}", stream=True, timeout=30) as resp:
+        event = None
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:") and event in ("complete", "error"):
+                assert event == "complete", line
+                return json.loads(line[len("data:"):])
+    raise AssertionError("事件没有返回结果")
+
+
+@pytest.fixture
+def media_file():
+    path = VIDEO_OUTPUT_DIR / f"test_media_{uuid.uuid4().hex[:8]}.mp4"
+    path.write_bytes(os.urandom(256 * 1024))
+    yield path
+    path.unlink(missing_ok=True)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    monkeypatch.setattr(media_components, "PUBLIC_BASE_URL", base_url)
+    demos = []
+
+    def launch(blocks):
+        blocks.queue().launch(server_name="127.0.0.1", server_port=port, prevent_thread_lock=True, quiet=True)
+        register_media_routes(blocks.server_app)
+        demos.append(blocks)
+        return base_url
+
+    yield launch
+    for blocks in demos:
+        blocks.close()
+
+
+def _cached_copies(blocks, name):
+    cache = getattr(blocks, "GRADIO_CACHE", None) or os.environ.get("GRADIO_TEMP_DIR", "")
+    if not cache or not os.path.isdir(cache):
+        return []
+    return [os.path.join(root, f) for root, _, files in os.walk(cache) for f in files if f == name]
+
+
+def test_result_video_serves_media_route(server, media_file):
+    with gr.Blocks() as demo:
+        video = ResultVideo()
+        audio = ResultAudio()
+        button = gr.Button()
+        button.click(
+            fn=lambda: (media_components.public_url(media_url(media_file)), None),
+            outputs=[video, audio], api_name="result",
+        )
+    base_url = server(demo)
+
+    video_data, _ = _call(base_url, "result")
+    url = video_data["video"]["url"]
+    assert url == f"{base_url}{MEDIA_ROUTE}/videos/{media_file.name}"
+    assert "/file=" not in url
+    # WebUI 没有自己下载一份放进 Gradio 缓存
+    assert not _cached_copies(demo, media_file.name)
+
+    resp = requests.get(url, timeout=30)
+    assert resp.status_code == 200
+    assert resp.content == media_file.read_bytes()
+    assert resp.headers["ETag"]
+    assert "immutable" in resp.headers["Cache-Control"]
+
+    partial = requests.get(url, headers={"Range": "bytes=0-99"}, timeout=30)
+    assert partial.status_code == 206
+    assert partial.content == media_file.read_bytes()[:100]
+
+    assert requests.get(url, headers={"If-None-Match": resp.headers["ETag"]}, timeout=30).status_code == 304
+
+
+def test_result_audio_passes_url_through(server, media_file):
+    with gr.Blocks() as demo:
+        audio = ResultAudio()
+        button = gr.Button()
+        button.click(fn=lambda: media_components.public_url(media_url(media_file)), outputs=audio, api_name="audio")
+    base_url = server(demo)
+
+    (audio_data,) = _call(base_url, "audio")
+    assert audio_data["url"] == f"{base_url}{MEDIA_ROUTE}/videos/{media_file.name}"
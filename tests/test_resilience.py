@@ -0,0 +1,111 @@
+"""
+熔断器与抖动退避重试 (modules/resilience.py)
+"""
+import time
+
+import pytest
+
+from modules.resilience import (
+    CLOSED, OPEN, HALF_OPEN, CircuitBreaker, backoff_delay, retry_call,
+)
+
+
+def _open_breaker(recovery_timeout=60):
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=recovery_timeout)
+    breaker.record_failure(IOError("a"))
+    breaker.record_failure(IOError("b"))
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=3, recovery_timeout=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.attempt() is True
+    breaker.record_failure(IOError("down"))
+    assert breaker.state == OPEN
+    assert breaker.attempt() is None and not breaker.can_attempt()
+    assert 0 < breaker.retry_in() <= 60
+    assert breaker.snapshot()["last_error"] == "down"
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_admits_a_single_probe():
+    breaker = _open_breaker(recovery_timeout=0.05)
+    time.sleep(0.1)
+    assert breaker.state == HALF_OPEN
+    probe = breaker.attempt()
+    assert probe not in (None, True)
+    assert breaker.attempt() is None and not breaker.can_attempt()
+
+    breaker.release_probe(probe)
+    assert breaker.can_attempt()
+
+
+def test_stale_lease_does_not_release_current_probe():
+    breaker = _open_breaker(recovery_timeout=0.05)
+    time.sleep(0.1)
+    probe = breaker.attempt()
+    # 熔断前发出的普通任务 (凭证 True) 和上一轮的试探任务结束时不释放当前试探名额
+    breaker.release_probe(True)
+    breaker.release_probe(object())
+    assert breaker.attempt() is None
+    breaker.release_probe(probe)
+    assert breaker.attempt() is not None
+
+
+def test_failed_probe_reopens_and_successful_probe_closes():
+    breaker = _open_breaker(recovery_timeout=0.05)
+    time.sleep(0.1)
+    breaker.attempt()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    time.sleep(0.1)
+    breaker.attempt()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.attempt() is True
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    delays = [backoff_delay(attempt, 1.0, 5.0) for attempt in (1, 2, 3, 10) for _ in range(50)]
+    assert all(0 <= delay <= 5.0 for delay in delays)
+    assert len(set(delays)) > 1
+    assert all(backoff_delay(1, 1.0, 5.0) <= 1.0 for _ in range(50))
+
+
+def test_retry_call_retries_only_retryable_errors():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert retry_call(flaky, 4, lambda e: isinstance(e, ConnectionError), 0.001, 0.001) == "ok"
+    assert len(calls) == 3
+
+    calls.clear()
+    with pytest.raises(ValueError):
+        retry_call(lambda: calls.append(1) or int("x"), 4, lambda e: isinstance(e, ConnectionError), 0.001, 0.001)
+    assert len(calls) == 1
+
+
+def test_retry_call_gives_up_after_attempts():
+    calls = []
+
+    def down():
+        calls.append(1)
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        retry_call(down, 3, lambda e: True, 0.001, 0.001)
+    assert len(calls) == 3